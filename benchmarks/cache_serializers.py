@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2018 Christiaan Frans Rademan.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# * Neither the name of the copyright holders nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+"""Benchmark for cache serializers.
+
+Compares encoding and decoding time and size of the 'pickle', 'marshal'
+and 'json' cache serializers for model payloads of 1, 100 and 1000 rows.
+
+    PYTHONPATH=. python benchmarks/cache_serializers.py
+"""
+import timeit
+
+from luxon.core.cache.serializers import SERIALIZERS
+
+
+def row(idx):
+    return {'id': 'c8f2a4e4-%012d' % idx,
+            'tenant_id': None,
+            'username': 'user%s' % idx,
+            'email': 'user%s@example.com' % idx,
+            'name': 'User Number %s' % idx,
+            'enabled': idx % 2 == 0,
+            'logins': idx * 7,
+            'balance': idx * 1.25,
+            'roles': ['Member', 'Operator'],
+            'creation_time': '2018/05/10 10:%02d:00' % (idx % 60,)}
+
+
+def bench(rows, number):
+    payload = [row(idx) for idx in range(rows)]
+
+    results = []
+    for name in sorted(SERIALIZERS):
+        serializer = SERIALIZERS[name]()
+        data = serializer.dumps(payload)
+        dumps_time = timeit.timeit(lambda: serializer.dumps(payload),
+                                   number=number)
+        loads_time = timeit.timeit(lambda: serializer.loads(data),
+                                   number=number)
+        results.append((name,
+                        dumps_time / number * 1000000,
+                        loads_time / number * 1000000,
+                        len(data),))
+
+    return results
+
+
+def main():
+    print('%6s %-10s %12s %12s %10s' % ('rows', 'serializer', 'dumps us',
+                                        'loads us', 'bytes'))
+    for rows, number in ((1, 20000,), (100, 1000,), (1000, 100,),):
+        for name, dumps_time, loads_time, size in bench(rows, number):
+            print('%6s %-10s %12.3f %12.3f %10s' % (rows, name, dumps_time,
+                                                    loads_time, size))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2018 Christiaan Frans Rademan.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# * Neither the name of the copyright holders nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+"""Benchmark for 'regex:' routes.
+
+Compares matching regex routes with the Router against scanning the
+routes one by one, for 10, 100 and 1000 regex routes.
+
+The 'distinct' routes each have their own literal prefix, so only one
+route is a candidate for a path. The 'shared' routes all start with
+'/api/' followed by a pattern, they are all candidates for a path and are
+matched in passes of at most 32 routes each.
+
+    PYTHONPATH=. python benchmarks/router_regex.py
+"""
+import re
+import timeit
+
+from luxon.core.router import Router
+
+
+def resource(req, resp):
+    pass
+
+
+def linear(routes, path):
+    for route in routes:
+        if route.match(path):
+            return route
+
+
+PATTERNS = {
+    'distinct': ('^/api/resource%s/[0-9]+$', '/api/resource%s/12',),
+    'shared': ('^/api/[a-z]+%s/[0-9]+$', '/api/resource%s/12',),
+}
+
+
+def bench(count, pattern, number=20000):
+    expression_format, path_format = PATTERNS[pattern]
+    router = Router()
+    routes = []
+    for idx in range(count):
+        expression = expression_format % idx
+        router.add('GET', 'regex:' + expression, resource)
+        routes.append(re.compile(expression))
+
+    hit = path_format % (count - 1)
+    miss = '/wp-login.php'
+
+    # Compile on first find.
+    router.find('GET', miss)
+
+    results = []
+    for path in (hit, miss,):
+        router_time = timeit.timeit(lambda: router.find('GET', path),
+                                    number=number)
+        linear_time = timeit.timeit(lambda: linear(routes, path),
+                                    number=number)
+        results.append((path,
+                        router_time / number * 1000000,
+                        linear_time / number * 1000000,))
+
+    return results
+
+
+def main():
+    print('%-8s %6s %-22s %12s %12s' % ('pattern', 'routes', 'path',
+                                        'router us', 'linear us'))
+    for pattern in sorted(PATTERNS):
+        for count in (10, 100, 1000,):
+            for path, router_time, linear_time in bench(count, pattern):
+                print('%-8s %6s %-22s %12.3f %12.3f' % (pattern, count, path,
+                                                        router_time,
+                                                        linear_time))
+
+
+if __name__ == '__main__':
+    main()
@@ -27,51 +27,235 @@
 # CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
 # ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
 # THE POSSIBILITY OF SUCH DAMAGE.
+import time
+import inspect
+
 from luxon import g
 from luxon.utils.imports import get_class
 from luxon.utils.singleton import Singleton
 
 
+def _accepted(backend, options):
+    """Returns options accepted by backend class.
+
+    Backends may only accept 'max_objs' and 'max_obj_size'.
+    """
+    try:
+        params = inspect.signature(backend).parameters
+    except (TypeError, ValueError):
+        return {}
+
+    if any(param.kind == param.VAR_KEYWORD for param in params.values()):
+        return options
+
+    return {name: options[name] for name in options if name in params}
+
+
 class Cache(metaclass=Singleton):
     """Caching class
 
     Used to globally cache objects using the class specified in the
     *settings.ini* file
 
+    Objects can be stored in a namespace, such as 'users' or
+    'tenant:<id>'. All objects in a namespace are invalidated at once with
+    invalidate(namespace), without finding or deleting the objects.
+
+    The namespace generation is a counter stored in the backend and part
+    of the reference of objects in the namespace. Invalidating increments
+    the generation atomically, objects stored with previous generations
+    are never loaded again and expire in the backend.
+
+    Each operation in a namespace also reads the generation. With the
+    Redis backend this costs an additional round trip, the Tiered backend
+    keeps generations in memory for up to 'l1_expire' seconds.
+
+    Example:
+
+        cache = Cache()
+        cache.store('list', users, 300, namespace='users')
+        cache.load('list', namespace='users')
+        cache.invalidate('users')
+
     """
     def __init__(self):
         max_objects = g.app.config.getint('cache',
                                           'max_objects')
         max_object_size = g.app.config.getint('cache',
                                               'max_object_size')
-        self._cached_backend = get_class(
-            g.app.config.get('cache',
-                             'backend'))(
-                             max_objects,
-                             max_object_size)
+        mode = g.app.config.get('cache', 'mode', fallback='pickle')
+        max_bytes = g.app.config.getint('cache', 'max_bytes', fallback=0)
+        l1_expire = g.app.config.getint('cache', 'l1_expire', fallback=5)
+        compress_threshold = g.app.config.getint('cache',
+                                                 'compress_threshold',
+                                                 fallback=1024)
+        serializer = g.app.config.get('cache', 'serializer',
+                                      fallback='pickle')
+        backend = get_class(g.app.config.get('cache', 'backend'))
+        self._cached_backend = backend(
+            max_objects,
+            max_object_size,
+            **_accepted(backend, {'mode': mode,
+                                  'max_bytes': max_bytes,
+                                  'l1_expire': l1_expire,
+                                  'compress_threshold': compress_threshold,
+                                  'serializer': serializer}))
+
+    def generation(self, namespace):
+        """Returns current generation of namespace
 
-    def store(self, reference, obj, expire=60):
+        Args:
+            namespace (str): namespace of objects
+        """
+        return self._incr(namespace, 0)
+
+    def invalidate(self, namespace):
+        """Invalidates all objects in namespace
+
+        Args:
+            namespace (str): namespace of objects
+        """
+        self._incr(namespace, 1)
+
+    def _incr(self, namespace, amount):
+        key = 'generation:' + namespace
+        # NOTE(cfrademan): Lost or never stored, starting at the current
+        # time in nanoseconds ensures previous generations are not reused.
+        initial = time.time_ns()
+
+        try:
+            incr = self._cached_backend.incr
+        except AttributeError:
+            # NOTE(cfrademan): Backends without incr, not atomic.
+            generation = self._cached_backend.load(key)
+            if generation is None:
+                generation = initial
+            elif not amount:
+                return generation
+            generation += amount
+            self._cached_backend.store(key, generation, 604800)
+            return generation
+
+        return incr(key, amount, initial, 604800)
+
+    def _reference(self, reference, namespace):
+        if namespace is None:
+            return reference
+        return '%s:%s:%s' % (namespace, self.generation(namespace),
+                             reference,)
+
+    def store(self, reference, obj, expire=60, namespace=None):
         """Store object
 
         Args:
             reference (str): reference to object
             obj (obj): object to be cached
             expire (int): time to expire (s)
+            namespace (str): namespace of object
         """
         if expire > 604800:  # 7 days
             expire = 604800
 
-        self._cached_backend.store(reference, obj, expire)
+        self._cached_backend.store(self._reference(reference, namespace),
+                                   obj, expire)
 
-    def load(self, reference):
+    def load(self, reference, namespace=None):
         """Returns Cached Object
 
         Args:
             reference (str): reference to object to be loaded
+            namespace (str): namespace of object
 
         Returns:
             object from cache
         """
-        return self._cached_backend.load(reference)
+        return self._cached_backend.load(self._reference(reference,
+                                                         namespace))
+
+    def store_many(self, objs, expire=60, namespace=None):
+        """Store objects
+
+        Backends such as Redis store all objects in one round trip.
+
+        Args:
+            objs (dict): objects to be cached by reference
+            expire (int): time to expire (s)
+            namespace (str): namespace of objects
+        """
+        if expire > 604800:  # 7 days
+            expire = 604800
 
+        if namespace is not None:
+            prefix = self._reference('', namespace)
+            objs = {prefix + reference: objs[reference]
+                    for reference in objs}
 
+        try:
+            store_many = self._cached_backend.store_many
+        except AttributeError:
+            for reference in objs:
+                self._cached_backend.store(reference, objs[reference], expire)
+        else:
+            store_many(objs, expire)
+
+    def load_many(self, references, namespace=None):
+        """Returns Cached Objects
+
+        Backends such as Redis load all objects in one round trip.
+
+        Args:
+            references (list): references to objects to be loaded
+            namespace (str): namespace of objects
+
+        Returns:
+            dict: objects by reference, references not cached are excluded.
+        """
+        prefix = ''
+        if namespace is not None:
+            prefix = self._reference('', namespace)
+
+        keys = [prefix + reference for reference in references]
+
+        try:
+            load_many = self._cached_backend.load_many
+        except AttributeError:
+            objs = {}
+            for key in keys:
+                obj = self._cached_backend.load(key)
+                if obj is not None:
+                    objs[key] = obj
+        else:
+            objs = load_many(keys)
+
+        if prefix:
+            return {key[len(prefix):]: objs[key] for key in objs}
+        return objs
+
+    def delete(self, reference, namespace=None):
+        """Deletes cached object
+
+        Args:
+            reference (str): reference to object to be deleted
+            namespace (str): namespace of object
+        """
+        reference = self._reference(reference, namespace)
+        try:
+            delete = self._cached_backend.delete
+        except AttributeError:
+            # NOTE(cfrademan): Backends without delete, loading None is
+            # the same as a miss.
+            self._cached_backend.store(reference, None, 1)
+        else:
+            delete(reference)
+
+    def stats(self):
+        """Returns statistics of cache backend.
+
+        Returns:
+            dict: Counters such as 'hits' and 'misses', empty when not
+                supported by backend.
+        """
+        try:
+            return self._cached_backend.stats()
+        except AttributeError:
+            return {}
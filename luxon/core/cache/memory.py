@@ -28,37 +28,90 @@
 # ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
 # THE POSSIBILITY OF SUCH DAMAGE.
 import sys
-import pickle
-import collections
-from datetime import timedelta
+import threading
+from heapq import heappush, heappop, heapify
+from time import monotonic
 
 from luxon.core.logger import GetLogger
-from luxon.utils.timezone import now
+from luxon.structs.frozendict import freeze
+from luxon.core.cache.serializers import serializer as get_serializer
 
 log = GetLogger(__name__)
 
+MODES = ('pickle', 'reference', 'freeze',)
+
+# Entry fields.
+_VALUE, _EXPIRE, _PICKLED, _SIZE, _FREQ = range(5)
+
 
 class Memory(object):
-    """LRU Memory Cache.
+    """GDSF Memory Cache.
+
+    Greedy Dual Size Frequency cache.
 
-    Least Recently Used cache.
+    Cache has a fixed capacity in objects and bytes. When full, entries with
+    the lowest priority are discarded. Priority is the frequency of access
+    divided by size, plus the priority of the last entry evicted. Small and
+    frequently used entries are kept in favour of large or rarely used
+    entries, while entries not used for long eventually age out.
 
-    Cache has a fixed capacity and discards the oldest entries. This is
-    specially useful if you have the need to control the cache memory usage.
+    Sizes are the length of the serialized value, so nested objects are
+    accounted for. Values that cannot be serialized are not cached in
+    'pickle' mode, in other modes they are stored with their shallow size
+    from sys.getsizeof.
 
-    Defaults are max_objects 5000 * max_obj_size of 50Kbytes is 250Mbyte.
+    Defaults are max_objects 5000 * max_obj_size of 50Kbytes is 250Mbyte,
+    which is also the default for max_bytes.
 
     Its reasonable to assume a host has atleast 250Mbytes * each process.
+
+    Values are serialized by default, so every load returns a new copy. Since
+    the cache is in-process this is not required for values that are never
+    modified:
+
+        * 'reference' stores values as is. Loads return the same object, which
+          must be treated as immutable by all callers.
+        * 'freeze' stores a deep immutable copy of values. See
+          luxon.structs.frozendict.freeze. Values that cannot be frozen are
+          serialized.
+
+    Keyword Args:
+        max_objs (int): Maximum number of objects.
+        max_obj_size (int): Maximum size of object in Kbytes.
+        mode (str): 'pickle', 'reference' or 'freeze'.
+        max_bytes (int): Maximum size of all objects in bytes. Default 0 is
+            max_objs * max_obj_size.
+        serializer (str): 'pickle', 'marshal' or 'json'. See
+            luxon.core.cache.serializers.
     """
-    def __init__(self, max_objs=5000, max_obj_size=50):
-        self._cache = collections.OrderedDict()
+    def __init__(self, max_objs=5000, max_obj_size=50, mode='pickle',
+                 max_bytes=0, serializer='pickle', **kwargs):
+        if mode not in MODES:
+            raise ValueError("Invalid memory cache mode '%s'" % mode)
+
+        self._cache = {}
+        self._heap = []
+        self._lock = threading.Lock()
         self._max_objs = max_objs
         self._max_obj_size = 1024 * max_obj_size
-        max_mem = (max_obj_size * max_objs) / 1000
+        self._max_bytes = max_bytes or max_objs * self._max_obj_size
+        self._mode = mode
+        self._serializer = get_serializer(serializer)
+        self._bytes = 0
+        # NOTE(cfrademan): Priority of last evicted entry. Added to new
+        # priorities, so entries not accessed for long are evicted.
+        self._inflation = 0.0
+        self._seq = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
         log.info('Memory Cache Initialized' +
-                 ' max_objs=%s' % (max_obj_size,) +
-                 ' max_obj_size=%sKbytes' % (max_objs,) +
-                 ' max_memory=%sMBytes' % (max_mem,))
+                 ' max_objs=%s' % (max_objs,) +
+                 ' max_obj_size=%sKbytes' % (max_obj_size,) +
+                 ' max_memory=%sMBytes' % (self._max_bytes / 1048576,) +
+                 ' mode=%s' % (mode,) +
+                 ' serializer=%s' % (serializer,))
 
     def load(self, key):
         """Loads cached data from key
@@ -67,13 +120,29 @@ class Memory(object):
             key (str): key for required data
         """
         try:
-            value, expire = self._cache.pop(key)
-            if expire > now():
-                self._cache[key] = (value, expire,)
-                return pickle.loads(value)
+            entry = self._cache[key]
         except KeyError:
+            self._misses += 1
+            return None
+
+        if entry[_EXPIRE] <= monotonic():
+            with self._lock:
+                if self._cache.get(key) is entry:
+                    self._remove(key, entry)
+                    self._expirations += 1
+            self._misses += 1
             return None
 
+        # NOTE(cfrademan): Priority is only updated when the entry becomes
+        # a candidate for eviction, so hits never touch the heap.
+        entry[_FREQ] += 1
+        self._hits += 1
+
+        if entry[_PICKLED]:
+            return self._serializer.loads(entry[_VALUE])
+
+        return entry[_VALUE]
+
     def store(self, key, value, expire):
         """Stores data
 
@@ -82,11 +151,160 @@ class Memory(object):
             value (obj): data to be cached
             expire (int): time to expire (s)
         """
-        if sys.getsizeof(value, 0) <= self._max_obj_size:
+        pickled = True
+        if self._mode == 'reference':
+            pickled = False
+        elif self._mode == 'freeze':
+            try:
+                value = freeze(value)
+                pickled = False
+            except TypeError:
+                pass
+
+        try:
+            serialized = self._serializer.dumps(value)
+        except Exception as e:
+            if pickled:
+                log.debug("Unable to cache '%s' (%s)" % (key, e,))
+                return
+            # NOTE(cfrademan): References are stored as is, the serializer
+            # is only used to account for the size of nested objects.
+            size = sys.getsizeof(value)
+        else:
+            size = len(serialized)
+
+        if size > self._max_obj_size:
+            return
+
+        entry = [serialized if pickled else value,
+                 monotonic() + expire, pickled, size, 1]
+
+        with self._lock:
+            self._insert(key, entry)
+
+    def incr(self, key, amount, initial, expire):
+        """Increments integer atomically
+
+        Args:
+            key (str): key associated with integer
+            amount (int): amount to increment, 0 returns current value
+            initial (int): value if not cached
+            expire (int): time to expire (s) when stored
+
+        Returns:
+            int: value after increment
+        """
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is not None and entry[_EXPIRE] > monotonic():
+                value = entry[_VALUE]
+                if entry[_PICKLED]:
+                    value = self._serializer.loads(value)
+                if not amount:
+                    return value
+            else:
+                value = initial
+
+            value += amount
+            # NOTE(cfrademan): Integers are immutable, never serialized.
+            self._insert(key, [value, monotonic() + expire, False,
+                               sys.getsizeof(value), 1])
+
+        return value
+
+    def delete(self, key):
+        """Deletes cached data
+
+        Args:
+            key (str): key associated with cached data
+        """
+        with self._lock:
             try:
-                self._cache.pop(key)
+                self._remove(key, self._cache[key])
             except KeyError:
-                if len(self._cache) >= self._max_objs:
-                    self._cache.popitem(last=False)
-            self._cache[key] = (pickle.dumps(value),
-                                now() + timedelta(seconds=expire),)
+                pass
+
+    def clear(self):
+        """Deletes all cached data"""
+        with self._lock:
+            self._cache = {}
+            self._heap = []
+            self._bytes = 0
+
+    def _insert(self, key, entry):
+        """Insert entry, evicting entries as required. Requires lock."""
+        size = entry[_SIZE]
+        try:
+            self._remove(key, self._cache[key])
+        except KeyError:
+            pass
+
+        while (self._cache and
+               (len(self._cache) >= self._max_objs or
+                self._bytes + size > self._max_bytes)):
+            self._evict()
+
+        self._cache[key] = entry
+        self._bytes += size
+        self._push(key, entry)
+
+        # NOTE(cfrademan): Heap contains entries replaced or removed,
+        # rebuild when mostly stale.
+        if len(self._heap) > 2 * len(self._cache) + 64:
+            self._heap = [item for item in self._heap
+                          if self._cache.get(item[3]) is item[4]]
+            heapify(self._heap)
+
+    def _priority(self, entry):
+        return self._inflation + entry[_FREQ] / entry[_SIZE]
+
+    def _push(self, key, entry):
+        self._seq += 1
+        heappush(self._heap, (self._priority(entry), entry[_FREQ],
+                              self._seq, key, entry,))
+
+    def _remove(self, key, entry):
+        del self._cache[key]
+        self._bytes -= entry[_SIZE]
+
+    def _evict(self):
+        now = monotonic()
+        while True:
+            priority, freq, seq, key, entry = heappop(self._heap)
+            if self._cache.get(key) is not entry:
+                # Stale, entry already replaced or removed.
+                continue
+
+            if entry[_EXPIRE] <= now:
+                self._remove(key, entry)
+                self._expirations += 1
+                return
+
+            if entry[_FREQ] != freq:
+                # Accessed since pushed, re-prioritize.
+                self._seq += 1
+                heappush(self._heap, (self._priority(entry), entry[_FREQ],
+                                      self._seq, key, entry,))
+                continue
+
+            self._inflation = priority
+            self._remove(key, entry)
+            self._evictions += 1
+            return
+
+    def stats(self):
+        """Returns cache statistics.
+
+        Counters are not locked and may be slightly inaccurate when
+        updated by multiple threads.
+
+        Returns:
+            dict: 'hits', 'misses', 'evictions', 'expirations', 'objects'
+                and 'bytes'.
+        """
+        return {'hits': self._hits,
+                'misses': self._misses,
+                'evictions': self._evictions,
+                'expirations': self._expirations,
+                'objects': len(self._cache),
+                'bytes': self._bytes}
@@ -29,7 +29,7 @@
 # THE POSSIBILITY OF SUCH DAMAGE.
 
 class NoCache(object):
-    def __init__(self, max_objs=5000, max_obj_size=50):
+    def __init__(self, max_objs=5000, max_obj_size=50, **kwargs):
         pass
 
     def load(self, key):
@@ -37,3 +37,6 @@ class NoCache(object):
 
     def store(self, key, value, expire):
         pass
+
+    def delete(self, key):
+        pass
@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2018 Christiaan Frans Rademan.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# * Neither the name of the copyright holders nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+import pickle
+import struct
+import marshal
+
+from luxon.utils import js
+from luxon.utils.imports import get_class
+
+# Header of pickles with out-of-band buffers, followed by number of buffers
+# and their lengths. Pickles start with the PROTO opcode b'\x80'.
+_BUFFERS = b'B'
+_COUNT = struct.Struct('<I')
+_LENGTH = struct.Struct('<Q')
+
+
+class Pickle(object):
+    """Pickle serializer.
+
+    Supports most Python objects. Uses the highest pickle protocol.
+
+    Objects supporting out-of-band buffers, such as numpy arrays and
+    pickle.PickleBuffer, are serialized without copying the buffers into
+    the pickle stream. The buffers are appended after the pickle.
+    """
+    __slots__ = ()
+
+    def dumps(self, obj):
+        buffers = []
+        data = pickle.dumps(obj, pickle.HIGHEST_PROTOCOL,
+                            buffer_callback=buffers.append)
+        if not buffers:
+            return data
+
+        raws = [buffer.raw() for buffer in buffers]
+        return b''.join([_BUFFERS, _COUNT.pack(len(raws)),
+                         b''.join(_LENGTH.pack(raw.nbytes) for raw in raws),
+                         _LENGTH.pack(len(data)), data] + raws)
+
+    def loads(self, data):
+        if data[:1] != _BUFFERS:
+            return pickle.loads(data)
+
+        data = memoryview(data)
+        count, = _COUNT.unpack_from(data, 1)
+        pos = 1 + _COUNT.size
+        lengths = [_LENGTH.unpack_from(data, pos + idx * _LENGTH.size)[0]
+                   for idx in range(count + 1)]
+        pos += len(lengths) * _LENGTH.size
+
+        pickled = data[pos:pos + lengths[-1]]
+        pos += lengths[-1]
+        buffers = []
+        for length in lengths[:-1]:
+            buffers.append(data[pos:pos + length])
+            pos += length
+
+        return pickle.loads(pickled, buffers=buffers)
+
+
+class Marshal(object):
+    """Marshal serializer.
+
+    Fastest for plain containers of None, bool, int, float, complex, str,
+    bytes, tuple, list, set, frozenset and dict. Other objects raise
+    ValueError. The format may change between Python versions, processes
+    sharing a cache must use the same version.
+    """
+    __slots__ = ()
+
+    def dumps(self, obj):
+        return marshal.dumps(obj)
+
+    def loads(self, data):
+        return marshal.loads(data)
+
+
+class Json(object):
+    """JSON serializer.
+
+    Uses luxon.utils.js, allowing other languages to read cached objects.
+    Tuples are loaded as lists, Decimal and datetime objects as strings.
+    """
+    __slots__ = ()
+
+    def dumps(self, obj):
+        return js.dumps(obj, indent=None).encode('utf-8')
+
+    def loads(self, data):
+        return js.loads(bytes(data))
+
+
+SERIALIZERS = {
+    'pickle': Pickle,
+    'marshal': Marshal,
+    'json': Json,
+}
+
+
+def serializer(name='pickle'):
+    """Returns cache serializer.
+
+    Args:
+        name (str): 'pickle', 'marshal', 'json' or 'module:Class' of custom
+            serializer with 'dumps' and 'loads' methods.
+    """
+    try:
+        return SERIALIZERS[name]()
+    except KeyError:
+        if ':' not in name:
+            raise ValueError("Invalid cache serializer '%s'" % name) from None
+
+    return get_class(name)()
@@ -0,0 +1,313 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2018 Christiaan Frans Rademan.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# * Neither the name of the copyright holders nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+import os
+import mmap
+import time
+import fcntl
+import struct
+import threading
+from hashlib import blake2b
+
+from luxon import g
+from luxon.core.logger import GetLogger
+from luxon.core.cache.serializers import serializer as get_serializer
+
+log = GetLogger(__name__)
+
+_MAGIC = b'LXSHMC01'
+# Magic, sets, ways, slot size.
+_HEADER = struct.Struct('8sIII')
+_HEADER_SIZE = 64
+# Key hash, expire, last access, key length, value length.
+_SLOT = struct.Struct('QddII')
+# Maximum key length in bytes.
+_MAX_KEY = 256
+# Slots per set.
+_WAYS = 8
+# Thread locks per process, shared by sets.
+_THREAD_LOCKS = 64
+
+
+def _hash(key):
+    # NOTE(cfrademan): Python hash() is randomized per interpreter, the
+    # hash must be the same for all processes using the file.
+    value = int.from_bytes(blake2b(key, digest_size=8).digest(), 'little')
+    # Zero marks an empty slot.
+    return value or 1
+
+
+class SharedMemory(object):
+    """Shared Memory Cache.
+
+    Caches objects in a memory mapped file shared by all processes on the
+    host, such as workers of the web server. Cached objects are therefore
+    warmed once for all workers. Objects are serialized, by default with
+    pickle.
+
+    The file is a hash table of sets with 8 slots each. A key is only
+    stored in the set selected by its hash. When a set is full, an expired
+    slot or otherwise the least recently used slot of the set is replaced.
+    Each set is locked individually using fcntl record locks across
+    processes and thread locks within a process.
+
+    Each slot is large enough for the maximum object size. The file is
+    sparse, slots only use memory once written to.
+
+    Keyword Args:
+        max_objs (int): Maximum number of objects.
+        max_obj_size (int): Maximum size of serialized object in Kbytes.
+        path (str): Location of file. Defaults to 'cache.db' in the
+            application 'tmp' directory.
+        serializer (str): 'pickle', 'marshal' or 'json'. See
+            luxon.core.cache.serializers.
+    """
+    def __init__(self, max_objs=5000, max_obj_size=50, path=None,
+                 serializer='pickle', **kwargs):
+        if path is None:
+            path = os.path.join(g.app.path, 'tmp', 'cache.db')
+
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        self._serializer = get_serializer(serializer)
+        self._sets = max(1, -(-max_objs // _WAYS))
+        self._slot_size = _SLOT.size + _MAX_KEY + 1024 * max_obj_size
+        self._set_size = self._slot_size * _WAYS
+        size = _HEADER_SIZE + self._sets * self._set_size
+
+        self._fd = os.open(path, os.O_CREAT | os.O_RDWR, 0o600)
+        fcntl.lockf(self._fd, fcntl.LOCK_EX, _HEADER_SIZE, 0)
+        try:
+            header = os.pread(self._fd, _HEADER.size, 0)
+            geometry = (_MAGIC, self._sets, _WAYS, self._slot_size,)
+            if (len(header) < _HEADER.size or
+                    _HEADER.unpack(header) != geometry or
+                    os.fstat(self._fd).st_size != size):
+                # NOTE(cfrademan): New file or different settings,
+                # truncating discards all entries.
+                os.ftruncate(self._fd, 0)
+                os.ftruncate(self._fd, size)
+                os.pwrite(self._fd, _HEADER.pack(*geometry), 0)
+        finally:
+            fcntl.lockf(self._fd, fcntl.LOCK_UN, _HEADER_SIZE, 0)
+
+        self._mmap = mmap.mmap(self._fd, size)
+        self._pid = None
+        self._thread_locks = None
+        log.info('Shared Memory Cache Initialized' +
+                 ' path=%s' % (path,) +
+                 ' max_objs=%s' % (self._sets * _WAYS,) +
+                 ' max_obj_size=%sKbytes' % (max_obj_size,))
+
+    def _lock(self, index):
+        pid = os.getpid()
+        if self._pid != pid:
+            # NOTE(cfrademan): Thread locks held while forking would
+            # remain locked in the worker.
+            self._thread_locks = [threading.Lock()
+                                  for lock in range(_THREAD_LOCKS)]
+            self._pid = pid
+
+        return _SetLock(self._fd,
+                        self._thread_locks[index % _THREAD_LOCKS],
+                        _HEADER_SIZE + index * self._set_size)
+
+    def _find(self, key_hash, key, start):
+        """Returns position of slot for key or None."""
+        mm = self._mmap
+        for way in range(_WAYS):
+            pos = start + way * self._slot_size
+            slot_hash, expire, access, key_len, value_len = \
+                _SLOT.unpack_from(mm, pos)
+            if slot_hash == key_hash:
+                key_pos = pos + _SLOT.size
+                if mm[key_pos:key_pos + key_len] == key:
+                    return pos
+        return None
+
+    def load(self, key):
+        """Loads cached data from key
+
+        Args:
+            key (str): key for required data
+        """
+        key = key.encode('utf-8')
+        key_hash = _hash(key)
+        index = key_hash % self._sets
+        start = _HEADER_SIZE + index * self._set_size
+
+        with self._lock(index):
+            value = self._read(key_hash, key, start)
+
+        if value is not None:
+            return self._serializer.loads(value)
+
+    def store(self, key, value, expire):
+        """Stores data
+
+        Args:
+            key (str): key associated with cached data
+            value (obj): data to be cached
+            expire (int): time to expire (s)
+        """
+        try:
+            value = self._serializer.dumps(value)
+        except Exception as e:
+            log.debug("Unable to cache '%s' (%s)" % (key, e,))
+            return
+
+        key = key.encode('utf-8')
+        if (len(key) > _MAX_KEY or
+                _SLOT.size + _MAX_KEY + len(value) > self._slot_size):
+            return
+
+        key_hash = _hash(key)
+        index = key_hash % self._sets
+        start = _HEADER_SIZE + index * self._set_size
+
+        with self._lock(index):
+            self._write(key_hash, key, start, value, expire)
+
+    def incr(self, key, amount, initial, expire):
+        """Increments integer atomically for all processes
+
+        Args:
+            key (str): key associated with integer
+            amount (int): amount to increment, 0 returns current value
+            initial (int): value if not cached
+            expire (int): time to expire (s) when stored
+
+        Returns:
+            int: value after increment
+        """
+        key = key.encode('utf-8')
+        key_hash = _hash(key)
+        index = key_hash % self._sets
+        start = _HEADER_SIZE + index * self._set_size
+
+        with self._lock(index):
+            value = self._read(key_hash, key, start)
+            if value is not None:
+                value = self._serializer.loads(value)
+                if not amount:
+                    return value
+            else:
+                value = initial
+
+            value += amount
+            self._write(key_hash, key, start, self._serializer.dumps(value),
+                        expire)
+
+        return value
+
+    def _read(self, key_hash, key, start):
+        """Returns serialized value or None. Requires set lock."""
+        pos = self._find(key_hash, key, start)
+        if pos is None:
+            return None
+
+        slot_hash, expire, access, key_len, value_len = \
+            _SLOT.unpack_from(self._mmap, pos)
+        now = time.time()
+        if expire <= now:
+            _SLOT.pack_into(self._mmap, pos, 0, 0.0, 0.0, 0, 0)
+            return None
+
+        _SLOT.pack_into(self._mmap, pos, slot_hash, expire, now,
+                        key_len, value_len)
+        value_pos = pos + _SLOT.size + key_len
+        return self._mmap[value_pos:value_pos + value_len]
+
+    def _write(self, key_hash, key, start, value, expire):
+        """Writes serialized value. Requires set lock."""
+        mm = self._mmap
+        now = time.time()
+        pos = self._find(key_hash, key, start)
+        if pos is None:
+            # Replace empty, expired or least recently used slot.
+            oldest = None
+            for way in range(_WAYS):
+                slot_pos = start + way * self._slot_size
+                slot_hash, slot_expire, access, key_len, value_len = \
+                    _SLOT.unpack_from(mm, slot_pos)
+                if slot_hash == 0 or slot_expire <= now:
+                    pos = slot_pos
+                    break
+                if oldest is None or access < oldest:
+                    oldest = access
+                    pos = slot_pos
+
+        # NOTE(cfrademan): Invalidate slot while written, the header is
+        # written last.
+        _SLOT.pack_into(mm, pos, 0, 0.0, 0.0, 0, 0)
+        data_pos = pos + _SLOT.size
+        mm[data_pos:data_pos + len(key)] = key
+        mm[data_pos + len(key):data_pos + len(key) + len(value)] = value
+        _SLOT.pack_into(mm, pos, key_hash, now + expire, now, len(key),
+                        len(value))
+
+    def delete(self, key):
+        """Deletes cached data
+
+        Args:
+            key (str): key associated with cached data
+        """
+        key = key.encode('utf-8')
+        key_hash = _hash(key)
+        index = key_hash % self._sets
+        start = _HEADER_SIZE + index * self._set_size
+
+        with self._lock(index):
+            pos = self._find(key_hash, key, start)
+            if pos is not None:
+                _SLOT.pack_into(self._mmap, pos, 0, 0.0, 0.0, 0, 0)
+
+
+class _SetLock(object):
+    """Locks set for threads of process and other processes."""
+    __slots__ = ('_fd', '_thread_lock', '_start')
+
+    def __init__(self, fd, thread_lock, start):
+        self._fd = fd
+        self._thread_lock = thread_lock
+        self._start = start
+
+    def __enter__(self):
+        self._thread_lock.acquire()
+        try:
+            fcntl.lockf(self._fd, fcntl.LOCK_EX, 1, self._start)
+        except Exception:
+            self._thread_lock.release()
+            raise
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        try:
+            fcntl.lockf(self._fd, fcntl.LOCK_UN, 1, self._start)
+        finally:
+            self._thread_lock.release()
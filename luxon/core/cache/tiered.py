@@ -0,0 +1,256 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2018 Christiaan Frans Rademan.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# * Neither the name of the copyright holders nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+import os
+import time
+import threading
+from uuid import uuid4
+
+from luxon.core.logger import GetLogger
+from luxon.core.cache.memory import Memory
+from luxon.core.cache.rd import Redis
+
+log = GetLogger(__name__)
+
+# Redis channel for invalidations.
+CHANNEL = 'cache:invalidate'
+
+
+class Tiered(object):
+    """Two Tier Cache.
+
+    In process Memory cache (L1) in front of the Redis cache (L2). Loads
+    found in L1 never reach Redis. Objects are kept in L1 for at most
+    'l1_expire' seconds.
+
+    Stores and deletes are published on a Redis channel, which every
+    process subscribes to in a background thread, so other processes
+    remove the object from their L1. Invalidations missed, for example
+    while reconnecting to Redis, are bounded by 'l1_expire'.
+
+    Keyword Args:
+        max_objs (int): Maximum number of objects in L1.
+        max_obj_size (int): Maximum size of serialized object in Kbytes.
+        mode (str): L1 memory cache mode. See Memory.
+        max_bytes (int): Maximum size of L1 in bytes.
+        l1_expire (int): Maximum seconds objects are kept in L1.
+        compress_threshold (int): Minimum size of serialized object in
+            bytes compressed in Redis. See Redis.
+        serializer (str): 'pickle', 'marshal' or 'json'. See
+            luxon.core.cache.serializers.
+        client (redis.StrictRedis): Redis client, defaults to client
+            configured in the 'redis' section of settings.ini.
+    """
+    def __init__(self, max_objs=5000, max_obj_size=50, mode='pickle',
+                 max_bytes=0, l1_expire=5, compress_threshold=1024,
+                 client=None, serializer='pickle', **kwargs):
+        self._l1 = Memory(max_objs, max_obj_size, mode=mode,
+                          max_bytes=max_bytes, serializer=serializer)
+        self._l2 = Redis(max_objs, max_obj_size,
+                         compress_threshold=compress_threshold,
+                         client=client, serializer=serializer)
+        self._l1_expire = l1_expire
+        self._origin = uuid4().hex.encode('utf-8')
+        self._invalidations = 0
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _subscribe(self):
+        pid = os.getpid()
+        if self._pid != pid:
+            with self._lock:
+                if self._pid != pid:
+                    # NOTE(cfrademan): Threads are not copied when forking
+                    # workers, each process subscribes on first use.
+                    self._l1.clear()
+                    thread = threading.Thread(target=self._listen,
+                                              name='cache_invalidate',
+                                              daemon=True)
+                    thread.start()
+                    self._pid = pid
+
+    def _listen(self):
+        while True:
+            try:
+                pubsub = self._l2.redis.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(CHANNEL)
+                # NOTE(cfrademan): Invalidations may have been missed before
+                # subscribing or while reconnecting.
+                self._l1.clear()
+                self._invalidations += 1
+                for message in pubsub.listen():
+                    if message.get('type') != 'message':
+                        continue
+                    data = message['data']
+                    if isinstance(data, str):
+                        data = data.encode('utf-8')
+                    origin, sep, keys = data.partition(b'\n')
+                    if origin != self._origin:
+                        self._invalidations += 1
+                        for key in keys.split(b'\n'):
+                            self._l1.delete(key.decode('utf-8'))
+            except Exception as e:
+                log.warning('Cache invalidation subscription failed (%s)' %
+                            (e,))
+                self._l1.clear()
+                time.sleep(1)
+
+    def _publish(self, *keys):
+        # NOTE(cfrademan): One message for all keys, seperated by newlines.
+        self._l2.redis.publish(CHANNEL,
+                               self._origin + b'\n' +
+                               '\n'.join(keys).encode('utf-8'))
+
+    def load(self, key):
+        """Loads cached data from key
+
+        Args:
+            key (str): key for required data
+        """
+        self._subscribe()
+
+        value = self._l1.load(key)
+        if value is not None:
+            return value
+
+        invalidations = self._invalidations
+        value = self._l2.load(key)
+        # NOTE(cfrademan): Object may have been replaced while loaded from
+        # Redis, rather not keep it in L1.
+        if value is not None and invalidations == self._invalidations:
+            self._l1.store(key, value, self._l1_expire)
+
+        return value
+
+    def load_many(self, keys):
+        """Loads cached data for keys
+
+        Keys not found in L1 are loaded from Redis in one round trip.
+
+        Args:
+            keys (list): keys for required data
+
+        Returns:
+            dict: Data by key, keys not cached are excluded.
+        """
+        self._subscribe()
+
+        values = {}
+        missing = []
+        for key in keys:
+            value = self._l1.load(key)
+            if value is not None:
+                values[key] = value
+            else:
+                missing.append(key)
+
+        if missing:
+            invalidations = self._invalidations
+            loaded = self._l2.load_many(missing)
+            if invalidations == self._invalidations:
+                for key, value in loaded.items():
+                    self._l1.store(key, value, self._l1_expire)
+            values.update(loaded)
+
+        return values
+
+    def store(self, key, value, expire):
+        """Stores data
+
+        Args:
+            key (str): key associated with cached data
+            value (obj): data to be cached
+            expire (int): time to expire (s)
+        """
+        self._subscribe()
+        self._l2.store(key, value, expire)
+        self._l1.store(key, value, min(expire, self._l1_expire))
+        self._publish(key)
+
+    def store_many(self, values, expire):
+        """Stores data for keys
+
+        Args:
+            values (dict): data to be cached by key
+            expire (int): time to expire (s)
+        """
+        if not values:
+            return
+
+        self._subscribe()
+        self._l2.store_many(values, expire)
+        for key, value in values.items():
+            self._l1.store(key, value, min(expire, self._l1_expire))
+        self._publish(*values)
+
+    def incr(self, key, amount, initial, expire):
+        """Increments integer atomically in Redis
+
+        Values read without incrementing are kept in L1.
+
+        Args:
+            key (str): key associated with integer
+            amount (int): amount to increment, 0 returns current value
+            initial (int): value if not cached
+            expire (int): time to expire (s) when stored
+
+        Returns:
+            int: value after increment
+        """
+        self._subscribe()
+
+        if not amount:
+            value = self._l1.load(key)
+            if value is not None:
+                return value
+
+        invalidations = self._invalidations
+        value = self._l2.incr(key, amount, initial, expire)
+        if amount:
+            self._l1.store(key, value, min(expire, self._l1_expire))
+            self._publish(key)
+        elif invalidations == self._invalidations:
+            self._l1.store(key, value, min(expire, self._l1_expire))
+
+        return value
+
+    def delete(self, key):
+        """Deletes cached data
+
+        Args:
+            key (str): key associated with cached data
+        """
+        self._subscribe()
+        self._l2.delete(key)
+        self._l1.delete(key)
+        self._publish(key)
+
+    def stats(self):
+        """Returns statistics of L1 cache."""
+        return self._l1.stats()
@@ -41,6 +41,11 @@ defaults = {
         'log_stdout': 'True',
         'log_level': 'WARNING',
         'debug': 'False',
+        'router_cache': 'False',
+        'router_lru_size': '0',
+        'etag_algorithm': 'md5',
+        'theme_poll': '0',
+        'theme_hash': 'False',
     },
     'restapi': {
         'url': 'http://127.0.0.1/infinitystone',
@@ -68,5 +73,37 @@ defaults = {
         'backend': 'luxon.core.cache:Memory',
         'max_objects': '5000',
         'max_object_size': '50',
+        'mode': 'pickle',
+        'max_bytes': '0',
+        'l1_expire': '5',
+        'stale': '0',
+        'lock': 'thread',
+        'compress_threshold': '1024',
+        'serializer': 'pickle',
+    },
+    'request': {
+        'spool_size': '1048576',
+        'max_body_size': '10485760',
+    },
+    'static': {
+        'max_age': '604800',
+        'max_files': '1000',
+        'max_file_size': '262144',
+        'max_bytes': '16777216',
+    },
+    'compression': {
+        'enabled': 'False',
+        'level': '6',
+        'min_size': '1024',
+        'content_types': 'text/html, text/plain, text/css, text/csv, '
+                         'text/xml, text/javascript, application/json, '
+                         'application/javascript, application/xml, '
+                         'image/svg+xml',
+    },
+    'asgi': {
+        'threads': '16',
+    },
+    'metrics': {
+        'enabled': 'False',
     },
 }
@@ -28,13 +28,19 @@
 # ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
 # THE POSSIBILITY OF SUCH DAMAGE.
 
+from contextvars import ContextVar
+
 from luxon.exceptions import NoContextError
-from luxon.structs.threaddict import ThreadDict
 
 
-_thread_globals = ThreadDict()
 _thread_items = ('current_request', )
 
+# NOTE(cfrademan): Context variables are unique per thread and per asyncio
+# task. Coroutines served concurrently on one thread each have their own
+# request.
+_thread_globals = {item: ContextVar(item) for item in _thread_items}
+_unset = object()
+
 _context_items = ('current_request',
                   'app', )
 
@@ -54,11 +60,17 @@ class Globals(object):
     __slots__ = ('__dict__',)
 
     def __init__(self):
-        self.__dict__ = _globals
+        object.__setattr__(self, '__dict__', _globals)
+
+    def __setattr__(self, attr, value):
+        try:
+            _thread_globals[attr].set(value)
+        except KeyError:
+            _globals[attr] = value
 
     def __delattr__(self, attr):
         try:
-            del _thread_globals[attr]
+            _thread_globals[attr].set(_unset)
         except KeyError:
             try:
                 del _globals[attr]
@@ -67,7 +79,10 @@ class Globals(object):
 
     def __getattr__(self, attr):
         try:
-            return _thread_globals[attr]
+            value = _thread_globals[attr].get(_unset)
+            if value is _unset:
+                raise KeyError(attr)
+            return value
         except KeyError:
             try:
                 return _globals[attr]
@@ -82,8 +97,7 @@ class Globals(object):
                                      attr + "'") from None
 
     def __contains__(self, attr):
-        return attr in _thread_globals or attr in _globals or hasattr(self,
-                                                                      attr)
+        return hasattr(self, attr)
 
 
 # All globals.... luxon.g = Application wide context.
@@ -0,0 +1,297 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2018 Christiaan Frans Rademan.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# * Neither the name of the copyright holders nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+import sys
+import asyncio
+import traceback
+import contextvars
+from io import BytesIO
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor
+
+from luxon import g
+from luxon.core.handlers.wsgi.application import Application as Wsgi
+from luxon.core.handlers.wsgi.request import Request
+from luxon.core.handlers.wsgi.response import Response
+from luxon.core.logger import GetLogger
+from luxon.core.metrics import Phases
+from luxon.utils.timer import Timer
+
+log = GetLogger(__name__)
+
+
+def _environ(scope, body):
+    """Returns WSGI environ for ASGI HTTP connection scope.
+
+    As per PEP-3333, allowing the Request and Response objects to be used
+    for ASGI.
+    """
+    server = scope.get('server') or ('localhost', 80,)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode(
+            'utf-8').decode('latin1'),
+        'PATH_INFO': scope['path'].encode('utf-8').decode('latin1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': 'HTTP/%s' % scope.get('http_version', '1.1'),
+        'wsgi.version': (1, 0,),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+
+    client = scope.get('client')
+    if client:
+        environ['REMOTE_ADDR'] = client[0]
+        environ['REMOTE_PORT'] = str(client[1])
+
+    for name, value in scope.get('headers', ()):
+        name = name.decode('latin1').upper().replace('-', '_')
+        value = value.decode('latin1')
+
+        if name not in ('CONTENT_TYPE', 'CONTENT_LENGTH',):
+            name = 'HTTP_' + name
+
+        if name in environ:
+            # NOTE(cfrademan): Combine repeated headers as per RFC 7230,
+            # except cookies which are seperated with a semicolon.
+            if name == 'HTTP_COOKIE':
+                value = environ[name] + '; ' + value
+            else:
+                value = environ[name] + ',' + value
+
+        environ[name] = value
+
+    return environ
+
+
+class Application(Wsgi):
+    """This class is part of the main entry point into the application.
+
+    Each instance provides a callable interface for ASGI HTTP connections.
+
+    Coroutine resources ('async def') are awaited on the event loop.
+    Middleware, policy, regular resources and rendering the response are run
+    in a thread pool, so they do not block other connections.
+
+    Args:
+        name (str): Unique Name for application. Use __name__ of module to
+            ensure root path for application can be found conveniantly.
+
+    Keyword Arguments:
+        app_root (str): Path to application root. (e.g. The location of
+            'settings.ini', 'policy.json' and overiding 'templates')
+    """
+    def __init__(self, name, path=None, ini=None, content_type=None):
+        super().__init__(name, path, ini, content_type)
+
+        # Thread pool for synchronous code.
+        self._executor = ThreadPoolExecutor(
+            max_workers=g.app.config.getint('asgi', 'threads',
+                                            fallback=16))
+
+        self._max_body_size = g.app.config.getint('request',
+                                                  'max_body_size',
+                                                  fallback=10485760)
+
+    async def __call__(self, scope, receive, send):
+        """Application Request Interface.
+
+        A clean request and response object is provided to the interface that
+        is unique to this connection.
+        """
+        if scope['type'] == 'lifespan':
+            return await self._lifespan(receive, send)
+
+        if scope['type'] != 'http':
+            raise ValueError("Unsupported ASGI scope type '%s'" %
+                             scope['type'])
+
+        body = await self._receive(receive)
+        if body is None:
+            # Client disconnected.
+            return
+
+        started = []
+
+        def start_response(status, headers, exc_info=None):
+            started[:] = [status, headers]
+
+        response = await self._process(_environ(scope, body),
+                                       start_response)
+
+        status, headers = started
+        await send({
+            'type': 'http.response.start',
+            'status': int(status[:3]),
+            'headers': [(name.lower().encode('latin1'),
+                         str(value).encode('latin1'),)
+                        for name, value in headers],
+        })
+
+        if isinstance(response._stream, bytes):
+            for chunk in response:
+                if chunk:
+                    await send({'type': 'http.response.body',
+                                'body': chunk,
+                                'more_body': True})
+        else:
+            # NOTE(cfrademan): Reading files and iterables may block.
+            chunks = iter(response)
+            while True:
+                chunk = await self._run(next, chunks, None)
+                if chunk is None:
+                    break
+                if chunk:
+                    await send({'type': 'http.response.body',
+                                'body': chunk,
+                                'more_body': True})
+
+        await send({'type': 'http.response.body',
+                    'body': b'',
+                    'more_body': False})
+
+    async def _process(self, environ, start_response):
+        request = response = None
+        target = None
+        phase = Phases()
+        try:
+            with Timer() as elapsed:
+                # Request Object.
+                request = g.current_request = Request(environ,
+                                                      start_response)
+
+                # Response Object.
+                response = Response(environ,
+                                    start_response)
+
+                # Set Response object for request.
+                request.response = response
+
+                # Route Object.
+                route = await self._run(self._route, request, response,
+                                        phase)
+                resource, r_kwargs, target, cache, cache_key, cached = route
+
+                if cached is not None:
+                    # Serve cached response without running view.
+                    self._load_response(response, cached)
+                elif asyncio.iscoroutinefunction(resource):
+                    # Await Routed Coroutine View.
+                    await self._view_async(request, response, resource,
+                                           r_kwargs, phase)
+                else:
+                    # Execute Routed View.
+                    await self._run(self._view, request, response,
+                                    resource, r_kwargs, phase)
+
+            # Return response object.
+            return await self._run(self._respond, request, response, route,
+                                   phase)
+
+        except Exception as exception:
+            trace = str(traceback.format_exc())
+            await self._run(self.handle_error, request, response,
+                            exception, trace)
+            # Return response object.
+            return response()
+        finally:
+            # Completed Request
+            log.info('Completed Request',
+                     timer=elapsed())
+
+            if self._metrics is not None:
+                self._observe(target, response, phase)
+
+    async def _view_async(self, request, response, resource, r_kwargs,
+                          phase):
+        """Await routed coroutine view with 'resource' and 'post'
+        middleware."""
+        try:
+            await self._run(self._middleware_resource, request, response,
+                            resource, phase)
+            if await self._run(self._validate, request, response,
+                               resource, r_kwargs):
+                # Conditional request not modified, skip view.
+                response.not_modified()
+                return
+            # Run View coroutine.
+            view = await resource(request,
+                                  response,
+                                  **r_kwargs)
+            phase('view')
+            if view is not None:
+                response.body(view)
+                phase('serialize')
+        finally:
+            await self._run(self._middleware_post, request, response, phase)
+
+    async def _run(self, func, *args):
+        """Run function in thread pool.
+
+        The function is run in a copy of the current context, so that
+        'g.current_request' refers to the request of the connection.
+        """
+        context = contextvars.copy_context()
+        loop = asyncio.get_event_loop()
+        return await loop.run_in_executor(self._executor,
+                                          partial(context.run, func, *args))
+
+    async def _receive(self, receive):
+        """Returns request body or None if client disconnected."""
+        body = []
+        size = 0
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return None
+
+            # NOTE(cfrademan): Oversize bodies are not buffered beyond the
+            # maximum, the request stream raises HTTPPayloadTooLarge.
+            if not self._max_body_size or size <= self._max_body_size:
+                chunk = message.get('body', b'')
+                body.append(chunk)
+                size += len(chunk)
+            if not message.get('more_body', False):
+                return b''.join(body)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self._executor.shutdown(wait=True)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
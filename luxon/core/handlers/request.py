@@ -43,6 +43,7 @@ class RequestBase(object):
         '_cached_id',
         '_cached_auth',
         '_cached_policy',
+        '_cached_memo',
         '_context',
     )
 
@@ -50,6 +51,7 @@ class RequestBase(object):
         self._cached_id = None
         self._cached_auth = None
         self._cached_policy = None
+        self._cached_memo = None
         self._context = Container()
 
     def __repr__(self):
@@ -70,6 +72,16 @@ class RequestBase(object):
     def context(self):
         return self._context
 
+    @property
+    def memo(self):
+        """Results memoized for the request by namespace.
+
+        See luxon.helpers.memoize.
+        """
+        if self._cached_memo is None:
+            self._cached_memo = {}
+        return self._cached_memo
+
     @property
     def credentials(self):
         """Credentials"""
@@ -28,6 +28,7 @@
 # ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
 # THE POSSIBILITY OF SUCH DAMAGE.
 import traceback
+from io import BytesIO
 
 from luxon import g, router
 from luxon.core.app import App
@@ -36,18 +37,55 @@ from luxon.core.handlers.wsgi.response import Response
 from luxon.exceptions import (Error, NotFoundError,
                               AccessDeniedError, JSONDecodeError,
                               ValidationError, FieldError,
-                              HTTPError)
+                              HTTPError, HTTPInvalidHeader)
 from luxon.utils.html5 import error_page, error_ajax
 from luxon import render_template
 from luxon.core.logger import GetLogger
 from luxon.constants import TEXT_HTML, TEXT_PLAIN
 from luxon.utils.objects import object_name
 from luxon.utils.timer import Timer
-from luxon.utils.http import etagger
+from luxon.utils.http import etagger, accept_encoding, ETags
+from luxon.utils.hashing import md5sum
+from luxon.core.cache import Cache
+from luxon.core.metrics import Metrics, Phases
 from luxon.core import register
 
 log = GetLogger(__name__)
 
+# NOTE(cfrademan): Request headers which responses are always cached on.
+# Along with the headers in the Vary header of the response, responses
+# depend on the credentials of the user and context for APIs.
+_RESPONSE_CACHE_HEADERS = ('accept',
+                           'authorization',
+                           'content-type',
+                           'cookie',
+                           'x-auth-token',
+                           'x-domain',
+                           'x-interface',
+                           'x-region',
+                           'x-requested-with',
+                           'x-tenant-id',)
+
+# Request headers with credentials, responses are private.
+_CREDENTIAL_HEADERS = ('Authorization', 'X-Auth-Token',)
+
+
+def _add_vary(resp, *headers):
+    """Add request headers to Vary header of response."""
+    vary = resp.get_header('Vary')
+    if vary is None:
+        resp.set_header('Vary', ', '.join(headers))
+        return
+
+    names = [name.strip().lower() for name in vary.split(',')]
+    if '*' in names:
+        return
+
+    for header in headers:
+        if header.lower() not in names:
+            vary += ', ' + header
+    resp.set_header('Vary', vary)
+
 
 class Application(object):
     """This class is part of the main entry point into the application.
@@ -71,6 +109,44 @@ class Application(object):
             if content_type is not None:
                 Response._DEFAULT_CONTENT_TYPE = content_type
 
+            # Cache compiled routing logic in application tmp.
+            if g.app.config.getboolean('application', 'router_cache',
+                                       fallback=False):
+                router.cache_path = g.app.path + '/tmp'
+
+            # Hash algorithm for generating etags from response body.
+            self._etag_algorithm = g.app.config.get('application',
+                                                    'etag_algorithm',
+                                                    fallback='md5')
+
+            # LRU cache of found routes per method.
+            router.lru_size = g.app.config.getint('application',
+                                                  'router_lru_size',
+                                                  fallback=0)
+
+            # Compress responses negotiated from Accept-Encoding.
+            self._compression = g.app.config.getboolean('compression',
+                                                        'enabled',
+                                                        fallback=False)
+            self._compression_level = g.app.config.getint('compression',
+                                                          'level',
+                                                          fallback=6)
+            self._compression_min_size = g.app.config.getint('compression',
+                                                             'min_size',
+                                                             fallback=1024)
+            self._compression_types = frozenset(
+                content_type.strip().lower() for content_type in
+                g.app.config.get('compression', 'content_types',
+                                 fallback='').split(',')
+            )
+
+            # Request timing metrics per phase.
+            if g.app.config.getboolean('metrics', 'enabled',
+                                       fallback=False):
+                self._metrics = Metrics()
+            else:
+                self._metrics = None
+
             # Started Application
             log.info('Started Application'
                      ' %s' % name +
@@ -91,6 +167,9 @@ class Application(object):
 
         Response object is returned.
         """
+        request = response = None
+        target = None
+        phase = Phases()
         try:
             with Timer() as elapsed:
                 # Request Object.
@@ -104,106 +183,19 @@ class Application(object):
                 # Set Response object for request.
                 request.response = response
 
-                # Debug output
-                if g.app.debug is True:
-                    log.info('Request %s' % request.route +
-                             ' Method %s\n' % request.method)
-
-                # Process the middleware 'pre' method before routing it
-                for middleware in register._middleware_pre:
-                    middleware(request, response)
-
                 # Route Object.
-                resource, method, r_kwargs, target, tag, cache = router.find(
-                    request.method,
-                    request.route)
-
-                # Route Kwargs in requests.
-                request.route_kwargs = r_kwargs
-
-                # Set route tag in requests.
-                request.tag = tag
-
-                # If route tagged validate with policy
-                if tag is not None:
-                    if not request.policy.validate(tag):
-                        raise AccessDeniedError("Access Denied by" +
-                                                " policy '%s'" % tag)
+                route = self._route(request, response, phase)
+                resource, r_kwargs, target, cache, cache_key, cached = route
 
-                # Execute Routed View.
-                try:
-                    # Process the middleware 'resource' after routing it
-                    for middleware in register._middleware_resource:
-                        middleware(request, response)
-                    # Run View method.
-                    if resource is not None:
-                        view = resource(request,
-                                        response,
-                                        **r_kwargs)
-                        if view is not None:
-                            response.body(view)
-                    else:
-                        raise NotFoundError("Route not found" +
-                                            " Method '%s'" % request.method +
-                                            " Route '%s'" % request.route)
-                finally:
-                    # Process the middleware 'post' at the end
-                    for middleware in register._middleware_post:
-                        middleware(request, response)
-
-            # Cache GET Response.
-            # Only cache for GET responses!
-            if cache > 0 and request.method == 'GET':
-                # Get session_id if any for Caching
-                session_id = request.cookies.get(request.host)
-
-                # NOTE(cfrademan): Instruct to use cache but revalidate on,
-                # stale cache entry. Expire remote cache in same duration
-                # as internal cache.
-                if session_id:
-                    response.set_header(
-                        "cache-control",
-                        "must-revalidate, private, max-age=" + str(cache)
-                    )
+                if cached is not None:
+                    # Serve cached response without running view.
+                    self._load_response(response, cached)
                 else:
-                    response.set_header(
-                        "cache-control",
-                        "must-revalidate, max-age=" + str(cache)
-                    )
-
-                # Set Vary Header
-                # NOTE(cfrademan): Client should uniquely cache
-                # based these request headers.
-                response.set_header('Vary',
-                                    'Cookie, Accept-Encoding' +
-                                    ', Content-Type')
-
-                # Set Etag
-                # NOTE(cfrademan): Needed Encoding for Different Etag.
-                if isinstance(response._stream, bytes):
-                    encoding = request.get_header('Accept-Encoding')
-                    response.etag.set(etagger(response._stream, encoding))
-
-                # If Etag matches do not return full body use
-                # external/user-agent cache.
-                if (len(request.if_none_match) > 0 and
-                        request.if_none_match in response.etag):
-                    # Etag matches do not return full body.
-                    response.not_modified()
-
-                # NOTE(cfrademan): Use last_modified as last resort for
-                # external/user-agent cache.
-                elif (request.if_modified_since and
-                      response.last_modified and
-                      request.if_modified_since <= response.last_modified):
-                    # Last-Modified matches do not return full body.
-                    response.not_modified()
-            else:
-                response.set_header("cache-control",
-                                    "no-store, no-cache, max-age=0")
+                    # Execute Routed View.
+                    self._view(request, response, resource, r_kwargs, phase)
 
             # Return response object.
-            return response()
+            return self._respond(request, response, route, phase)
 
         except HTTPError as exception:
             trace = str(traceback.format_exc())
@@ -228,6 +220,413 @@ class Application(object):
             log.info('Completed Request',
                      timer=elapsed())
 
+            if self._metrics is not None:
+                self._observe(target, response, phase)
+
+    def _route(self, request, response, phase):
+        """Route request.
+
+        Processes the 'pre' middleware, finds the route and validates it
+        with policy. Cached GET responses are loaded for cached routes.
+
+        Returns:
+            tuple: (resource, route kwargs, route, cache, vary cache key,
+                cached response)
+        """
+        # Debug output
+        if g.app.debug is True:
+            log.info('Request %s' % request.route +
+                     ' Method %s\n' % request.method)
+
+        if request.env.get('CONTENT_LENGTH'):
+            # NOTE(cfrademan): Raises HTTPPayloadTooLarge if Content-Length
+            # exceeds 'max_body_size', before middleware and views are run.
+            request.stream
+
+        # Process the middleware 'pre' method before routing it
+        for middleware in register._middleware_pre:
+            middleware(request, response)
+        phase('middleware_pre')
+
+        # Route Object.
+        resource, method, r_kwargs, target, tag, cache = router.find(
+            request.method,
+            request.route)
+        phase('route')
+
+        # Route Kwargs in requests.
+        request.route_kwargs = r_kwargs
+
+        # Set route tag in requests.
+        request.tag = tag
+
+        # If route tagged validate with policy
+        if tag is not None:
+            if not request.policy.validate(tag):
+                raise AccessDeniedError("Access Denied by" +
+                                        " policy '%s'" % tag)
+        phase('policy')
+
+        # Load Cached GET Response.
+        # Only cache for GET responses!
+        cache_key = cached = None
+        if cache > 0 and request.method == 'GET':
+            # NOTE(cfrademan): The request headers the response varies on
+            # are stored per URL, the response per value of these headers.
+            cache_key = self._response_vary_key(request)
+            vary = Cache().load(cache_key)
+            if vary is not None:
+                cached = Cache().load(self._response_cache_key(request,
+                                                               vary))
+            phase('cache_load')
+
+        return (resource, r_kwargs, target, cache, cache_key, cached,)
+
+    def _view(self, request, response, resource, r_kwargs, phase):
+        """Execute routed view with 'resource' and 'post' middleware.
+
+        Conditional requests are validated after the 'resource' middleware,
+        the view is skipped when not modified.
+        """
+        try:
+            self._middleware_resource(request, response, resource, phase)
+            if self._validate(request, response, resource, r_kwargs):
+                # Conditional request not modified, skip view.
+                response.not_modified()
+                return
+            # Run View method.
+            view = resource(request,
+                            response,
+                            **r_kwargs)
+            phase('view')
+            if view is not None:
+                response.body(view)
+                phase('serialize')
+        finally:
+            self._middleware_post(request, response, phase)
+
+    def _middleware_resource(self, request, response, resource, phase):
+        # Process the middleware 'resource' after routing it
+        for middleware in register._middleware_resource:
+            middleware(request, response)
+        phase('middleware_resource')
+
+        if resource is None:
+            raise NotFoundError("Route not found" +
+                                " Method '%s'" %
+                                request.method +
+                                " Route '%s'" % request.route)
+
+    def _middleware_post(self, request, response, phase):
+        # Process the middleware 'post' at the end
+        for middleware in register._middleware_post:
+            middleware(request, response)
+        phase('middleware_post')
+
+    def _respond(self, request, response, route, phase):
+        """Set cache headers, store cacheable response and start response.
+
+        Returns:
+            Response object.
+        """
+        cache, cache_key, cached = route[3:]
+
+        if self._compression:
+            self._compress(request, response)
+            phase('compress')
+
+        # Cache GET Response.
+        # Only cache for GET responses!
+        if cached is None and cache > 0 and request.method == 'GET':
+            # Get session_id if any for Caching
+            session_id = request._cookies.get(request.host)
+            credentials = any(request.get_header(header)
+                              for header in _CREDENTIAL_HEADERS)
+
+            # NOTE(cfrademan): Instruct to use cache but revalidate on,
+            # stale cache entry. Expire remote cache in same duration
+            # as internal cache.
+            if session_id or credentials:
+                response.set_header(
+                    "cache-control",
+                    "must-revalidate, private, max-age=" + str(cache)
+                )
+            else:
+                response.set_header(
+                    "cache-control",
+                    "must-revalidate, max-age=" + str(cache)
+                )
+
+            # Set Vary Header
+            # NOTE(cfrademan): Client should uniquely cache
+            # based these request headers, in addition to any set by the
+            # resource.
+            _add_vary(response, 'Cookie', 'Accept-Encoding', 'Content-Type')
+
+            # Set Etag
+            # NOTE(cfrademan): Needed Encoding for Different Etag.
+            if (isinstance(response._stream, bytes) and
+                    len(response.etag) == 0):
+                encoding = request.get_header('Accept-Encoding')
+                response.etag.set(etagger(response._stream, encoding,
+                                          algorithm=self._etag_algorithm))
+
+            # Store response in cache for subsequent requests.
+            self._store_response(request, response, cache_key, cache)
+            phase('cache_store')
+
+        if cache > 0 and request.method == 'GET':
+            # If Etag or Last-Modified matches do not return full body
+            # use external/user-agent cache.
+            if self._not_modified(request, response):
+                response.not_modified()
+        elif response.get_header('cache-control') is None:
+            # NOTE(cfrademan): Resources may provide their own
+            # cache-control, e.g. static files.
+            response.set_header("cache-control",
+                                "no-store, no-cache, max-age=0")
+
+        # Serve byte ranges requested.
+        self._partial(request, response)
+
+        result = response()
+        phase('response')
+        return result
+
+    def _observe(self, target, resp, phase):
+        """Record request timing metrics.
+
+        Metrics are labeled by route template rather than path to keep the
+        number of series bounded. Requests not routed have an empty route.
+        """
+        route = getattr(target, 'pattern', target) or ''
+        status = resp.status if resp is not None else 500
+        labels = (('route', route), ('status', status),)
+
+        for name, seconds in phase.timings:
+            self._metrics.observe('luxon_request_phase_seconds', seconds,
+                                  labels + (('phase', name),))
+
+        self._metrics.inc('luxon_requests_total', labels)
+        self._metrics.observe('luxon_request_seconds', phase.elapsed(),
+                              labels)
+
+    def _validate(self, req, resp, resource, r_kwargs):
+        """Evaluate validators of resource for conditional requests.
+
+        The 'etag' and 'last_modified' validators of the resource are
+        evaluated before the resource and set on the response.
+
+        Returns:
+            bool: True if content was not modified.
+        """
+        if req.method not in ('GET', 'HEAD',) or resource is None:
+            return False
+
+        etag = getattr(resource, 'etag', None)
+        if etag is not None:
+            value = etag(req, resp, **r_kwargs)
+            if value is not None:
+                resp.etag = value
+
+        last_modified = getattr(resource, 'last_modified', None)
+        if last_modified is not None:
+            value = last_modified(req, resp, **r_kwargs)
+            if value is not None:
+                resp.last_modified = value
+
+        if etag is None and last_modified is None:
+            return False
+
+        return self._not_modified(req, resp)
+
+    def _not_modified(self, req, resp):
+        """Compare conditional request headers with response validators.
+
+        If-None-Match takes precedence over If-Modified-Since. Etags of
+        responses compressed for the encoding negotiated also match.
+        Reference RFC 7232, Section 6.
+
+        Returns:
+            bool: True if content was not modified.
+        """
+        if len(req.if_none_match) > 0:
+            if req.if_none_match in resp.etag:
+                return True
+
+            encoding = None
+            if self._compression and len(resp.etag._strong) > 0:
+                encoding = accept_encoding(req.get_header('Accept-Encoding'))
+
+            if encoding is not None:
+                variant = ['"%s-%s"' % (etag, encoding)
+                           for etag in resp.etag._strong]
+                if req.if_none_match in ETags(variant):
+                    # NOTE(cfrademan): Validate the compressed
+                    # representation cached by the client.
+                    resp.etag = variant
+                    _add_vary(resp, 'Accept-Encoding')
+                    return True
+
+            return False
+
+        # NOTE(cfrademan): Use last_modified as last resort for
+        # external/user-agent cache.
+        if req.if_modified_since and resp.last_modified:
+            return resp.last_modified <= req.if_modified_since
+
+        return False
+
+    def _compress(self, req, resp):
+        """Compress response body negotiated from Accept-Encoding.
+
+        Only '200 OK' responses of compressible content types are
+        compressed. Bodies of known length smaller than 'min_size' are
+        sent as is.
+        """
+        if (resp.status != 200 or resp._stream is None or
+                resp.get_header('Content-Encoding') is not None):
+            return
+
+        content_type = resp.content_type or ''
+        content_type = content_type.split(';')[0].strip().lower()
+        if content_type not in self._compression_types:
+            return
+
+        # Caches must store variants per Accept-Encoding.
+        _add_vary(resp, 'Accept-Encoding')
+
+        length = resp.content_length
+        if length is not None and length < self._compression_min_size:
+            return
+
+        encoding = accept_encoding(req.get_header('Accept-Encoding'))
+        if encoding is not None:
+            resp.compress(encoding, self._compression_level)
+
+    def _partial(self, req, resp):
+        """Respond with byte ranges requested as '206 Partial Content'.
+
+        Ranges are only served if If-Range matches the etag or
+        last-modified date of the response. Invalid ranges are ignored.
+        Reference RFC 7233.
+        """
+        if (req.method not in ('GET', 'HEAD',) or resp.status != 200 or
+                resp.content_length is None):
+            return
+
+        resp.set_header('Accept-Ranges', 'bytes')
+
+        if req.method != 'GET':
+            return
+
+        try:
+            ranges = req.ranges
+        except HTTPInvalidHeader:
+            return
+
+        if ranges is None:
+            return
+
+        if_range = req.if_range
+        if if_range is not None:
+            if if_range.startswith('W/'):
+                # Weak etags never match, strong comparison required.
+                return
+            elif if_range.startswith('"'):
+                if if_range not in resp.etag:
+                    return
+            else:
+                try:
+                    date = req.get_header_as_datetime('If-Range')
+                except HTTPInvalidHeader:
+                    return
+                if resp.last_modified is None or resp.last_modified != date:
+                    return
+
+        resp.partial(ranges)
+
+    def _response_vary_key(self, req):
+        """Returns cache key for headers responses to URL vary on."""
+        return 'response:vary:' + md5sum('\n'.join((req.host,
+                                                    req.route,
+                                                    req.query_string or '',)))
+
+    def _response_vary(self, resp):
+        """Returns request headers response varies on.
+
+        Returns None if the response may not be cached, 'Vary: *'.
+        """
+        vary = set(_RESPONSE_CACHE_HEADERS)
+        for name in (resp.get_header('Vary') or '').split(','):
+            name = name.strip().lower()
+            if name == '*':
+                return None
+            if name and name != 'accept-encoding':
+                vary.add(name)
+        return tuple(sorted(vary))
+
+    def _response_cache_key(self, req, vary):
+        """Returns cache key for response to request.
+
+        Responses are cached per route, query string and request headers
+        they vary on. These always include the credentials, context and
+        'Cookie' headers, so private responses are cached per user and
+        session.
+        """
+        key = [req.host, req.route, req.query_string or '']
+        for header in vary:
+            key.append(header + ':' + req.get_header(header, default=''))
+
+        encoding = req.get_header('Accept-Encoding', default='')
+        if self._compression:
+            # NOTE(cfrademan): Compressed variants are cached per encoding
+            # negotiated rather than per Accept-Encoding header value.
+            encoding = accept_encoding(encoding) or ''
+        key.append(encoding)
+
+        return 'response:' + md5sum('\n'.join(key))
+
+    def _store_response(self, req, resp, vary_key, expire):
+        """Store response in cache.
+
+        Only complete '200 OK' responses not setting cookies are cached.
+        """
+        if resp.status != 200 or resp._cookies is not None:
+            return
+
+        vary = self._response_vary(resp)
+        if vary is None:
+            return
+
+        if isinstance(resp._stream, bytes):
+            body = resp._stream
+        elif isinstance(resp._stream, BytesIO):
+            body = resp._stream.getvalue()
+        else:
+            return
+
+        headers = [(name, value) for name, value in resp._headers.items()
+                   if name != 'Etag']
+
+        Cache().store(vary_key, vary, expire)
+        Cache().store(self._response_cache_key(req, vary),
+                      (resp.status,
+                       headers,
+                       resp.get_header('etag'),
+                       resp.content_type,
+                       body,), expire)
+
+    def _load_response(self, resp, cached):
+        """Load cached response."""
+        status, headers, etag, content_type, body = cached
+        resp.status = status
+        resp.set_headers(headers)
+        if etag is not None:
+            resp.etag = etag
+        resp.content_type = content_type
+        resp.body(body)
+
     def handle_error(self, req, resp, exception, trace):
         # Parse Exceptions.
         resp.cache_control = "no-store, no-cache, max-age=0"
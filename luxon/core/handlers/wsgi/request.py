@@ -29,12 +29,14 @@
 # THE POSSIBILITY OF SUCH DAMAGE.
 
 import base64
-from cgi import FieldStorage
-from http.cookies import SimpleCookie, CookieError
 
 from luxon import g
-from luxon.utils.http import parse_forwarded_header, parse_cache_control_header
+from luxon.utils.http import (parse_forwarded_header,
+                              parse_cache_control_header,
+                              parse_cookie_header)
 from luxon.utils.files import FileObject
+from luxon.utils.multipart import Form
+from luxon.utils.useragent import classify
 from luxon.utils.uri import parse_qs, parse_host
 from luxon.utils import js
 from luxon.utils.cast import to_tuple
@@ -43,12 +45,95 @@ from luxon.utils.objects import dict_value_property
 from luxon.utils.text import blank_to_none
 from luxon.utils.imports import get_class
 from luxon.exceptions import (HTTPInvalidHeader,
-                              HTTPMissingHeader, HTTPMissingFormField)
+                              HTTPMissingHeader, HTTPMissingFormField,
+                              HTTPPayloadTooLarge)
 from luxon.core.session import Session
 from luxon.utils.http import ETags
 from luxon.core.handlers.request import RequestBase
 
 
+_WSGI_CONTENT_HEADERS = ('CONTENT_TYPE', 'CONTENT_LENGTH')
+
+# Header names to environ keys. Names are added on first use, common
+# headers are computed up front.
+_HEADER_KEYS = {}
+
+
+def _header_keys(name):
+    """Returns environ keys for header name, in order of lookup."""
+    try:
+        return _HEADER_KEYS[name]
+    except KeyError:
+        wsgi_name = name.upper().replace('-', '_')
+        if wsgi_name in _WSGI_CONTENT_HEADERS:
+            keys = ('HTTP_' + wsgi_name, wsgi_name,)
+        else:
+            keys = ('HTTP_' + wsgi_name,)
+
+        # NOTE(cfrademan): Bounded, names may originate from clients.
+        if len(_HEADER_KEYS) < 1024:
+            _HEADER_KEYS[name] = keys
+
+        return keys
+
+
+for _name in ('Accept', 'Accept-Encoding', 'Accept-Language',
+              'Authorization', 'Cache-Control', 'Content-Length',
+              'Content-Type', 'Cookie', 'Forwarded', 'Host', 'If-Match',
+              'If-Modified-Since', 'If-None-Match', 'If-Range',
+              'If-Unmodified-Since', 'Range', 'Referer', 'User-Agent',
+              'X-Auth-Token', 'X-Domain', 'X-Forwarded-For',
+              'X-Interface', 'X-Region', 'X-Requested-With',
+              'X-Tenant-Id'):
+    _header_keys(_name)
+    _header_keys(_name.lower())
+del _name
+
+
+class _BodyStream(object):
+    """Request body stream enforcing maximum size.
+
+    Reads never exceed Content-Length when provided. Bodies without
+    Content-Length (None) are counted while reading.
+    """
+    __slots__ = ('_stream', '_remaining', '_max_size', '_read')
+
+    def __init__(self, stream, length, max_size):
+        self._stream = stream
+        if length is None:
+            self._remaining = max_size + 1
+        else:
+            self._remaining = length
+        self._max_size = max_size
+        self._read = 0
+
+    def _size(self, size):
+        if size is None or size < 0 or size > self._remaining:
+            return self._remaining
+        return size
+
+    def _count(self, data):
+        self._read += len(data)
+        self._remaining -= len(data)
+        if self._read > self._max_size:
+            raise HTTPPayloadTooLarge(
+                'Request body exceeds %s bytes' % self._max_size)
+        return data
+
+    def read(self, size=-1):
+        if self._remaining <= 0:
+            return b''
+        return self._count(self._stream.read(self._size(size)))
+
+    def readline(self, size=-1):
+        if self._remaining <= 0:
+            return b''
+        return self._count(self._stream.readline(self._size(size)))
+
+    def __iter__(self):
+        return iter(self.readline, b'')
+
+
 class Request(RequestBase):
     """Represents a clients HTTP request.
 
@@ -213,11 +298,16 @@ class Request(RequestBase):
             an 'int' or None if the header is missing.
 
         stream: File-like input object for reading the body of the request.
+            Bodies larger than 'max_body_size' in the '[request]' section of
+            settings.ini raise HTTPPayloadTooLarge, either immediately
+            according to Content-Length or once exceeded while reading.
 
         json (object): JSON Payload as object.
 
-        form: cgi.FieldStorage() To get at submitted form data. As per Common
-            Gateway Interface support provided by Python natively.
+        form (Form): Submitted form data. Multipart and urlencoded bodies
+            are parsed incrementally on first access, uploads larger than
+            the 'spool_size' in the '[request]' section of settings.ini are
+            written to temporary files.
 
         form_dict (dict): Generated dictionary of form data submitted with
             field names as keys and values provided as either str, bytes or
@@ -270,7 +360,7 @@ class Request(RequestBase):
         is_bot (bool): If user-agent is detected as 'Bot' e.g Google Bot
         is_mobile (bool): If user-agent is detected as mobile. e.g. Iphone
     """
-    _WSGI_CONTENT_HEADERS = ('CONTENT_TYPE', 'CONTENT_LENGTH')
+    _WSGI_CONTENT_HEADERS = _WSGI_CONTENT_HEADERS
 
     __slots__ = (
         'tag',
@@ -291,6 +381,7 @@ class Request(RequestBase):
         '_cached_content_length',
         '_cached_params',
         '_cached_form',
+        '_cached_stream',
         '_cached_access_hops',
         '_cached_cookies',
         '_cached_is_mobile',
@@ -345,6 +436,7 @@ class Request(RequestBase):
         self._cached_content_length = None
         self._cached_params = None
         self._cached_form = None
+        self._cached_stream = None
         self._cached_access_hops = None
         self._cached_cookies = None
         self._cached_is_mobile = None
@@ -383,7 +475,22 @@ class Request(RequestBase):
 
     @property
     def stream(self):
-        return self.env.get('wsgi.input')
+        if self._cached_stream is None:
+            stream = self.env.get('wsgi.input')
+            max_size = g.app.config.getint('request', 'max_body_size',
+                                           fallback=10485760)
+            if max_size > 0 and stream is not None:
+                if self.env.get('CONTENT_LENGTH'):
+                    length = self.content_length
+                else:
+                    length = None
+                if length is not None and length > max_size:
+                    raise HTTPPayloadTooLarge(
+                        'Request body exceeds %s bytes' % max_size)
+                stream = _BodyStream(stream, length, max_size)
+            self._cached_stream = stream
+
+        return self._cached_stream
 
     @property
     def json(self):
@@ -392,6 +499,25 @@ class Request(RequestBase):
 
         return self._cached_json
 
+    def json_iter(self, path='item'):
+        """Iterate JSON array in request body incrementally.
+
+        Elements are decoded as the body is read, so large bulk payloads
+        are never held in memory as a whole.
+
+        Keyword Args:
+            path (str): Path to array. 'item' for elements of top-level
+                array or 'key.item' for array at key of top-level object.
+
+        Returns:
+            generator: Yields each element of array.
+
+        Raises:
+            JSONDecodeError: Malformed JSON document.
+            HTTPPayloadTooLarge: Body exceeds maximum size.
+        """
+        return js.loads_iter(self.stream, path)
+
     def read(self, size=None):
         """Read at most size bytes, returned as a bytes object.
 
@@ -721,17 +847,12 @@ class Request(RequestBase):
 
     @property
     def form(self):
-        if self._cached_form is not None:
-            return self._cached_form
-
-        environ = {'REQUEST_METHOD': 'POST',
-                   'CONTENT_LENGTH': self.content_length}
-
-        if 'CONTENT_TYPE' in self.env:
-            environ['CONTENT_TYPE'] = self.env['CONTENT_TYPE']
-
-        self._cached_form = FieldStorage(fp=self, keep_blank_values=True,
-                                         environ=environ)
+        if self._cached_form is None:
+            spool_size = g.app.config.getint('request', 'spool_size',
+                                             fallback=1048576)
+            self._cached_form = Form(self.stream, self.content_type,
+                                     self.content_length,
+                                     spool_size=spool_size)
 
         return self._cached_form
 
@@ -742,30 +863,20 @@ class Request(RequestBase):
         json_safe_object = {}
 
         for prop in form:
-            field = form[prop]
-            if isinstance(field, list):
-                for item in field:
-                    if prop not in json_safe_object:
-                        json_safe_object[prop] = []
-                    if item.filename:
-                        data = base64.encodestring(item.file.read())
-                        file_obj = {'name': item.filename,
-                                    'type': item.type,
-                                    'base64': data}
-                        json_safe_object[prop].append(file_obj)
-                    else:
-                            json_safe_object[prop].append(
-                                blank_to_none(item.value)
-                            )
-            else:
+            values = []
+            for field in form.getfields(prop):
                 if field.filename:
-                    data = base64.encodestring(field.file.read())
-                    file_obj = {'name': field.filename,
-                                'type': field.type,
-                                'base64': data}
-                    json_safe_object[prop] = file_obj
+                    values.append({'name': field.filename,
+                                   'type': field.type,
+                                   'base64': base64.encodebytes(
+                                       field.value)})
                 else:
-                    json_safe_object[prop] = blank_to_none(field.value)
+                    values.append(blank_to_none(field.value))
+
+            if len(values) == 1:
+                json_safe_object[prop] = values[0]
+            else:
+                json_safe_object[prop] = values
 
         return json_safe_object
 
@@ -800,22 +911,17 @@ class Request(RequestBase):
             HTTPMissingHeader: The header was not found in the request, but
                 it was required.
         """
-        wsgi_name = name.upper().replace('-', '_')
-
-        try:
-            return self.env['HTTP_' + wsgi_name]
-
-        except KeyError:
-            if wsgi_name in self._WSGI_CONTENT_HEADERS:
-                try:
-                    return self.env[wsgi_name]
-                except KeyError:
-                    pass
+        env = self.env
+        for key in _header_keys(name):
+            try:
+                return env[key]
+            except KeyError:
+                pass
 
-            if not required:
-                return default
+        if not required:
+            return default
 
-            raise HTTPMissingHeader(name)
+        raise HTTPMissingHeader(name)
 
     def get_header_as_datetime(self, header, required=False, obs_date=False):
         """Return an HTTP header with HTTP-Date values as a datetime.
@@ -857,7 +963,7 @@ class Request(RequestBase):
 
         if self.get_header('X-Auth-Token'):
             self._user_token = self.get_header('X-Auth-Token')
-        elif self.host in self.cookies and 'token' in self.session:
+        elif self.host in self._cookies and 'token' in self.session:
             return self.session['token']
 
         return self._user_token
@@ -877,7 +983,7 @@ class Request(RequestBase):
         if self.get_header('X-Region'):
             return self.get_header('X-Region')
 
-        elif self.host in self.cookies and 'region' in self.session:
+        elif self.host in self._cookies and 'region' in self.session:
             return self.session.get('region')
 
         return g.app.config.get('restapi', 'region', fallback=None)
@@ -887,7 +993,7 @@ class Request(RequestBase):
         if self.get_header('X-Interface'):
             return self.get_header('X-Interface')
 
-        elif self.host in self.cookies and 'interface' in self.session:
+        elif self.host in self._cookies and 'interface' in self.session:
             return self.session.get('interface')
 
         return g.app.config.get('restapi', 'interface', fallback='public')
@@ -897,7 +1003,7 @@ class Request(RequestBase):
         if self.get_header('X-Domain'):
             return self.get_header('X-Domain')
 
-        elif self.host in self.cookies and 'domain' in self.session:
+        elif self.host in self._cookies and 'domain' in self.session:
             return self.session.get('domain')
 
         return self.credentials.domain
@@ -907,7 +1013,7 @@ class Request(RequestBase):
         if self.get_header('X-Tenant-Id'):
             return self.get_header('X-Tenant-Id')
 
-        elif self.host in self.cookies and 'tenant_id' in self.session:
+        elif self.host in self._cookies and 'tenant_id' in self.session:
             return self.session.get('tenant_id')
 
         return self.credentials.tenant_id
@@ -951,13 +1057,8 @@ class Request(RequestBase):
         if default is not None and required is False:
             default = str(default)
 
-        try:
-            if field in form:
-                return blank_to_none(form.getfirst(field), default)
-            else:
-                return default
-        except TypeError:
-            pass
+        if field in form:
+            return blank_to_none(form.getfirst(field), default)
 
         return default
 
@@ -990,15 +1091,7 @@ class Request(RequestBase):
         if required is True and field not in form:
             raise HTTPMissingFormField(field)
 
-        try:
-            return to_tuple(form.getlist(field))
-        except TypeError:
-            pass
-
-        if required is True:
-            raise HTTPMissingFormField(field)
-
-        return ()
+        return to_tuple(form.getlist(field))
 
     def get_file(self, field, required=False):
         """Get file for the given field name in form.
@@ -1034,23 +1127,11 @@ class Request(RequestBase):
         if required is True and field not in form:
             raise HTTPMissingFormField(field)
 
-        try:
-            value = form[field]
-            if isinstance(value, list):
-                if value[0].filename:
-                    return FileObject(value[0].filename,
-                                      value[0].type,
-                                      value[0].file)
-
-            else:
-                if value.filename:
-                    return FileObject(value.filename,
-                                      value.type,
-                                      value.file)
-        except TypeError:
-            pass
-        except KeyError:
-            pass
+        fields = form.getfields(field)
+        if fields and fields[0].filename:
+            return FileObject(fields[0].filename,
+                              fields[0].type,
+                              fields[0].file)
 
         if required is True:
             raise HTTPMissingFormField(field)
@@ -1088,29 +1169,11 @@ class Request(RequestBase):
         if required is True and field not in form:
             raise HTTPMissingFormField(field)
 
-        try:
-            value = form[field]
-            if isinstance(value, list):
-                for item in value:
-                    if item.filename:
-                        obj = FileObject(item.filename,
-                                         item.type,
-                                         item.file)
-                        files.append(obj)
-
-            else:
-                if value.filename:
-                    obj = FileObject(value.filename,
-                                     value.type,
-                                     value.file)
-                    files.append(obj)
-
-            return tuple(files)
-
-        except TypeError:
-            pass
-        except KeyError:
-            pass
+        for item in form.getfields(field):
+            if item.filename:
+                files.append(FileObject(item.filename,
+                                        item.type,
+                                        item.file))
 
         return tuple(files)
 
@@ -1126,16 +1189,10 @@ class Request(RequestBase):
         files = []
         form = self.form
 
-        try:
-            for field in form:
-                files += self.get_files(field)
-
-            return tuple(files)
+        for field in form:
+            files += self.get_files(field)
 
-        except TypeError:
-            return ()
-        except TypeError:
-            return ()
+        return tuple(files)
 
     @property
     def date(self):
@@ -1184,6 +1241,62 @@ class Request(RequestBase):
             msg = ('Range must be formatted according to RFC 7233.')
             raise HTTPInvalidHeader('Range', msg)
 
+    @property
+    def ranges(self):
+        """Byte ranges requested.
+
+        Unlike 'range' several ranges may be requested. Offsets are
+        returned as per 'range', e.g. (0, 499), (500, -1) or (-500, -1).
+
+        Reference RFC 7233, Section 2.1.
+
+        Returns:
+            list: Tuples of (first, last) or None if no byte ranges.
+        """
+        try:
+            value = self.env['HTTP_RANGE']
+        except KeyError:
+            return None
+
+        unit, sep, req_ranges = value.partition('=')
+        if not sep:
+            msg = "The value must be prefixed with a" + \
+                  " range unit, e.g. 'bytes='"
+            raise HTTPInvalidHeader('Range', msg)
+
+        if unit.strip().lower() != 'bytes':
+            return None
+
+        ranges = []
+        for req_range in req_ranges.split(','):
+            try:
+                first, sep, last = req_range.strip().partition('-')
+
+                if not sep:
+                    raise ValueError()
+
+                if first:
+                    first = int(first)
+                    last = int(last or -1)
+                    if first < 0 or -1 < last < first:
+                        raise ValueError()
+                    ranges.append((first, last,))
+                elif last:
+                    ranges.append((-int(last), -1,))
+                else:
+                    raise ValueError()
+
+            except ValueError:
+                msg = ('Range must be formatted according to RFC 7233.')
+                raise HTTPInvalidHeader('Range', msg)
+
+        return ranges
+
+    @property
+    def if_range(self):
+        """Value of If-Range header, either an etag or HTTP-date."""
+        return self.get_header('If-Range')
+
     @property
     def range_unit(self):
         try:
@@ -1201,21 +1314,16 @@ class Request(RequestBase):
 
     @property
     def cookies(self):
-        if self._cached_cookies is None:
-            cookie_header = self.get_header('Cookie', default='')
-            parser = SimpleCookie()
-            for cookie_part in cookie_header.split('; '):
-                try:
-                    parser.load(cookie_part)
-                except CookieError:
-                    pass
-            cookies = {}
-            for morsel in parser.values():
-                cookies[morsel.key] = morsel.value
+        return self._cookies.copy()
 
-            self._cached_cookies = cookies
+    @property
+    def _cookies(self):
+        # NOTE(cfrademan): Parsed once, values are decoded when accessed.
+        if self._cached_cookies is None:
+            self._cached_cookies = parse_cookie_header(
+                self.env.get('HTTP_COOKIE'))
 
-        return self._cached_cookies.copy()
+        return self._cached_cookies
 
     @property
     def is_ajax(self):
@@ -1233,16 +1341,8 @@ class Request(RequestBase):
         """Returns True if mobile client is used.
         """
         if self._cached_is_mobile is None:
-            agent = self.user_agent.lower()
-            devices = ('iphone',
-                       'android',)
-
-            for device in devices:
-                if device in agent:
-                    self._cached_is_mobile = True
-                    break
-
-            self._cached_is_mobile = False
+            self._cached_is_mobile, self._cached_is_bot = classify(
+                self.user_agent or '')
 
         return self._cached_is_mobile
 
@@ -1251,21 +1351,8 @@ class Request(RequestBase):
         """Returns True if client is bot.
         """
         if self._cached_is_bot is None:
-            agent = self.user_agent.lower()
-            bots = ('google',
-                    'bot',
-                    'bingpreview',
-                    'yandex',
-                    'yahoo',
-                    'slurp',
-                    'baidu',)
-
-            for bot in bots:
-                if bot in agent:
-                    self._cached_is_bot = True
-                    break
-
-            self._cached_is_bot = False
+            self._cached_is_mobile, self._cached_is_bot = classify(
+                self.user_agent or '')
 
         return self._cached_is_bot
 
@@ -1273,4 +1360,3 @@ class Request(RequestBase):
     user_agent = dict_value_property('env', 'HTTP_USER_AGENT')
     referer = dict_value_property('env', 'HTTP_REFERER')
     expect = dict_value_property('env', 'HTTP_EXPECT')
-    if_range = dict_value_property('env', 'HTTP_IF_RANGE')
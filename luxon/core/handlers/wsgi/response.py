@@ -27,7 +27,11 @@
 # CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
 # ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
 # THE POSSIBILITY OF SUCH DAMAGE.
+import os
+import mmap
+import stat
 from io import BytesIO
+from uuid import uuid4
 from collections import OrderedDict
 from http.cookies import SimpleCookie, CookieError
 
@@ -40,11 +44,106 @@ from luxon.structs.cidict import CiDict
 from luxon.utils.encoding import if_unicode_to_bytes
 from luxon.utils.http import (parse_cache_control_header,
                               ETags)
+from luxon.utils.compression import compress, compress_stream
 from luxon.utils import js
+from luxon.exceptions import HTTPRangeNotSatisfiable
 
 GMT_TIMEZONE = TimezoneGMT()
 
 
+def _is_file(stream):
+    """Returns True if body is a file with a file descriptor."""
+    try:
+        stream.fileno()
+        return True
+    except (AttributeError, OSError, ValueError):
+        # io.UnsupportedOperation for in memory streams.
+        return False
+
+
+class _FileRange(object):
+    """Byte range of file body.
+
+    The range is read by memory mapping the file if possible, otherwise by
+    seeking to the first byte.
+    """
+    __slots__ = ('_file', '_first', '_last',)
+
+    _BLOCK_SIZE = 64 * 1024  # 64 KiB
+
+    def __init__(self, file_obj, first, last):
+        self._file = file_obj
+        self._first = first
+        self._last = last
+
+    def __len__(self):
+        return self._last - self._first + 1
+
+    def __iter__(self):
+        block_size = self._BLOCK_SIZE
+        end = self._last + 1
+
+        try:
+            view = mmap.mmap(self._file.fileno(), 0,
+                             access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            view = None
+
+        if view is not None:
+            with view:
+                for pos in range(self._first, end, block_size):
+                    yield view[pos:min(pos + block_size, end)]
+        else:
+            self._file.seek(self._first)
+            remaining = len(self)
+            while remaining > 0:
+                chunk = self._file.read(min(block_size, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+
+
+class _Parts(object):
+    """Body of several bytes and file range parts with known length."""
+    __slots__ = ('_parts',)
+
+    def __init__(self, parts):
+        self._parts = parts
+
+    def __len__(self):
+        return sum([len(part) for part in self._parts])
+
+    def __iter__(self):
+        for part in self._parts:
+            if isinstance(part, bytes):
+                yield part
+            else:
+                yield from part
+
+
+def _read_stream(stream, block_size):
+    """Returns generator for chunks of file like or iterable body."""
+    try:
+        # Rewind file like object to beginning
+        stream.seek(0)
+    except AttributeError:
+        pass
+
+    try:
+        read = stream.read
+    except AttributeError:
+        # If iterable body...
+        for chunk in stream:
+            yield if_unicode_to_bytes(chunk)
+    else:
+        while True:
+            chunk = read(block_size)
+            if not chunk:
+                break
+            yield chunk
+
+
 class Response(Redirects):
     """Represents an HTTP response to a client request.
 
@@ -75,6 +174,7 @@ class Response(Redirects):
         '_cookies',
         '_start_response',
         '_etags',
+        '_file_wrapper',
     )
 
     def __init__(self, environ, start_response):
@@ -84,6 +184,9 @@ class Response(Redirects):
 
         self._start_response = start_response
 
+        # Servers may provide 'sendfile' for file bodies. PEP-3333
+        self._file_wrapper = environ.get('wsgi.file_wrapper')
+
         # Used internally.
         self._http_response_status_code = 200
 
@@ -118,8 +221,19 @@ class Response(Redirects):
         try:
             return len(self._stream)
         except TypeError:
+            pass
+
+        # Size of regular files.
+        try:
+            file_stat = os.fstat(self._stream.fileno())
+        except (AttributeError, OSError, ValueError):
             return None
 
+        if stat.S_ISREG(file_stat.st_mode):
+            return file_stat.st_size
+
+        return None
+
     def body(self, obj):
         """Set Response Body.
 
@@ -155,6 +269,110 @@ class Response(Redirects):
             raise ValueError('resource not returning acceptable object %s' %
                              type(obj))
 
+    def compress(self, encoding, level=6):
+        """Compress response body with content-coding.
+
+        Bytes bodies are compressed at once, file like and iterable bodies
+        are compressed chunk by chunk while being sent. Strong etags are
+        suffixed with the content-coding, since the compressed body is a
+        different representation. e.g. '"abc-gzip"'
+
+        Args:
+            encoding (str): 'gzip' or 'deflate'.
+
+        Keyword Args:
+            level (int): Compression level 1 to 9.
+        """
+        stream = self._stream
+
+        if isinstance(stream, BytesIO):
+            stream = stream.getvalue()
+
+        if isinstance(stream, bytes):
+            self._stream = compress(stream, encoding, level)
+        else:
+            self._stream = compress_stream(
+                _read_stream(stream, self._STREAM_BLOCK_SIZE),
+                encoding,
+                level)
+
+        self._headers['Content-Encoding'] = encoding
+
+        if self._etags is not None and len(self._etags) > 0:
+            self.etag = (['"%s-%s"' % (etag, encoding)
+                          for etag in self._etags._strong] +
+                         ['W/"%s"' % etag for etag in self._etags._weak])
+
+    def partial(self, ranges):
+        """Restrict response body to byte ranges.
+
+        Responds with '206 Partial Content'. A single range is sent with
+        Content-Range, several ranges as 'multipart/byteranges'. Ranges of
+        files are memory mapped rather than reading the file. Bodies of
+        unknown length are sent complete.
+
+        Reference RFC 7233.
+
+        Args:
+            ranges (list): Tuples of (first, last) as per Request.ranges.
+
+        Raises:
+            HTTPRangeNotSatisfiable: No range overlaps the body.
+        """
+        length = self.content_length
+        if length is None:
+            return
+
+        satisfiable = []
+        for first, last in ranges:
+            if first < 0:
+                first = max(length + first, 0)
+                last = length - 1
+            elif last == -1 or last >= length:
+                last = length - 1
+
+            if first < length and first <= last:
+                satisfiable.append((first, last,))
+
+        if not satisfiable:
+            raise HTTPRangeNotSatisfiable(length)
+
+        stream = self._stream
+        if isinstance(stream, BytesIO):
+            stream = stream.getvalue()
+
+        if isinstance(stream, bytes):
+            parts = [stream[first:last + 1] for first, last in satisfiable]
+        else:
+            parts = [_FileRange(stream, first, last)
+                     for first, last in satisfiable]
+
+        self.status = 206
+
+        if len(satisfiable) == 1:
+            self._headers['Content-Range'] = 'bytes %s-%s/%s' % (
+                satisfiable[0] + (length,))
+            self._stream = parts[0]
+            return
+
+        boundary = uuid4().hex
+        content_type = self.content_type or self._DEFAULT_CONTENT_TYPE
+        body = []
+        for (first, last), part in zip(satisfiable, parts):
+            body.append(('--%s\r\n' % boundary +
+                         'Content-Type: %s\r\n' % content_type +
+                         'Content-Range: bytes %s-%s/%s\r\n\r\n' % (
+                             first, last, length)).encode('ascii'))
+            body.append(part)
+            body.append(b'\r\n')
+        body.append(('--%s--\r\n' % boundary).encode('ascii'))
+
+        self.content_type = 'multipart/byteranges; boundary=' + boundary
+        if isinstance(stream, bytes):
+            self._stream = b''.join(body)
+        else:
+            self._stream = _Parts(body)
+
     def write(self, value):
         """Write bytes to response body.
 
@@ -490,17 +708,21 @@ class Response(Redirects):
         content_type = self.content_type
         content_length = self.content_length
 
-        # Set Content-Length Header.
-        if content_length is not None:
-            headers['Content-Length'] = str(content_length)
+        # NOTE(cfrademan): Responses such as '304 Not Modified' must not
+        # contain a body or describe one.
+        if status in self._BODILESS_STATUS_CODES:
+            pass
+
+        else:
+            # Set Content-Length Header.
+            if content_length is not None:
+                headers['Content-Length'] = str(content_length)
 
             # Set Content-Type Header.
             if content_type is not None:
                 headers['Content-Type'] = content_type
-
-        elif (content_type is None and
-                status not in self._BODILESS_STATUS_CODES):
-            headers['Content-Type'] = self._DEFAULT_CONTENT_TYPE
+            else:
+                headers['Content-Type'] = self._DEFAULT_CONTENT_TYPE
 
         headers = list(self._headers.items())
 
@@ -513,36 +735,31 @@ class Response(Redirects):
                              const.HTTP_STATUS_CODES[status]),
                              headers)
 
+        stream = self._stream
+        if (self._file_wrapper is not None and
+                status not in self._BODILESS_STATUS_CODES and
+                _is_file(stream)):
+            # Rewind file object to beginning
+            stream.seek(0)
+            return self._file_wrapper(stream, self._STREAM_BLOCK_SIZE)
+
         return self
 
     def __iter__(self):
         stream = self._stream
-        status = self.status
 
-        _STREAM_BLOCK_SIZE = self._STREAM_BLOCK_SIZE
-
-        if status not in self._BODILESS_STATUS_CODES:
-            try:
-                # Rewind file like object to beginning
-                stream.seek(0)
-            except AttributeError:
-                pass
-
-            try:
-                while True:
-                    chunk = stream.read(_STREAM_BLOCK_SIZE)
-                    if not chunk:
-                        break
-                    yield chunk
-            except AttributeError:
-                # If iterable body...
-                try:
-                    for i in range(0, len(stream), _STREAM_BLOCK_SIZE):
-                        yield stream[i:i + _STREAM_BLOCK_SIZE]
-                except TypeError:
-                    pass
-
-        yield b''
+        if stream is None or self.status in self._BODILESS_STATUS_CODES:
+            return iter(())
+
+        # NOTE(cfrademan): Bytes bodies are sent as a single chunk rather
+        # than copying slices of it.
+        if isinstance(stream, bytes):
+            return iter((stream,))
+
+        if isinstance(stream, BytesIO):
+            return iter((stream.getvalue(),))
+
+        return _read_stream(stream, self._STREAM_BLOCK_SIZE)
 
     def read(self):
         try:
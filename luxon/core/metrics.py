@@ -0,0 +1,409 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2018 Christiaan Frans Rademan.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# * Neither the name of the copyright holders nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+import os
+import mmap
+import glob
+import struct
+import threading
+from bisect import bisect_left
+from timeit import default_timer
+
+from luxon import g
+from luxon.core.logger import GetLogger
+from luxon.utils.singleton import Singleton
+
+log = GetLogger(__name__)
+
+# Default histogram buckets in seconds.
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+           0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_INITIAL_SIZE = 64 * 1024  # 64 KiB
+_HEADER = struct.Struct('q')
+_KEY_LENGTH = struct.Struct('i')
+_VALUE = struct.Struct('d')
+
+
+def _escape(value):
+    return (str(value).replace('\\', r'\\')
+                      .replace('\n', r'\n')
+                      .replace('"', r'\"'))
+
+
+def _sample(name, labels):
+    """Returns sample in Prometheus text format without value."""
+    if not labels:
+        return name
+
+    return name + '{' + ','.join(['%s="%s"' % (label, _escape(value))
+                                  for label, value in labels]) + '}'
+
+
+class _ValueFile(object):
+    """Values of one process in memory mapped file.
+
+    The file consists of used bytes followed by entries. Each entry is the
+    length of the key, the key padded to 8 bytes and a double value. Only
+    the process owning the file writes to it, other processes only read.
+    """
+    __slots__ = ('_fd', '_mmap', '_used', '_capacity', '_positions',
+                 '_lock')
+
+    def __init__(self, filename):
+        self._fd = os.open(filename, os.O_CREAT | os.O_RDWR, 0o600)
+        self._capacity = max(os.fstat(self._fd).st_size, _INITIAL_SIZE)
+        os.ftruncate(self._fd, self._capacity)
+        self._mmap = mmap.mmap(self._fd, self._capacity)
+        self._lock = threading.Lock()
+        self._positions = {}
+        self._used = _HEADER.unpack_from(self._mmap, 0)[0] or _HEADER.size
+
+        for key, value, pos in _entries(self._mmap, self._used):
+            self._positions[key] = pos
+
+    def add(self, key, amount):
+        with self._lock:
+            try:
+                pos = self._positions[key]
+            except KeyError:
+                pos = self._init_value(key)
+            value = _VALUE.unpack_from(self._mmap, pos)[0]
+            _VALUE.pack_into(self._mmap, pos, value + amount)
+
+    def _init_value(self, key):
+        encoded = key.encode('utf-8')
+        padded = encoded + b' ' * ((8 - (_KEY_LENGTH.size +
+                                         len(encoded)) % 8) % 8)
+        entry = (_KEY_LENGTH.pack(len(encoded)) + padded +
+                 _VALUE.pack(0.0))
+
+        while self._used + len(entry) > self._capacity:
+            self._capacity *= 2
+            os.ftruncate(self._fd, self._capacity)
+            self._mmap.close()
+            self._mmap = mmap.mmap(self._fd, self._capacity)
+
+        self._mmap[self._used:self._used + len(entry)] = entry
+        pos = self._used + len(entry) - _VALUE.size
+        self._used += len(entry)
+        # NOTE(cfrademan): Update used bytes last, so readers never see
+        # a partially written entry.
+        _HEADER.pack_into(self._mmap, 0, self._used)
+        self._positions[key] = pos
+
+        return pos
+
+
+def _entries(data, used):
+    pos = _HEADER.size
+    while pos < used:
+        length = _KEY_LENGTH.unpack_from(data, pos)[0]
+        key_end = pos + _KEY_LENGTH.size + length
+        key = bytes(data[pos + _KEY_LENGTH.size:key_end]).decode('utf-8')
+        pos += _KEY_LENGTH.size + length
+        pos += (8 - pos % 8) % 8
+        value = _VALUE.unpack_from(data, pos)[0]
+        yield key, value, pos
+        pos += _VALUE.size
+
+
+def _read_file(filename):
+    with open(filename, 'rb') as metrics_file:
+        data = metrics_file.read()
+
+    if len(data) < _HEADER.size:
+        return
+
+    used = _HEADER.unpack_from(data, 0)[0]
+    for key, value, pos in _entries(data, used):
+        yield key, value
+
+
+class Phases(object):
+    """Times phases of processing a request.
+
+    Each call records the time elapsed since the previous call or creation.
+
+    **Example**
+
+    .. code:: python
+
+        phase = Phases()
+        route = router.find(method, path)
+        phase('route')
+        print(phase.timings)
+    """
+    __slots__ = ('_start', '_last', 'timings',)
+
+    def __init__(self):
+        self._start = self._last = default_timer()
+        self.timings = []
+
+    def __call__(self, phase):
+        now = default_timer()
+        self.timings.append((phase, now - self._last,))
+        self._last = now
+
+    def elapsed(self):
+        """Returns seconds elapsed since creation."""
+        return default_timer() - self._start
+
+
+class Metrics(metaclass=Singleton):
+    """Metrics registry.
+
+    Counters and histograms are kept in a memory mapped file per process
+    in the *metrics* directory within the application *tmp* directory.
+    Values of all processes are aggregated when exported, so a scrape of
+    any worker represents the whole host.
+
+    Metrics are registered with a type and description before being used.
+    Histogram observations only increment the bucket observed, buckets are
+    accumulated when exported.
+    """
+    def __init__(self, path=None):
+        if path is None:
+            path = g.app.path.rstrip('/') + '/tmp/metrics'
+
+        os.makedirs(path, exist_ok=True)
+        self._path = path
+        self._pid = None
+        self._file = None
+        self._lock = threading.Lock()
+        self._families = {}
+
+        self.register('luxon_requests_total', 'counter',
+                      'Total requests processed.')
+        self.register('luxon_request_seconds', 'histogram',
+                      'Time processing requests.')
+        self.register('luxon_request_phase_seconds', 'histogram',
+                      'Time processing requests per phase.')
+
+    def register(self, name, metric_type, description, buckets=BUCKETS):
+        """Register metric.
+
+        Args:
+            name (str): Metric name.
+            metric_type (str): 'counter' or 'histogram'.
+            description (str): Description of metric.
+
+        Keyword Args:
+            buckets (tuple): Upper bounds of histogram buckets.
+        """
+        if metric_type not in ('counter', 'histogram',):
+            raise ValueError("Invalid metric type '%s'" % metric_type)
+
+        self._families[name] = (metric_type, description, tuple(buckets))
+
+    def inc(self, name, labels=(), amount=1):
+        """Increment counter.
+
+        Args:
+            name (str): Metric name.
+
+        Keyword Args:
+            labels (tuple): Sequence of (label, value) tuples.
+            amount (int): Amount to increment.
+        """
+        self._values().add(_sample(name, labels), amount)
+
+    def observe(self, name, value, labels=()):
+        """Observe value for histogram.
+
+        Args:
+            name (str): Metric name.
+            value (float): Value observed. e.g. seconds.
+
+        Keyword Args:
+            labels (tuple): Sequence of (label, value) tuples.
+        """
+        buckets = self._families[name][2]
+        idx = bisect_left(buckets, value)
+        if idx < len(buckets):
+            le = repr(buckets[idx])
+        else:
+            le = '+Inf'
+
+        values = self._values()
+        values.add(_sample(name + '_bucket',
+                           tuple(labels) + (('le', le),)), 1)
+        values.add(_sample(name + '_sum', labels), value)
+
+    def clear(self):
+        """Remove metrics of all processes.
+
+        Should only be used before starting workers.
+        """
+        for filename in glob.glob(os.path.join(self._path, 'metrics_*.db')):
+            try:
+                os.unlink(filename)
+            except FileNotFoundError:
+                pass
+        self._pid = None
+        self._file = None
+
+    def collect(self):
+        """Returns values of all processes.
+
+        Returns:
+            dict: samples in Prometheus text format without values as keys.
+        """
+        samples = {}
+        for filename in glob.glob(os.path.join(self._path, 'metrics_*.db')):
+            try:
+                for key, value in _read_file(filename):
+                    samples[key] = samples.get(key, 0.0) + value
+            except (OSError, struct.error, UnicodeDecodeError) as e:
+                log.warning("Unable to read metrics '%s' (%s)" %
+                            (filename, e,))
+
+        return samples
+
+    def text(self):
+        """Returns metrics of all processes in Prometheus text format."""
+        families = {}
+        for sample, value in self.collect().items():
+            name, sep, labels = sample.partition('{')
+            for suffix in ('_bucket', '_sum',):
+                if (name.endswith(suffix) and
+                        name[:-len(suffix)] in self._families):
+                    family = name[:-len(suffix)]
+                    break
+            else:
+                family = name
+
+            if family not in families:
+                families[family] = []
+
+            families[family].append((name, labels, value,))
+
+        lines = []
+        for family in sorted(families):
+            metric_type, description, buckets = self._families.get(
+                family, ('untyped', '', ()))
+            lines.append('# HELP %s %s' % (family, description))
+            lines.append('# TYPE %s %s' % (family, metric_type))
+
+            if metric_type == 'histogram':
+                lines += self._histogram(family, buckets, families[family])
+            else:
+                for name, labels, value in sorted(families[family]):
+                    lines.append(_format(name, labels, value))
+
+        return '\n'.join(lines) + '\n'
+
+    def _histogram(self, family, buckets, samples):
+        series = {}
+        for name, labels, value in samples:
+            if name.endswith('_bucket'):
+                labels, sep, le = labels.rpartition('le="')
+                labels = labels.rstrip(',')
+                le = le.rstrip('}"')
+                series.setdefault(labels, {})[le] = value
+            else:
+                series.setdefault(labels.rstrip('}'), {})['sum'] = value
+
+        lines = []
+        for labels in sorted(series):
+            values = series[labels]
+            prefix = labels + ',' if labels else '{'
+            count = 0.0
+            for le in [repr(bound) for bound in buckets] + ['+Inf']:
+                count += values.get(le, 0.0)
+                lines.append(_format(family + '_bucket',
+                                     prefix + 'le="%s"}' % le, count))
+            suffix = labels + '}' if labels else ''
+            lines.append(_format(family + '_sum', suffix,
+                                 values.get('sum', 0.0)))
+            lines.append(_format(family + '_count', suffix, count))
+
+        return lines
+
+    def _values(self):
+        pid = os.getpid()
+        if self._pid != pid:
+            with self._lock:
+                if self._pid != pid:
+                    # NOTE(cfrademan): New file after forking worker
+                    # processes. Values of exited processes are merged
+                    # into it, so counters remain monotonic.
+                    values = _ValueFile(os.path.join(self._path,
+                                                     'metrics_%s.db' % pid))
+                    self._merge_stale(values)
+                    self._file = values
+                    self._pid = pid
+
+        return self._file
+
+    def _merge_stale(self, values):
+        """Merge and remove files of processes no longer running."""
+        for filename in glob.glob(os.path.join(self._path, 'metrics_*.db')):
+            try:
+                pid = int(os.path.basename(filename)[8:-3])
+            except ValueError:
+                continue
+
+            if pid == os.getpid() or _running(pid):
+                continue
+
+            # NOTE(cfrademan): Only one worker claims the file by renaming
+            # it, others starting at the same time skip it.
+            claimed = '%s.%s' % (filename, os.getpid())
+            try:
+                os.rename(filename, claimed)
+            except FileNotFoundError:
+                continue
+
+            try:
+                for key, value in _read_file(claimed):
+                    values.add(key, value)
+            except (OSError, struct.error, UnicodeDecodeError) as e:
+                log.warning("Unable to merge metrics '%s' (%s)" %
+                            (filename, e,))
+            finally:
+                os.unlink(claimed)
+
+
+def _running(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _format(name, labels, value):
+    if labels and not labels.startswith('{'):
+        labels = '{' + labels
+    if value == int(value):
+        value = int(value)
+    return '%s%s %s' % (name, labels, value)
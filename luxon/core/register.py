@@ -45,8 +45,31 @@ _ajax_error_template = None
 class Register(object):
     __slots__ = ()
 
-    def resource(self, method, route, tag=None, cache=0):
+    def resource(self, method, route, tag=None, cache=0, etag=None,
+                 last_modified=None):
+        """Register resource for route.
+
+        Validators are callables receiving the same arguments as the
+        resource. They are evaluated after the 'resource' middleware and
+        before the resource for conditional GET and HEAD requests, so
+        unmodified content is never rendered.
+        Resources may also provide 'etag' and 'last_modified' attributes.
+
+        Args:
+            method (str/list): Method(s) for route.
+            route (str): Route resource. (URI Template)
+
+        Keyword Args:
+            tag (str): Used to identify rule_set to apply.
+            cache (int): Seconds to cache response.
+            etag (callable): Returns etag value for resource.
+            last_modified (callable): Returns last modified datetime.
+        """
         def resource_wrapper(func):
+            if etag is not None:
+                func.etag = etag
+            if last_modified is not None:
+                func.last_modified = last_modified
             router.add(method, route, func, tag, cache)
             return func
 
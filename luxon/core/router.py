@@ -28,6 +28,7 @@
 # ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
 # THE POSSIBILITY OF SUCH DAMAGE.
 import re
+from functools import lru_cache
 from collections import OrderedDict
 
 from luxon.utils.cast import to_tuple
@@ -47,28 +48,293 @@ log = GetLogger(__name__)
 # at all.
 retype = type(re.compile('hello, world'))
 
+# Returned when no route is found.
+_NOT_FOUND = (None, None, {}, None, None, 0)
+
+# Maximum expressions combined in one alternation. Matching a large
+# alternation slows down when many expressions share a prefix, since every
+# alternative is attempted in turn with its groups.
+_MAX_COMBINED = 32
+
+# Characters with special meaning in a regular expression. Used to determine
+# the literal prefix of regex routes.
+_REGEX_META = frozenset('.^$*+?{}[]\\|()')
+
+# Regex routes containing these constructs can't be safely wrapped within a
+# larger alternation. Back references and conditional group references
+# (?(1)...) are renumbered by the wrapping group, and global inline flags are
+# only allowed at the start of an expression.
+_NOT_COMBINABLE_RE = re.compile(r'\\[1-9]|\(\?P=|\(\?\(\d|\(\?\(\w|'
+                                r'^\^?\(\?[aiLmsux]+\)')
+
+
+def _literal_prefix(expression):
+    """Returns the literal prefix any path matching expression must have.
+
+    The prefix is conservative, an empty string is returned when it can't be
+    determined safely.
+    """
+    if '|' in expression:
+        return ''
+
+    if expression.startswith('^'):
+        expression = expression[1:]
+
+    for pos, char in enumerate(expression):
+        if char in _REGEX_META:
+            if char in '*?{':
+                # NOTE(cfrademan): Previous character is optional.
+                pos -= 1
+            return expression[:max(pos, 0)]
+
+    return expression
+
+
+def _copy_kwargs(dispatch):
+    """Returns dispatch function returning a copy of route kwargs.
+
+    Routes found are shared by requests, either stored in the router or the
+    LRU cache. Resources modifying their kwargs must not affect others.
+    """
+    def find(route):
+        resource, method, kwargs, route, tag, cache = dispatch(route)
+        return (resource, method, dict(kwargs), route, tag, cache,)
+
+    try:
+        find.cache_info = dispatch.cache_info
+    except AttributeError:
+        pass
+
+    return find
+
+
+class RegexRouter(object):
+    """Regex Router.
+
+    Matches a path against all 'regex:' routes of a method in a single pass.
+
+    Routes are indexed by the literal prefix of their expressions. For each
+    prefix the routes that could possibly match are compiled into one
+    alternation of expressions, preserving the order in which they where
+    added. Finding a route only requires a few dictionary lookups and a
+    single match.
+
+    Compiling happens on the first find after routes have been added.
+    """
+    __slots__ = ('_routes', '_prefixes', '_lengths', '_matchers')
+
+    def __init__(self):
+        self._routes = []
+        self._prefixes = []
+        self._lengths = ()
+        self._matchers = None
+
+    def add_route(self, route):
+        """Add regex route.
+
+        Args:
+            route (tuple): Route tuple with compiled expression.
+                e.g. (resource, method, {}, expression, tag, cache)
+        """
+        self._routes.append(route)
+        self._prefixes.append(_literal_prefix(route[3].pattern))
+        self._matchers = None
+
+    def freeze(self):
+        """Compile matchers for the routes added."""
+        if self._matchers is None:
+            self._compile()
+
+    def find(self, path):
+        """Search for a regex route that matches the given path.
+
+        Args:
+            path (str): The requested path to route.
+
+        Returns:
+            tuple: route tuple or None if no route matches.
+        """
+        if self._matchers is None:
+            self._compile()
+
+        matchers = self._matchers
+
+        for length in self._lengths:
+            try:
+                candidates = matchers[path[:length]]
+                break
+            except KeyError:
+                pass
+        else:
+            candidates = matchers['']
+
+        for expression, routes, route in candidates:
+            match = expression.match(path)
+            if match is not None:
+                if route is not None:
+                    return route
+                return routes[match.lastindex]
+
+        return None
+
+    def _compile(self):
+        compiled = {}
+        matchers = {'': ()}
+        prefixes = set(self._prefixes)
+        prefixes.add('')
+
+        for prefix in prefixes:
+            candidates = tuple(idx for idx, route_prefix
+                               in enumerate(self._prefixes)
+                               if prefix.startswith(route_prefix))
+            if candidates not in compiled:
+                compiled[candidates] = self._combine(candidates)
+            matchers[prefix] = compiled[candidates]
+
+        self._lengths = tuple(sorted(set(len(prefix) for prefix in prefixes
+                                         if prefix), reverse=True))
+        self._matchers = matchers
+
+    def _combine(self, candidates):
+        matchers = []
+        segment = []
+
+        for idx in candidates:
+            route = self._routes[idx]
+            if _NOT_COMBINABLE_RE.search(route[3].pattern):
+                matchers += self._segment(segment)
+                matchers.append((route[3], None, route,))
+                segment = []
+            else:
+                segment.append(route)
+
+        matchers += self._segment(segment)
+
+        return tuple(matchers)
+
+    def _segment(self, routes):
+        if len(routes) > _MAX_COMBINED:
+            matchers = []
+            for start in range(0, len(routes), _MAX_COMBINED):
+                matchers += self._segment(routes[start:start + _MAX_COMBINED])
+            return matchers
+
+        if len(routes) == 0:
+            return []
+
+        if len(routes) == 1:
+            return [(routes[0][3], None, routes[0],)]
+
+        expressions = []
+        index = {}
+        group = 1
+        for route in routes:
+            expressions.append('(' + route[3].pattern + ')')
+            index[group] = route
+            group += route[3].groups + 1
+
+        try:
+            return [(re.compile('|'.join(expressions)), index, None,)]
+        except Exception:
+            # NOTE(cfrademan): Expressions that can't be combined, such as
+            # duplicate group names are matched individually.
+            return [(route[3], None, route,) for route in routes]
+
 
 class Router(object):
     """ Simple Router Interface.
 
     The router is used to index and return views based on url and method.
 
+    Each method has a dispatch function which searches the static routes,
+    keyword expression routes and regex routes in that order. Optionally the
+    results of the dispatch functions are kept in a bounded LRU cache per
+    method, including routes not found.
+
     Attributes:
         routes (list): List of tuples containing routes.
             e.g. [ ( 'GET', '/test', 'rule1', resource_view_object), ]
     """
-    __slots__ = ('_routers', '_routes', '_regex_routes', '_methods')
+    __slots__ = ('_routers', '_routes', '_static_routes', '_regex_routers',
+                 '_methods', '_cache_path', '_lru_size', '_dispatchers')
 
     def __init__(self):
         self._routers = {}
         self._routes = {}
-        self._regex_routes = {}
+        self._static_routes = {}
+        self._regex_routers = {}
         self._methods = set([])
+        self._cache_path = None
+        self._lru_size = 0
+        self._dispatchers = {}
 
     @property
     def methods(self):
         return self._methods
 
+    @property
+    def lru_size(self):
+        """Maximum entries in LRU cache of found routes per method.
+
+        Default 0 disables the cache.
+        """
+        return self._lru_size
+
+    @lru_size.setter
+    def lru_size(self, value):
+        self._lru_size = int(value)
+        self._dispatchers = {}
+
+    def cache_info(self):
+        """Statistics for LRU caches of found routes.
+
+        Returns:
+            dict: 'hits', 'misses', 'maxsize' and 'currsize' summed for the
+                caches of all methods.
+        """
+        info = {'hits': 0, 'misses': 0, 'maxsize': 0, 'currsize': 0}
+
+        for dispatch in set(self._dispatchers.values()):
+            try:
+                stats = dispatch.cache_info()
+            except AttributeError:
+                continue
+            info['hits'] += stats.hits
+            info['misses'] += stats.misses
+            info['maxsize'] += stats.maxsize
+            info['currsize'] += stats.currsize
+
+        return info
+
+    @property
+    def cache_path(self):
+        """Directory to cache compiled routing logic on disk.
+
+        Default None disables caching.
+        """
+        return self._cache_path
+
+    @cache_path.setter
+    def cache_path(self, value):
+        self._cache_path = value
+        for method in self._routers:
+            self._routers[method].options.cache_path = value
+
+    def freeze(self):
+        """Compile routing logic for all routes added.
+
+        Otherwise compiling happens on the first find after routes were
+        added. Freezing before forking workers ensures its only done once.
+        """
+        for method in self._routers:
+            self._routers[method].freeze()
+
+        for method in self._regex_routers:
+            self._regex_routers[method].freeze()
+
+        for method in self._methods:
+            self._dispatcher(method)
+
     @property
     def routes(self):
         routes = []
@@ -134,25 +400,66 @@ class Router(object):
                 * HTTP_DELETE
             route (str): The requested path to route.
         """
-        method = method.upper()
+        try:
+            return self._dispatchers[method](route)
+        except KeyError:
+            return self._dispatcher(method)(route)
+
+    def _dispatcher(self, method):
+        """Returns dispatch function for method."""
+        upper = method.upper()
+
+        if upper not in self._methods:
+            # NOTE(cfrademan): Dont keep dispatchers for unknown methods
+            # provided by clients.
+            return _copy_kwargs(lambda route: _NOT_FOUND)
 
-        if method + ':' + route.strip('/') in self._routes:
-            return self._routes['%s:%s' % (method, route.strip('/'))]
         try:
-            found = self._routers[method].find(route.strip('/'))
-            if found[0]:
-                return found
+            dispatch = self._dispatchers[upper]
+        except KeyError:
+            dispatch = self._dispatch(upper)
+            if self._lru_size > 0:
+                dispatch = lru_cache(maxsize=self._lru_size)(dispatch)
+            dispatch = _copy_kwargs(dispatch)
+            self._dispatchers[upper] = dispatch
+
+        self._dispatchers[method] = dispatch
+
+        return dispatch
+
+    def _dispatch(self, method):
+        static_get = self._static_routes.get(method, {}).get
+
+        try:
+            compiled_find = self._routers[method].find
         except KeyError:
-            pass
+            compiled_find = None
+
         try:
-            for regex_route in self._regex_routes[method]:
-                if regex_route[3].match(route):
-                    return regex_route
+            regex_find = self._regex_routers[method].find
         except KeyError:
-            pass
+            regex_find = None
+
+        def dispatch(route):
+            path = route.strip('/')
+
+            found = static_get(path)
+            if found is not None:
+                return found
+
+            if compiled_find is not None:
+                found = compiled_find(path)
+                if found[0]:
+                    return found
+
+            if regex_find is not None:
+                found = regex_find(route)
+                if found is not None:
+                    return found
 
-        # DEFAULT EMPTY
-        return (None, None, {}, None, None, 0)
+            return _NOT_FOUND
+
+        return dispatch
 
     def add(self, methods, route, resource, tag=None, cache=0):
         """Add route to view.
@@ -189,39 +496,32 @@ class Router(object):
             tag (str): Used to identify rule_set to apply. default: 'None'
         """
         methods = to_tuple(methods)
+
+        # Dispatch functions and cached routes are rebuilt on next find.
+        self._dispatchers = {}
+
         if route[0:6].lower() == "regex:":
             route = route[6:]
             for method in methods:
                 method = method.upper()
                 try:
                     route = re.compile(route)
-                    self._regex_routes[method].append((resource,
-                                                      method,
-                                                      {},
-                                                      route,
-                                                      tag,
-                                                      cache,))
-                    self._routes['%s:%s' % (method, route)] = (resource,
-                                                               method,
-                                                               {},
-                                                               route,
-                                                               tag,
-                                                               cache)
-                except KeyError:
-                    self._regex_routes[method] = []
-                    route = re.compile(route)
-                    self._routes['%s:%s' % (method, route)] = (resource,
-                                                               method,
-                                                               {},
-                                                               route,
-                                                               tag,
-                                                               cache)
-                    self._regex_routes[method].append(
-                        self._routes['%s:%s' % (method, route)])
                 except Exception as e:
                     raise exceptions.Error("Bad RE expression for route '%s'" %
                                            route
                                            + ". (%s)" % e)
+
+                self._routes['%s:%s' % (method, route)] = (resource,
+                                                           method,
+                                                           {},
+                                                           route,
+                                                           tag,
+                                                           cache)
+                if method not in self._regex_routers:
+                    self._regex_routers[method] = RegexRouter()
+                self._regex_routers[method].add_route(
+                    self._routes['%s:%s' % (method, route)])
+                self._methods.add(method)
         else:
             route = route.strip('/')
             for method in methods:
@@ -243,6 +543,8 @@ class Router(object):
                 except KeyError:
                     if not isinstance(route, retype) and '{' in route:
                         self._routers[method] = CompiledRouter()
+                        self._routers[method].options.cache_path = \
+                            self._cache_path
                         self._routers[method].add_route(route,
                                                         method,
                                                         resource,
@@ -255,7 +557,14 @@ class Router(object):
                                                                route,
                                                                tag,
                                                                cache)
-        self._methods.add(method)
+
+                if '{' not in route:
+                    if method not in self._static_routes:
+                        self._static_routes[method] = {}
+                    self._static_routes[method][route] = \
+                        self._routes['%s:%s' % (method, route)]
+                self._methods.add(method)
+
         log.info('Added Route: %s' % route +
                  ' Methods: %s' % str(methods) +
                  ' Resource: %s' % object_name(resource) +
@@ -28,42 +28,249 @@
 # ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
 # THE POSSIBILITY OF SUCH DAMAGE.
 import os
-import re
+import stat
 import mimetypes
+import threading
+from datetime import datetime
+from collections import OrderedDict
 
 from luxon import g
 from luxon import metadata
 from luxon import register
 from luxon import constants as const
+from luxon.exceptions import NotFoundError
 from luxon.structs.htmldoc import HTMLDoc
+from luxon.utils.http import accept_encoding
+from luxon.utils.timezone import TimezoneUTC
 
 
-@register.resource(['GET', 'POST'],
-                   'regex:^/' +
-                   g.app.config.get('application', 'static').strip('/')
-                   + '.*$', cache=604800)
-def static(req, resp):
-    """Serves files from static directory"""
-    resp.content_type = const.TEXT_HTML
-    static = g.app.config.get('application', 'static').strip('/')
-    static_path_re = re.compile("^\/%s\/%s" %
-                                (req.app.strip('/'), static,))
-    sfile_path = '/' + req.app.strip('/') + '/' + req.route.strip('/')
-    sfile_path = static_path_re.sub('', sfile_path)
-    sfile_path = g.app.path.rstrip('/') + '/static' + sfile_path
-    if os.path.isfile(sfile_path):
-        sfile = open(sfile_path, 'rb').read()
-        resp.content_type = const.APPLICATION_OCTET_STREAM
-        mime_type = mimetypes.guess_type(sfile_path)
-        if mime_type is not None:
-            resp.content_type = mime_type[0]
-            if mime_type[1] is not None:
-                resp.content_type += ';charset=%s' % mime_type[1]
-        return sfile
-    elif os.path.isdir(sfile_path):
+class StaticFile(object):
+    """Static file resolved for request.
+
+    Attributes:
+        path (str): Path of file served. (may be '.gz' sidecar)
+        stat (os.stat_result): Status of file served.
+        encoding (str): Content-Encoding of file served.
+        content_type (str): Content-Type of file.
+        etag (str): Etag from modification time and size.
+        last_modified (datetime): Modification time.
+        sidecar (bool): True if precompressed sidecar exists.
+    """
+    __slots__ = ('path', 'stat', 'encoding', 'content_type', 'etag',
+                 'last_modified', 'sidecar',)
+
+    def __init__(self, path, file_stat, encoding, content_type, sidecar):
+        self.path = path
+        self.stat = file_stat
+        self.encoding = encoding
+        self.content_type = content_type
+        self.sidecar = sidecar
+        self.etag = '%x-%x' % (file_stat.st_mtime_ns, file_stat.st_size)
+        if encoding is not None:
+            self.etag += '-' + encoding
+        self.last_modified = datetime.fromtimestamp(file_stat.st_mtime,
+                                                    TimezoneUTC())
+
+
+class StaticFiles(object):
+    """Serves files from static directory.
+
+    Validators are from os.stat, so unmodified files are answered with
+    '304 Not Modified' without reading them. Files up to 'max_file_size'
+    are kept in memory, up to 'max_files' least recently used files using
+    no more than 'max_bytes' in total. Larger files are returned as file
+    objects, allowing the server to use 'wsgi.file_wrapper' and byte ranges
+    to be memory mapped.
+
+    Precompressed '.gz' sidecars are served to clients accepting gzip if
+    not older than the file. Directory listings are cached until the
+    modification time of the directory changes.
+
+    Args:
+        root (str): Static directory.
+        prefix (str): Route prefix of static files. e.g. '/static'
+
+    Keyword Args:
+        max_age (int): Seconds clients may cache files.
+        max_files (int): Maximum files kept in memory.
+        max_file_size (int): Maximum size in bytes of files kept in memory.
+        max_bytes (int): Maximum size in bytes of all files kept in memory.
+    """
+    def __init__(self, root, prefix, max_age=604800, max_files=1000,
+                 max_file_size=262144, max_bytes=16777216):
+        self._root = os.path.realpath(root)
+        self._prefix = prefix.strip('/')
+        self._max_age = max_age
+        self._max_files = max_files
+        self._max_file_size = max_file_size
+        self._max_bytes = max_bytes
+        self._files = OrderedDict()
+        self._bytes = 0
+        self._listings = {}
+        self._content_types = {}
+        self._lock = threading.Lock()
+
+    def resolve(self, req):
+        """Returns file for request.
+
+        The file is resolved once per request.
+
+        Returns:
+            StaticFile: File or None if directory.
+
+        Raises:
+            NotFoundError: No such file or directory.
+        """
+        try:
+            return req.context['_static_file']
+        except KeyError:
+            pass
+
+        path = self._path(req)
+        try:
+            file_stat = os.stat(path)
+        except (FileNotFoundError, NotADirectoryError):
+            raise NotFoundError("No such file or directory: '%s'" %
+                                req.route) from None
+
+        if stat.S_ISDIR(file_stat.st_mode):
+            static_file = None
+        else:
+            static_file = self._sidecar(req, path, file_stat)
+
+        req.context['_static_file'] = static_file
+        return static_file
+
+    def etag(self, req, resp):
+        """Validator for etag of file.
+
+        Also sets cache headers, since they apply to '304 Not Modified'
+        responses as well.
+        """
+        static_file = self.resolve(req)
+        if 'v' in req.query_params:
+            # NOTE(cfrademan): Content hashed URLs of themes never change.
+            resp.set_header('Cache-Control', 'max-age=31536000, immutable')
+        else:
+            resp.set_header('Cache-Control', 'max-age=%s' % self._max_age)
+
+        if static_file is not None:
+            if static_file.sidecar:
+                resp.set_header('Vary', 'Accept-Encoding')
+            return static_file.etag
+
+    def last_modified(self, req, resp):
+        """Validator for modification time of file."""
+        static_file = self.resolve(req)
+        if static_file is not None:
+            return static_file.last_modified
+
+    def __call__(self, req, resp):
+        static_file = self.resolve(req)
+
+        if static_file is None:
+            resp.set_header('Cache-Control', 'no-cache')
+            resp.content_type = const.TEXT_HTML
+            return self._listing(req, self._path(req))
+
+        resp.content_type = static_file.content_type
+        if static_file.encoding is not None:
+            resp.set_header('Content-Encoding', static_file.encoding)
+
+        if static_file.stat.st_size <= self._max_file_size:
+            return self._read(static_file)
+
+        return open(static_file.path, 'rb')
+
+    def _path(self, req):
+        route = req.route.strip('/')
+        if route.startswith(self._prefix):
+            route = route[len(self._prefix):]
+
+        path = os.path.realpath(os.path.join(self._root, route.strip('/')))
+
+        # NOTE(cfrademan): Never serve files outside of static directory.
+        if path != self._root and not path.startswith(self._root + os.sep):
+            raise NotFoundError("No such file or directory: '%s'" %
+                                req.route)
+
+        return path
+
+    def _sidecar(self, req, path, file_stat):
+        content_type = self._content_type(path)
+
+        try:
+            sidecar_stat = os.stat(path + '.gz')
+        except (FileNotFoundError, NotADirectoryError):
+            return StaticFile(path, file_stat, None, content_type, False)
+
+        if (sidecar_stat.st_mtime_ns >= file_stat.st_mtime_ns and
+                accept_encoding(req.get_header('Accept-Encoding'),
+                                ('gzip',)) == 'gzip'):
+            return StaticFile(path + '.gz', sidecar_stat, 'gzip',
+                              content_type, True)
+
+        return StaticFile(path, file_stat, None, content_type, True)
+
+    def _content_type(self, path):
+        extension = os.path.splitext(path)[1].lower()
+        try:
+            return self._content_types[extension]
+        except KeyError:
+            pass
+
+        mime_type, encoding = mimetypes.guess_type('file' + extension)
+        if mime_type is None or encoding is not None:
+            mime_type = const.APPLICATION_OCTET_STREAM
+
+        self._content_types[extension] = mime_type
+        return mime_type
+
+    def _read(self, static_file):
+        file_stat = static_file.stat
+        key = static_file.path
+        version = (file_stat.st_mtime_ns, file_stat.st_size,)
+
+        with self._lock:
+            try:
+                cached_version, data = self._files[key]
+                if cached_version == version:
+                    self._files.move_to_end(key)
+                    return data
+            except KeyError:
+                pass
+
+        with open(static_file.path, 'rb') as sfile:
+            data = sfile.read()
+
+        if len(data) > self._max_bytes:
+            return data
+
+        with self._lock:
+            try:
+                self._bytes -= len(self._files.pop(key)[1])
+            except KeyError:
+                pass
+            self._files[key] = (version, data,)
+            self._bytes += len(data)
+            while (len(self._files) > self._max_files or
+                    self._bytes > self._max_bytes):
+                self._bytes -= len(self._files.popitem(last=False)[1][1])
+
+        return data
+
+    def _listing(self, req, path):
+        mtime = os.stat(path).st_mtime_ns
+        key = (path, req.route,)
+
+        try:
+            cached_mtime, listing = self._listings[key]
+            if cached_mtime == mtime:
+                return listing
+        except KeyError:
+            pass
+
         page = HTMLDoc()
-        resp.content_type = const.TEXT_HTML
-        folder = os.listdir(sfile_path)
         html = page.create_element('HTML')
         head = html.create_element('HEAD')
         title = head.create_element('TITLE')
@@ -71,7 +278,7 @@ def static(req, resp):
         body = html.create_element('BODY')
         h1 = body.create_element('H1')
         h1.append(req.route)
-        for item in folder:
+        for item in sorted(os.listdir(path)):
             item = req.route.rstrip('/') + '/' + item
             a = body.create_element('A')
             a.set_attribute('href', item)
@@ -79,10 +286,28 @@ def static(req, resp):
             body.create_element('BR')
         h3 = body.create_element('H3')
         h3.append(metadata.identity)
-        return str(page)
-    else:
-        raise FileNotFoundError(
-            "No such file or directory: '%s'" % sfile_path
-        )
-    # except Exception as e:
-    #    return "Error %s" % (e,)
+        listing = str(page)
+
+        # NOTE(cfrademan): Bounded, routes may originate from clients.
+        if len(self._listings) >= self._max_files:
+            self._listings.clear()
+        self._listings[key] = (mtime, listing,)
+        return listing
+
+
+static = StaticFiles(
+    g.app.path.rstrip('/') + '/static',
+    g.app.config.get('application', 'static'),
+    max_age=g.app.config.getint('static', 'max_age', fallback=604800),
+    max_files=g.app.config.getint('static', 'max_files', fallback=1000),
+    max_file_size=g.app.config.getint('static', 'max_file_size',
+                                      fallback=262144),
+    max_bytes=g.app.config.getint('static', 'max_bytes',
+                                  fallback=16777216))
+
+# NOTE(cfrademan): The 'etag' and 'last_modified' methods are used as
+# validators for conditional requests.
+register.resource(['GET', 'HEAD', 'POST'],
+                  'regex:^/' +
+                  g.app.config.get('application', 'static').strip('/') +
+                  '.*$')(static)
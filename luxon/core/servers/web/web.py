@@ -83,5 +83,15 @@ def server(app_root=None, ip='127.0.0.1', port='8000'):
 
     import luxon.core.servers.web.static
 
+    # Compile routes once before forking workers.
+    from luxon import router
+    router.freeze()
+
+    # Remove metrics of previous runs before forking workers.
+    from luxon import g
+    if g.app.config.getboolean('metrics', 'enabled', fallback=False):
+        from luxon.core.metrics import Metrics
+        Metrics().clear()
+
     while True:
         StandaloneApplication(exec_g['application'], options).run()
@@ -29,11 +29,28 @@
 # THE POSSIBILITY OF SUCH DAMAGE.
 
 import os
+import time
+import threading
 
 from luxon import g
+from luxon.core.logger import GetLogger
+from luxon.utils.hashing import md5sum
+
+log = GetLogger(__name__)
 
 
 class Theme():
+    """Resolves URLs of theme static files.
+
+    Files are looked up in the theme of the host, the default theme and
+    then the builtin 'default' theme. An index of 'static/themes' is built
+    at startup, so resolving files does not check the file system.
+
+    The index is refreshed by calling reload() or by polling the
+    modification times every 'theme_poll' seconds. With 'theme_hash'
+    enabled URLs include a hash of the content, so clients can cache them
+    indefinitely.
+    """
     def __init__(self, app):
         self._default_theme = app.config.get(
             'application', 'default_theme',
@@ -46,6 +63,15 @@ class Theme():
         self._static_web_path += '/themes/'
         self._static_file_path += '/themes/'
 
+        self._poll = app.config.getint('application', 'theme_poll',
+                                       fallback=0)
+        self._hash = app.config.getboolean('application', 'theme_hash',
+                                           fallback=False)
+        self._pid = None
+        self._lock = threading.Lock()
+
+        self.reload()
+
     def __call__(self, the_file):
         # Remove / on both ends the_file
         the_file = the_file.strip('/')
@@ -53,21 +79,89 @@ class Theme():
         # Get Current Domain/Host
         host = g.current_request.host
 
-        # Domain Theme
-        check_file = host + '/' + the_file
-        if os.path.isfile(self._static_file_path + check_file):
-            return self._static_web_path + check_file
+        # NOTE(cfrademan): Resolved URLs are keyed by theme rather than
+        # host, since hosts without a theme originate from clients.
+        if host not in self._themes:
+            host = None
+
+        try:
+            return self._resolved[(host, the_file,)]
+        except KeyError:
+            pass
+
+        if self._poll > 0 and self._pid != os.getpid():
+            # NOTE(cfrademan): Threads do not survive forking workers.
+            self._watch()
+
+        url = self._resolve(host, the_file)
+        self._resolved[(host, the_file,)] = url
+
+        return url
 
-        # Default Theme
-        check_file = self._default_theme + '/' + the_file
-        if os.path.isfile(self._static_file_path + check_file):
-            return self._static_web_path + check_file
+    def reload(self, files=None):
+        """Rebuild index of theme files."""
+        if files is None:
+            files = self._scan()
 
-        # Builtin Tachyonic Theme
-        check_file = 'default' + '/' + the_file
-        if os.path.isfile(self._static_file_path + check_file):
-            return self._static_web_path + check_file
+        # NOTE(cfrademan): Replace references, so requests being served
+        # continue with a consistent index.
+        self._files = files
+        self._themes = frozenset(path.split('/')[0] for path in files)
+        self._resolved = {}
+
+    def _resolve(self, host, the_file):
+        files = self._files
+
+        for theme in (host, self._default_theme, 'default',):
+            if theme is None:
+                continue
+
+            # Domain Theme, Default Theme, Builtin Tachyonic Theme
+            check_file = theme + '/' + the_file
+            if check_file in files:
+                url = self._static_web_path + check_file
+                if self._hash:
+                    url += '?v=' + self._content_hash(check_file)
+                return url
 
         raise FileNotFoundError("Missing static" +
                                 " content '%s'" %
                                 (self._static_web_path + check_file,))
+
+    def _content_hash(self, check_file):
+        with open(self._static_file_path + check_file, 'rb') as theme_file:
+            return md5sum(theme_file.read())[:12]
+
+    def _scan(self):
+        """Returns modification time and size of theme files."""
+        files = {}
+        for root, dirs, names in os.walk(self._static_file_path):
+            for name in names:
+                path = os.path.join(root, name)
+                try:
+                    file_stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                files[os.path.relpath(path, self._static_file_path)] = (
+                    file_stat.st_mtime_ns, file_stat.st_size,)
+
+        return files
+
+    def _watch(self):
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+
+        def poll():
+            while True:
+                time.sleep(self._poll)
+                try:
+                    files = self._scan()
+                    if files != self._files:
+                        self.reload(files)
+                except Exception as e:
+                    log.error('Unable to scan themes (%s)' % e)
+
+        thread = threading.Thread(target=poll, name='theme', daemon=True)
+        thread.start()
@@ -16,12 +16,18 @@
 # MODIFIED FOR for Luxon Framework Project.
 # Original Project: https://github.com/falconry/falcon
 
+import os
+import sys
 import keyword
+import marshal
 import re
 import textwrap
+import threading
+from hashlib import sha1
 
 from six.moves import UserDict
 
+from luxon import metadata
 from luxon.ext.falcon import converters
 
 
@@ -39,6 +45,24 @@ _FIELD_PATTERN = re.compile(
 _IDENTIFIER_PATTERN = re.compile('[A-Za-z_][A-Za-z0-9_]*$')
 
 
+def _source_hash():
+    """Returns hash of luxon version and source generating finders.
+
+    Part of the key of finders cached on disk, so finders generated by
+    other versions are not used.
+    """
+    key = sha1(metadata.version.encode('utf-8'))
+    try:
+        with open(__file__, 'rb') as source:
+            key.update(source.read())
+    except OSError:
+        pass
+    return key.digest()
+
+
+_SOURCE_HASH = _source_hash()
+
+
 class CompiledRouter(object):
     """Fast URI router which compiles its routing logic to Python code.
 
@@ -50,18 +74,27 @@ class CompiledRouter(object):
     tree for each look-up, it generates inlined, bespoke Python code to
     perform the search, then compiles that code. This makes the route
     processing quite fast.
+
+    Compiling is deferred until the first find or an explicit freeze, so
+    adding routes remains cheap. If a cache path is set in options, the
+    compiled finder is stored on disk keyed by a hash of the route table,
+    Python and luxon version and re-used when the same routes are added
+    again, e.g. on restarts. Compiling is locked, so routes can be found by
+    many threads without freezing first.
     """
 
     __slots__ = (
         '_ast',
         '_converter_map',
+        '_compiled',
         '_converters',
-        '_find',
         '_finder_src',
+        '_lock',
         '_options',
         '_patterns',
         '_return_values',
         '_roots',
+        '_uri_templates',
     )
 
     def __init__(self):
@@ -78,10 +111,13 @@ class CompiledRouter(object):
         self._patterns = None
         self._return_values = None
         self._roots = []
+        self._uri_templates = []
 
-        # NOTE(kgriffs): Call _compile() last since it depends on
-        # the variables above.
-        self._find = self._compile()
+        # NOTE(cfrademan): Compiled on first find() or freeze(). The finder
+        # and its tables are replaced together as one tuple, so concurrent
+        # finds never see tables of another compile.
+        self._compiled = None
+        self._lock = threading.Lock()
 
     @property
     def options(self):
@@ -89,8 +125,18 @@ class CompiledRouter(object):
 
     @property
     def finder_src(self):
+        self.freeze()
         return self._finder_src
 
+    def freeze(self):
+        """Compile routing logic for the routes added.
+
+        Routes added afterwards will result in compiling again on the next
+        find.
+        """
+        if self._compiled is None:
+            self._compile()
+
     def add_route(self, uri_template, method_map, resource, tag=None, cache=0):
         """Adds a route between a URI path template and a resource.
 
@@ -153,7 +199,8 @@ class CompiledRouter(object):
                 insert(new_node.children, path_index + 1)
 
         insert(self._roots)
-        self._find = self._compile()
+        self._uri_templates.append(uri_template)
+        self._compiled = None
 
     def find(self, uri, req=None):
         """Search for a route that matches the given partial URI.
@@ -173,10 +220,14 @@ class CompiledRouter(object):
                 the requested path.
         """
 
+        compiled = self._compiled
+        if compiled is None:
+            compiled = self._compile()
+
+        find, return_values, patterns, converters = compiled
         path = uri.lstrip('/').split('/')
         params = {}
-        node = self._find(path, self._return_values, self._patterns,
-                          self._converters, params)
+        node = find(path, return_values, patterns, converters, params)
 
         if node is not None:
             return(node.resource,
@@ -402,14 +453,16 @@ class CompiledRouter(object):
         """Generates Python code for the entire routing tree.
 
         The generated code is compiled and the resulting Python method
-        is returned.
+        is returned with the tables it requires.
         """
-
-        src_lines = [
-            'def find(path, return_values, patterns, converters, params):',
-            _TAB_STR + 'path_len = len(path)',
-        ]
-
+        with self._lock:
+            # NOTE(cfrademan): Compiled by another thread while waiting.
+            compiled = self._compiled
+            if compiled is None:
+                compiled = self._compiled = self._compile_locked()
+            return compiled
+
+    def _compile_locked(self):
         self._return_values = []
         self._patterns = []
         self._converters = []
@@ -422,19 +475,70 @@ class CompiledRouter(object):
             self._patterns
         )
 
-        src_lines.append(self._ast.src(0))
+        # NOTE(cfrademan): The generated source only depends on the
+        # templates and the order they where added. The tables above still
+        # need to be built, since they reference the resources.
+        cache_file = self._cache_file()
+        if cache_file is not None:
+            try:
+                with open(cache_file, 'rb') as cached:
+                    self._finder_src, code = marshal.load(cached)
+            except (OSError, EOFError, ValueError, TypeError):
+                code = None
+        else:
+            code = None
+
+        if code is None:
+            src_lines = [
+                'def find(path, return_values, patterns, converters, params):',
+                _TAB_STR + 'path_len = len(path)',
+            ]
 
-        src_lines.append(
-            # PERF(kgriffs): Explicit return of None is faster than implicit
-            _TAB_STR + 'return None'
-        )
+            src_lines.append(self._ast.src(0))
+
+            src_lines.append(
+                # PERF(kgriffs): Explicit return of None is faster than
+                # implicit
+                _TAB_STR + 'return None'
+            )
+
+            self._finder_src = '\n'.join(src_lines)
+            code = compile(self._finder_src, '<string>', 'exec')
 
-        self._finder_src = '\n'.join(src_lines)
+            if cache_file is not None:
+                self._store(cache_file, code)
 
         scope = {}
-        exec(compile(self._finder_src, '<string>', 'exec'), scope)
+        exec(code, scope)
 
-        return scope['find']
+        return (scope['find'], self._return_values, self._patterns,
+                self._converters,)
+
+    def _cache_file(self):
+        cache_path = self._options.cache_path
+        if cache_path is None:
+            return None
+
+        key = sha1(sys.version.encode('utf-8'))
+        key.update(_SOURCE_HASH)
+        for uri_template in self._uri_templates:
+            key.update(b'\n' + uri_template.encode('utf-8'))
+
+        return os.path.join(cache_path, 'router_%s.marshal' % key.hexdigest())
+
+    def _store(self, cache_file, code):
+        tmp_file = cache_file + '.%s' % os.getpid()
+        try:
+            with open(tmp_file, 'wb') as cached:
+                marshal.dump((self._finder_src, code,), cached)
+            os.replace(tmp_file, cache_file)
+        except OSError:
+            # NOTE(cfrademan): Caching is an optimization only, failing to
+            # write the cache should not prevent routing.
+            try:
+                os.unlink(tmp_file)
+            except OSError:
+                pass
 
     def _instantiate_converter(self, klass, argstr=None):
         if argstr is None:
@@ -661,15 +765,18 @@ class CompiledRouterOptions(object):
                 to implement custom converters in a thread-safe
                 manner.
 
-
+        cache_path: Directory to store compiled routing logic. Files are
+            named by a hash of the route table and re-used when compiling
+            the same routes. Default None disables caching.
     """
 
-    __slots__ = ('converters',)
+    __slots__ = ('converters', 'cache_path',)
 
     def __init__(self):
         self.converters = ConverterDict(
             (name, converter) for name, converter in converters.BUILTIN
         )
+        self.cache_path = None
 
 
 # --------------------------------------------------------------------
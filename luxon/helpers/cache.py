@@ -27,44 +27,272 @@
 # CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
 # ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
 # THE POSSIBILITY OF SUCH DAMAGE.
+import os
+import time
+import fcntl
 import pickle
+import threading
+import contextvars
 
+from luxon import g
+from luxon.core.logger import GetLogger
 from luxon.utils.objects import object_name
 from luxon.core.cache import Cache
 from luxon.utils.hashing import md5sum
-from luxon.utils.objects import orderdict
 
+log = GetLogger(__name__)
 
-def cache(expire, func, *args, **kwargs):
-    global _cache_engine
+# Seconds before Redis locks expire, should the holder die.
+LOCK_TIMEOUT = 60
 
-    _cache_engine = Cache()
+# Thread locks per key with number of users.
+_locks = {}
+_locks_lock = threading.Lock()
 
-    # mem args used to build reference id for cache.
-    mem_args = [object_name(func), ]
 
-    # NOTE(cfrademan): This is important, we dont want object address,
-    # types etc inside of the cache reference. We cannot memoize based
-    # on args, kwargsargs provided to function containing objects other than
-    # str, int, float, bytes,
-    args = list(args) + list(orderdict(kwargs).items())
-    for arg in args:
-        if not isinstance(arg, (str, int, float, bytes,)):
-            mem_args.append(object_name(arg))
-        else:
-            raise ValueError("Cache 'callable' not possible with" +
-                             " args/kwargsargs containing values with types" +
-                             " other than 'str', 'int', 'float', 'bytes'")
+class _KeyLock(object):
+    """Lock for key between threads and optionally processes.
 
-    # create the actual key / reference id.
-    key = md5sum(pickle.dumps(mem_args))
+    Args:
+        key (str): Cache reference.
+        backend (str): 'thread', 'file' or 'redis'.
+    """
+    __slots__ = ('_key', '_backend', '_thread_lock', '_process_lock')
 
-    cached = _cache_engine.load(key)
+    def __init__(self, key, backend='thread'):
+        if backend not in ('thread', 'file', 'redis',):
+            raise ValueError("Invalid cache lock '%s'" % backend)
 
-    if cached is not None:
-        return cached
+        self._key = key
+        self._backend = backend
+        self._process_lock = None
+
+        with _locks_lock:
+            try:
+                entry = _locks[key]
+            except KeyError:
+                entry = _locks[key] = [threading.Lock(), 0]
+            entry[1] += 1
+        self._thread_lock = entry[0]
+
+    def acquire(self, blocking=True):
+        if not self._thread_lock.acquire(blocking):
+            self._unref()
+            return False
+
+        try:
+            if self._backend == 'file':
+                self._process_lock = self._file_lock(blocking)
+            elif self._backend == 'redis':
+                self._process_lock = self._redis_lock(blocking)
+        except Exception:
+            self._thread_lock.release()
+            self._unref()
+            raise
+
+        if self._backend != 'thread' and self._process_lock is None:
+            self._thread_lock.release()
+            self._unref()
+            return False
+
+        return True
+
+    def release(self):
+        try:
+            if self._backend == 'file':
+                # NOTE(cfrademan): Removed while still locked, so lock files
+                # do not accumulate. See _file_lock.
+                os.unlink(self._lock_path())
+                fcntl.flock(self._process_lock, fcntl.LOCK_UN)
+                os.close(self._process_lock)
+            elif self._backend == 'redis':
+                self._process_lock.release()
+        except Exception as e:
+            log.warning("Unable to release cache lock '%s' (%s)" %
+                        (self._key, e,))
+        finally:
+            self._thread_lock.release()
+            self._unref()
+
+    def _unref(self):
+        with _locks_lock:
+            entry = _locks[self._key]
+            entry[1] -= 1
+            if entry[1] == 0:
+                del _locks[self._key]
+
+    def _lock_path(self):
+        return os.path.join(g.app.path, 'tmp', 'locks',
+                            md5sum(self._key) + '.lock')
+
+    def _file_lock(self, blocking):
+        path = self._lock_path()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        while True:
+            fd = os.open(path, os.O_CREAT | os.O_RDWR, 0o600)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | (0 if blocking
+                                                 else fcntl.LOCK_NB))
+            except BlockingIOError:
+                os.close(fd)
+                return None
+
+            # NOTE(cfrademan): The previous holder may have removed the
+            # file while we waited, only the file at path is the lock.
+            try:
+                path_stat = os.stat(path)
+                fd_stat = os.fstat(fd)
+                if (path_stat.st_ino == fd_stat.st_ino and
+                        path_stat.st_dev == fd_stat.st_dev):
+                    return fd
+            except FileNotFoundError:
+                pass
+            os.close(fd)
 
-    result = func(*args, **kwargs)
-    _cache_engine.store(key, result, expire)
+    def _redis_lock(self, blocking):
+        from luxon.helpers.rd import strict
 
+        # NOTE(cfrademan): Released by background refresh thread, hence
+        # not thread local.
+        lock = strict().lock('lock:' + self._key, timeout=LOCK_TIMEOUT,
+                             thread_local=False)
+        if lock.acquire(blocking=blocking):
+            return lock
+        return None
+
+
+def _store(engine, key, expire, stale, compute):
+    result = compute()
+    # NOTE(cfrademan): Kept for the stale period after expiring.
+    engine.store(key, (result, time.time() + expire,), expire + stale)
     return result
+
+
+def _revalidate(engine, key, expire, stale, compute, lock):
+    """Refresh stale value in background, unless already refreshing."""
+    key_lock = _KeyLock(key, lock)
+    if not key_lock.acquire(blocking=False):
+        return
+
+    context = contextvars.copy_context()
+
+    def refresh():
+        try:
+            context.run(_store, engine, key, expire, stale, compute)
+        except Exception as e:
+            log.error("Refreshing cache '%s' failed (%s)" % (key, e,))
+        finally:
+            key_lock.release()
+
+    try:
+        threading.Thread(target=refresh, daemon=True).start()
+    except Exception:
+        key_lock.release()
+        raise
+
+
+def _load(key, expire, compute, stale=None, lock=None):
+    """Returns cached result of compute.
+
+    Only one caller per key computes the result while others wait for it.
+    Stale results are returned within the stale period after expiring,
+    while refreshed in a background thread.
+
+    Args:
+        key (str): Cache reference.
+        expire (int): Seconds result is fresh.
+        compute (callable): Returns result to cache.
+
+    Keyword Args:
+        stale (int): Seconds stale result may be returned.
+        lock (str): 'thread' for single-flight within the process, 'file' or
+            'redis' for all processes.
+
+    Defaults for stale and lock are from the 'cache' section of settings.ini.
+    """
+    if stale is None:
+        stale = g.app.config.getint('cache', 'stale', fallback=0)
+    if lock is None:
+        lock = g.app.config.get('cache', 'lock', fallback='thread')
+
+    engine = Cache()
+
+    cached = engine.load(key)
+    if cached is not None:
+        result, fresh = cached
+        if fresh <= time.time():
+            _revalidate(engine, key, expire, stale, compute, lock)
+        return result
+
+    key_lock = _KeyLock(key, lock)
+    key_lock.acquire()
+    try:
+        # NOTE(cfrademan): Computed by another caller while waiting.
+        cached = engine.load(key)
+        if cached is not None and cached[1] > time.time():
+            return cached[0]
+
+        return _store(engine, key, expire, stale, compute)
+    finally:
+        key_lock.release()
+
+
+def namespace(func):
+    """Returns cache namespace for function.
+
+    Args:
+        func (callable): Function.
+    """
+    try:
+        return func.__module__ + '.' + func.__qualname__
+    except (AttributeError, TypeError):
+        return object_name(func)
+
+
+def reference(namespace, args, kwargs):
+    """Returns cache reference for function arguments.
+
+    The reference is a hash of the pickled argument values, so equal
+    values of the same types usually share the reference. Pickles are not
+    canonical, equal sets may pickle in different order and objects
+    repeated within the arguments are pickled as references. Such calls
+    are cached separately, which only costs additional misses.
+
+    Args:
+        namespace (str): Namespace of function.
+        args (tuple): Positional arguments.
+        kwargs (dict): Keyword arguments.
+
+    Raises:
+        ValueError: Arguments cannot be pickled.
+    """
+    try:
+        # NOTE(cfrademan): Sorted, so the order of keyword arguments does
+        # not matter. Keywords are unique, values are never compared.
+        value = pickle.dumps((args, sorted(kwargs.items()),),
+                             pickle.HIGHEST_PROTOCOL)
+    except Exception as e:
+        raise ValueError("Cache '%s' not possible with arguments" % namespace +
+                         " that cannot be pickled (%s)" % e) from None
+
+    return namespace + ':' + md5sum(value)
+
+
+def cache(expire, func, *args, **kwargs):
+    """Returns result of function cached.
+
+    Results are cached by the values of the arguments, which must be
+    picklable.
+
+    Concurrent callers missing the cache for the same function and
+    arguments wait for one call instead of all calling the function. The
+    'stale' and 'lock' options in the 'cache' section of settings.ini
+    configure stale-while-revalidate and locking across processes.
+
+    Args:
+        expire (int): Seconds to cache result.
+        func (callable): Function to call.
+    """
+    key = reference(namespace(func), args, kwargs)
+
+    return _load(key, expire, lambda: func(*args, **kwargs))
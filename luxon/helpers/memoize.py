@@ -27,12 +27,176 @@
 # CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
 # ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
 # THE POSSIBILITY OF SUCH DAMAGE.
-from luxon.utils.decorator import decorator
-from luxon.helpers.cache import cache
+import threading
+from time import monotonic
+from functools import wraps
+from collections import OrderedDict, namedtuple
 
+from luxon import g
+from luxon.core.cache import Cache
+from luxon.exceptions import NoContextError
+from luxon.helpers.cache import _load, namespace, reference
 
-def memoize(expire=3600):
-    def _memoize(func, *args, **kwargs):
-        return cache(expire, func, *args, *kwargs)
+SCOPES = ('app', 'request',)
 
-    return decorator(_memoize)
+CacheInfo = namedtuple('CacheInfo', ('hits', 'misses', 'maxsize',
+                                     'currsize',))
+
+
+def memoize(expire=3600, maxsize=None, scope='app'):
+    """Decorator caching results of function by argument values.
+
+    Results are cached by the hash of the pickled argument values in a
+    namespace of the module and name of the function. Arguments must be
+    picklable, otherwise ValueError is raised.
+
+    With scope 'app' results are stored in the cache backend configured in
+    settings.ini for expire seconds, shared by processes depending on the
+    backend. See luxon.helpers.cache.cache. With scope 'request' results are
+    only kept for the current request and never expire. Outside of a
+    request the function is called every time.
+
+    The decorated function has methods similar to functools.lru_cache:
+
+        * cache_info() returns CacheInfo with hits, misses, maxsize and
+          currsize of this process.
+        * cache_clear() invalidates results of all processes sharing the
+          backend by incrementing the generation of the namespace. See
+          luxon.core.cache.Cache.invalidate.
+
+    Example:
+
+        @memoize(expire=60, maxsize=1000)
+        def user(id):
+            ...
+
+    Keyword Args:
+        expire (int): Seconds to cache results.
+        maxsize (int): Maximum number of results cached by this process,
+            least recently used are deleted. Default None is unbounded.
+        scope (str): 'app' or 'request'.
+    """
+    if callable(expire):
+        # Used without arguments, @memoize.
+        return memoize()(expire)
+
+    if scope not in SCOPES:
+        raise ValueError("Invalid memoize scope '%s'" % scope)
+
+    def decorator(func):
+        name = namespace(func)
+        # NOTE(cfrademan): References stored by this process in least
+        # recently used order with time expired. Used for maxsize,
+        # cache_clear and cache_info.
+        stored = OrderedDict()
+        lock = threading.Lock()
+        counters = [0, 0]
+
+        def request_memo():
+            try:
+                memo = g.current_request.memo
+            except NoContextError:
+                return None
+
+            try:
+                return memo[name]
+            except KeyError:
+                results = memo[name] = OrderedDict()
+                return results
+
+        def track(key):
+            stale = g.app.config.getint('cache', 'stale', fallback=0)
+            now = monotonic()
+            evicted = []
+            with lock:
+                stored[key] = now + expire + stale
+                stored.move_to_end(key)
+                # NOTE(cfrademan): Expired references are already removed
+                # by the backend, only forgotten.
+                while stored and next(iter(stored.values())) <= now:
+                    stored.popitem(last=False)
+                while maxsize is not None and len(stored) > maxsize:
+                    evicted.append(stored.popitem(last=False)[0])
+
+            if evicted:
+                engine = Cache()
+                for old in evicted:
+                    engine.delete(old)
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if scope == 'request':
+                results = request_memo()
+                if results is None:
+                    return func(*args, **kwargs)
+
+                key = reference(name, args, kwargs)
+
+                try:
+                    result = results[key]
+                    results.move_to_end(key)
+                    counters[0] += 1
+                    return result
+                except KeyError:
+                    counters[1] += 1
+
+                result = results[key] = func(*args, **kwargs)
+                if maxsize is not None and len(results) > maxsize:
+                    results.popitem(last=False)
+                return result
+
+            key = reference('%s:%s' % (name, Cache().generation(name),),
+                            args, kwargs)
+            computed = []
+
+            def compute():
+                computed.append(True)
+                return func(*args, **kwargs)
+
+            result = _load(key, expire, compute)
+
+            if computed:
+                counters[1] += 1
+                track(key)
+            else:
+                counters[0] += 1
+                with lock:
+                    if key in stored:
+                        stored.move_to_end(key)
+
+            return result
+
+        def cache_info():
+            if scope == 'request':
+                results = request_memo()
+                currsize = len(results) if results is not None else 0
+            else:
+                currsize = len(stored)
+
+            return CacheInfo(counters[0], counters[1], maxsize, currsize)
+
+        def cache_clear():
+            counters[0] = counters[1] = 0
+
+            if scope == 'request':
+                results = request_memo()
+                if results is not None:
+                    results.clear()
+                return
+
+            with lock:
+                keys = list(stored)
+                stored.clear()
+
+            engine = Cache()
+            engine.invalidate(name)
+            # NOTE(cfrademan): No longer loaded, deleted to free memory.
+            for key in keys:
+                engine.delete(key)
+
+        wrapper.cache_info = cache_info
+        wrapper.cache_clear = cache_clear
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2018 Christiaan Frans Rademan.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# * Neither the name of the copyright holders nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+import datetime
+from decimal import Decimal
+
+# Types considered immutable, including their contents.
+IMMUTABLE = (str, bytes, int, float, complex, bool, type(None), Decimal,
+             datetime.date, datetime.time, datetime.timedelta,
+             datetime.tzinfo,)
+
+
+class FrozenDict(dict):
+    """Immutable dictionary.
+
+    Subclass of dict, so it can be serialized and rendered like any other
+    dictionary, but raises TypeError when modified.
+    """
+    __slots__ = ('_hash',)
+
+    def _immutable(self, *args, **kwargs):
+        raise TypeError("'FrozenDict' object is immutable")
+
+    __setitem__ = __delitem__ = _immutable
+    clear = pop = popitem = setdefault = update = _immutable
+    __ior__ = _immutable
+
+    def __hash__(self):
+        try:
+            return self._hash
+        except AttributeError:
+            self._hash = hash(frozenset(self.items()))
+            return self._hash
+
+    def copy(self):
+        return dict(self)
+
+    def __reduce__(self):
+        return (FrozenDict, (dict(self),))
+
+
+def freeze(obj):
+    """Returns deep immutable copy of object.
+
+    Lists and tuples become tuples, sets become frozensets and dicts become
+    FrozenDicts. Subclasses of these containers are not converted, since
+    their type would be lost.
+
+    Args:
+        obj (object): Object to freeze.
+
+    Raises:
+        TypeError: Object contains values of unsupported types.
+    """
+    obj_type = type(obj)
+
+    if isinstance(obj, IMMUTABLE) or obj_type is FrozenDict:
+        return obj
+    elif obj_type is dict:
+        return FrozenDict((key, freeze(value),)
+                          for key, value in obj.items())
+    elif obj_type is list or obj_type is tuple:
+        return tuple([freeze(value) for value in obj])
+    elif obj_type is set or obj_type is frozenset:
+        return frozenset([freeze(value) for value in obj])
+    elif obj_type is bytearray:
+        return bytes(obj)
+
+    raise TypeError("Unable to freeze '%s' object" % type(obj).__name__)
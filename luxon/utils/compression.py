@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2018 Christiaan Frans Rademan.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# * Neither the name of the copyright holders nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+import zlib
+
+# NOTE(cfrademan): HTTP 'deflate' is the zlib format, 'gzip' adds the gzip
+# header and trailer.
+_WBITS = {
+    'gzip': 16 + zlib.MAX_WBITS,
+    'deflate': zlib.MAX_WBITS,
+}
+
+
+def compress(data, encoding='gzip', level=6):
+    """Compress bytes with HTTP content-coding.
+
+    Args:
+        data (bytes): Data to be compressed.
+
+    Keyword Args:
+        encoding (str): 'gzip' or 'deflate'.
+        level (int): Compression level 1 to 9.
+
+    Returns:
+        bytes: Compressed data.
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, _WBITS[encoding])
+    return compressor.compress(data) + compressor.flush()
+
+
+def compress_stream(chunks, encoding='gzip', level=6):
+    """Compress iterable of bytes with HTTP content-coding chunk by chunk.
+
+    Args:
+        chunks (iterable): Iterable of bytes to be compressed.
+
+    Keyword Args:
+        encoding (str): 'gzip' or 'deflate'.
+        level (int): Compression level 1 to 9.
+
+    Returns:
+        generator: Compressed bytes.
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, _WBITS[encoding])
+    for chunk in chunks:
+        chunk = compressor.compress(chunk)
+        if chunk:
+            yield chunk
+    yield compressor.flush()
+
+
+def decompress(data, encoding='gzip'):
+    """Decompress bytes with HTTP content-coding.
+
+    Args:
+        data (bytes): Compressed data.
+
+    Keyword Args:
+        encoding (str): 'gzip' or 'deflate'.
+
+    Returns:
+        bytes: Decompressed data.
+    """
+    return zlib.decompress(data, _WBITS[encoding])
@@ -32,6 +32,7 @@ import os
 import stat
 import fcntl
 import shutil
+import hashlib
 from luxon.utils.encoding import if_bytes_to_unicode
 from luxon.utils.timezone import to_timezone, TimezoneSystem, TimezoneUTC
 from luxon.utils.singleton import NamedSingleton
@@ -138,6 +139,34 @@ class FileObject(object):
         self.type = type
         self.file = file
 
+    def save(self, path, block=65536):
+        """Write file to path in blocks.
+
+        Args:
+            path (str): Destination path.
+
+        Keyword Args:
+            block (int): Size of blocks copied.
+        """
+        self.file.seek(0)
+        with open(path, 'wb') as dst:
+            shutil.copyfileobj(self.file, dst, block)
+        self.file.seek(0)
+
+    def hexdigest(self, algorithm='md5', block=65536):
+        """Returns hash of file as hex digest without reading it whole.
+
+        Keyword Args:
+            algorithm (str): Any algorithm supported by hashlib.
+            block (int): Size of blocks hashed.
+        """
+        digest = hashlib.new(algorithm)
+        self.file.seek(0)
+        for chunk in iter(lambda: self.file.read(block), b''):
+            digest.update(chunk)
+        self.file.seek(0)
+        return digest.hexdigest()
+
 
 class Open(object):
     """Open File
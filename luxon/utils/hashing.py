@@ -28,7 +28,7 @@
 # ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
 # THE POSSIBILITY OF SUCH DAMAGE.
 
-from hashlib import md5
+from hashlib import md5, blake2b
 from luxon.utils.encoding import if_unicode_to_bytes
 
 def md5sum(val):
@@ -38,3 +38,16 @@ def md5sum(val):
         val (binary str): value to be hashed"""
     val = if_unicode_to_bytes(val)
     return md5(val).hexdigest()
+
+
+def blake2bsum(val, digest_size=16):
+    """Returns a blake2b hash as a hex digest
+
+    Faster than md5 on 64-bit platforms. The default digest size matches
+    the length of an md5 digest.
+
+    Args:
+        val (binary str): value to be hashed
+        digest_size (int): size of digest in bytes"""
+    val = if_unicode_to_bytes(val)
+    return blake2b(val, digest_size=digest_size).hexdigest()
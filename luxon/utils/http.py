@@ -28,10 +28,10 @@
 # ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
 # THE POSSIBILITY OF SUCH DAMAGE.
 import re
-import cgi
 import string
 import pickle
 from collections import OrderedDict
+from collections.abc import Mapping
 
 import requests
 from luxon import g
@@ -57,7 +57,7 @@ from luxon.utils.encoding import if_unicode_to_bytes, if_bytes_to_unicode
 from luxon.exceptions import JSONDecodeError
 from luxon.utils.text import unquote_string
 from luxon.structs.cidict import CiDict
-from luxon.utils.hashing import md5sum
+from luxon.utils.hashing import md5sum, blake2bsum
 from luxon.core.cache import Cache
 from luxon.utils.timezone import utc, now
 from luxon.utils.objects import orderdict
@@ -66,11 +66,27 @@ from luxon.utils.unique import string_id
 log = GetLogger(__name__)
 
 
-def etagger(*args):
+def etagger(*args, algorithm='md5'):
+    """Generate etag from values.
+
+    Bytes are hashed as is, other values as strings.
+
+    Args:
+        args: values to generate etag from. e.g. body, encoding.
+
+    Keyword Args:
+        algorithm (str): 'md5' or faster 'blake2b'.
+
+    Returns:
+        str: hex digest or None if no values.
+    """
     to_hash = b"".join([
-        if_unicode_to_bytes(str(arg) or b'') for arg in args
+        arg if isinstance(arg, bytes) else if_unicode_to_bytes(str(arg))
+        for arg in args
     ])
     if to_hash != b'':
+        if algorithm == 'blake2b':
+            return blake2bsum(to_hash)
         return md5sum(to_hash)
 
 
@@ -169,6 +185,85 @@ def parse_headers_values(header):
     ]
 
 
+def parse_header(line):
+    """Parse header with parameters such as Content-Type.
+
+    Semicolons within quoted parameter values are preserved.
+
+    Args:
+        line (str): Header value. e.g. 'form-data; name="file"'
+
+    Returns:
+        tuple: Main value in lowercase and dict of parameters.
+    """
+    params = {}
+    parts = []
+    start = 0
+    quoted = False
+    escaped = False
+
+    for pos, char in enumerate(line):
+        if escaped:
+            escaped = False
+        elif char == '\\' and quoted:
+            escaped = True
+        elif char == '"':
+            quoted = not quoted
+        elif char == ';' and not quoted:
+            parts.append(line[start:pos])
+            start = pos + 1
+    parts.append(line[start:])
+
+    for param in parts[1:]:
+        name, sep, value = param.partition('=')
+        name = name.strip().lower()
+        if sep and name:
+            params[name] = unquote_string(value.strip())
+
+    return (parts[0].strip().lower(), params,)
+
+
+def accept_encoding(header, encodings=('gzip', 'deflate',)):
+    """Negotiate content-coding from Accept-Encoding header.
+
+    Reference RFC 7231, Section 5.3.4.
+
+    Args:
+        header (str): Accept-Encoding header value.
+
+    Keyword Args:
+        encodings (tuple): Supported encodings in order of preference.
+
+    Returns:
+        str: Encoding acceptable to client or None for identity.
+    """
+    if not header:
+        return None
+
+    qvalues = {}
+    for element in header.split(','):
+        coding, sep, params = element.partition(';')
+        qvalue = 1.0
+        for param in params.split(';'):
+            name, sep, value = param.partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    qvalue = float(value)
+                except ValueError:
+                    qvalue = 0.0
+        qvalues[coding.strip().lower()] = qvalue
+
+    preferred = None
+    preferred_qvalue = 0.0
+    for encoding in encodings:
+        qvalue = qvalues.get(encoding, qvalues.get('*', 0.0))
+        if qvalue > preferred_qvalue:
+            preferred = encoding
+            preferred_qvalue = qvalue
+
+    return preferred
+
+
 class ForwardedElement(object):
     """Representation of Forwarded header.
 
@@ -307,7 +402,7 @@ def content_type_encoding(header):
     if not header:
         return None
 
-    content_type, params = cgi.parse_header(header)
+    content_type, params = parse_header(header)
 
     if 'charset' in params:
         return params['charset'].strip("'\"")
@@ -364,6 +459,83 @@ def parse_link_header(header):
     return links
 
 
+_COOKIE_ESCAPE_RE = re.compile(r'\\(?:([0-3][0-7][0-7])|(.))')
+
+
+def _unescape_cookie(match):
+    if match.group(1):
+        return chr(int(match.group(1), 8))
+    return match.group(2)
+
+
+class Cookies(Mapping):
+    """Read-only mapping of request cookie names to values.
+
+    Quoted values are only unquoted and unescaped when accessed, once.
+
+    Args:
+        cookies (dict): Cookie names with raw values.
+    """
+    __slots__ = ('_cookies', '_decoded',)
+
+    def __init__(self, cookies):
+        self._cookies = cookies
+        self._decoded = {}
+
+    def __getitem__(self, name):
+        try:
+            return self._decoded[name]
+        except KeyError:
+            pass
+
+        value = self._cookies[name]
+        if value[:1] == '"' and len(value) > 1 and value[-1] == '"':
+            value = _COOKIE_ESCAPE_RE.sub(_unescape_cookie, value[1:-1])
+        self._decoded[name] = value
+        return value
+
+    def __contains__(self, name):
+        return name in self._cookies
+
+    def __iter__(self):
+        return iter(self._cookies)
+
+    def __len__(self):
+        return len(self._cookies)
+
+    def __repr__(self):
+        return 'Cookies(%r)' % dict(self)
+
+    def copy(self):
+        return dict(self)
+
+
+def parse_cookie_header(header):
+    """Parse Cookie request header.
+
+    Single pass over the header, values are decoded lazily. Parts without
+    a name and value such as attributes are ignored. The last value wins
+    when a name is repeated.
+
+    Args:
+        header (str): Cookie header value.
+
+    Returns:
+        Cookies: Read-only mapping of cookie names to values.
+    """
+    cookies = {}
+
+    if header:
+        for part in header.split(';'):
+            name, sep, value = part.partition('=')
+            if sep:
+                name = name.strip()
+                if name:
+                    cookies[name] = value.strip()
+
+    return Cookies(cookies)
+
+
 CACHE_CONTROL_RE = re.compile(r"[a-z_\-]+=[0-9]+", re.IGNORECASE)
 CACHE_CONTROL_OPTION_RE = re.compile(r"[a-z_\-] +", re.IGNORECASE)
 
@@ -497,7 +669,7 @@ class Response(object):
     def content_type(self):
         try:
             header = self.headers['content-type']
-            content_type, params = cgi.parse_header(header)
+            content_type, params = parse_header(header)
             if content_type is not None:
                 return str(content_type).upper()
             else:
@@ -528,7 +700,7 @@ class Response(object):
     def encoding(self):
         try:
             header = self.headers['content_type']
-            content_type, params = cgi.parse_header(header)
+            content_type, params = parse_header(header)
             if 'charset' in params:
                 return params['charset'].strip("'\"").upper()
             if 'text' in content_type:
@@ -29,6 +29,7 @@
 # THE POSSIBILITY OF SUCH DAMAGE.
 
 import json
+import codecs
 import datetime
 from decimal import Decimal
 
@@ -85,6 +86,132 @@ def loads(json_text, **kwargs):
         raise JSONDecodeError(e) from None
 
 
+class _Scanner(object):
+    """Scans JSON text read in blocks from a stream."""
+    __slots__ = ('_stream', '_block', '_decoder', '_incremental', 'buf',
+                 'pos', 'eof')
+
+    _WHITESPACE = ' \t\n\r'
+    _DELIMITERS = ',]}:' + _WHITESPACE
+
+    def __init__(self, stream, block, **kwargs):
+        self._stream = stream
+        self._block = block
+        self._decoder = json.JSONDecoder(**kwargs)
+        self._incremental = codecs.getincrementaldecoder('utf-8')()
+        self.buf = ''
+        self.pos = 0
+        self.eof = False
+
+    def fill(self, size=0):
+        """Read at least size characters or block when possible."""
+        # NOTE(cfrademan): Discard consumed text, so the buffer only holds
+        # the value currently being decoded.
+        self.buf = self.buf[self.pos:]
+        self.pos = 0
+        read = 0
+        while not self.eof and read < max(size, 1):
+            chunk = self._stream.read(self._block)
+            if not chunk:
+                self.eof = True
+                text = self._incremental.decode(b'', True)
+            else:
+                text = self._incremental.decode(chunk)
+            self.buf += text
+            read += len(text)
+
+    def peek(self):
+        """Returns next character that is not whitespace or '' at end."""
+        while True:
+            while (self.pos < len(self.buf) and
+                   self.buf[self.pos] in self._WHITESPACE):
+                self.pos += 1
+            if self.pos < len(self.buf) or self.eof:
+                return self.buf[self.pos:self.pos + 1]
+            self.fill()
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise JSONDecodeError("Expected '%s'" % char)
+        self.pos += 1
+
+    def value(self):
+        """Decode complete value at current position."""
+        self.peek()
+        while True:
+            try:
+                obj, end = self._decoder.raw_decode(self.buf, self.pos)
+                # NOTE(cfrademan): A number or literal may continue in the
+                # next block, unless followed by a delimiter.
+                if (self.eof or self.buf[end - 1] in '"]}' or
+                        (end < len(self.buf) and
+                         self.buf[end] in self._DELIMITERS)):
+                    self.pos = end
+                    return obj
+            except json.decoder.JSONDecodeError as e:
+                if self.eof:
+                    raise JSONDecodeError(e) from None
+            # NOTE(cfrademan): Double the buffer, so large values are
+            # decoded a logarithmic number of times.
+            self.fill(len(self.buf) - self.pos)
+
+
+def loads_iter(stream, path='item', block=65536, **kwargs):
+    """Deserializes elements of a JSON array incrementally from a stream.
+
+    Elements are yielded as they are decoded, so only one element is held
+    in memory at a time regardless of the size of the document.
+
+    The path follows the prefix notation of ijson. 'item' refers to the
+    elements of a top-level array, 'rows.item' to the elements of the array
+    at key 'rows' in a top-level object. Values of other keys preceding the
+    array are decoded and discarded.
+
+    Args:
+        stream (file): Binary file-like object with UTF-8 JSON document.
+
+    Keyword Args:
+        path (str): Path to array.
+        block (int): Size of blocks read from stream.
+
+    Yields:
+        python object per element of array.
+
+    Raises:
+        JSONDecodeError: Malformed document.
+    """
+    keys = path.split('.')
+    if keys[-1] != 'item' or 'item' in keys[:-1]:
+        raise ValueError("Invalid path '%s'" % path)
+
+    scanner = _Scanner(stream, block, **kwargs)
+
+    for key in keys[:-1]:
+        scanner.expect('{')
+        while True:
+            if scanner.peek() == '}':
+                # Key not found.
+                return
+            name = scanner.value()
+            scanner.expect(':')
+            if name == key:
+                break
+            scanner.value()
+            if scanner.peek() == ',':
+                scanner.pos += 1
+
+    scanner.expect('[')
+    if scanner.peek() == ']':
+        return
+
+    while True:
+        yield scanner.value()
+        char = scanner.peek()
+        if char == ']':
+            return
+        scanner.expect(',')
+
+
 def dumps(obj, indent=4):
     """Serializes an object as a JSON formatted stream (indented)
 
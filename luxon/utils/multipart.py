@@ -0,0 +1,373 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2018 Christiaan Frans Rademan.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# * Neither the name of the copyright holders nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+from tempfile import SpooledTemporaryFile
+
+from luxon.utils.http import parse_header
+from luxon.utils.uri import decode
+from luxon.exceptions import HTTPBadRequest, HTTPRequestHeaderFieldsTooLarge
+
+# Size of blocks read from the request stream.
+BLOCK_SIZE = 65536  # 64 KiB
+
+# Parts larger than this are spooled to temporary files.
+SPOOL_SIZE = 1048576  # 1 MiB
+
+# Maximum size of headers for each part.
+MAX_HEADER_SIZE = 16384  # 16 KiB
+
+
+def _read(stream, length, block=BLOCK_SIZE):
+    """Yields blocks from stream not exceeding length."""
+    while length > 0:
+        chunk = stream.read(min(block, length))
+        if not chunk:
+            break
+        length -= len(chunk)
+        yield chunk
+
+
+class FormField(object):
+    """Form field or uploaded file.
+
+    Contents are kept in memory until larger than the spool size, after
+    which they are written to a temporary file. The file is rewound after
+    parsing, so it can be read, hashed or saved in blocks.
+
+    Attributes:
+        name (str): Field name.
+        filename (str): Filename of upload or None for fields.
+        type (str): Content-Type of part.
+        headers (dict): Headers of part with lowercase names.
+        file (file): File-like object with contents of part.
+    """
+    __slots__ = ('name', 'filename', 'type', 'charset', 'headers', 'file',
+                 '_value')
+
+    def __init__(self, name, filename=None, type='text/plain',
+                 charset='utf-8', headers=None, file=None, value=None):
+        self.name = name
+        self.filename = filename
+        self.type = type
+        self.charset = charset
+        self.headers = headers or {}
+        self.file = file
+        self._value = value
+
+    def __repr__(self):
+        return 'FormField(%r, %r, %r)' % (self.name, self.filename,
+                                          self.type,)
+
+    @property
+    def value(self):
+        """Contents of part.
+
+        Returns str for fields and bytes for uploaded files. Reading the
+        value of a large upload loads it into memory, rather read the file.
+        """
+        if self._value is not None:
+            return self._value
+
+        self.file.seek(0)
+        value = self.file.read()
+        self.file.seek(0)
+
+        if self.filename is None:
+            return value.decode(self.charset, 'replace')
+
+        return value
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+
+
+def parse_urlencoded(stream, length, block=BLOCK_SIZE):
+    """Parse application/x-www-form-urlencoded request body.
+
+    The body is read in blocks and fields are yielded as completed.
+
+    Args:
+        stream (file): Request body stream.
+        length (int): Content-Length of body.
+
+    Keyword Args:
+        block (int): Size of blocks read from stream.
+
+    Yields:
+        FormField: Form fields in order received.
+    """
+    pending = b''
+    chunks = _read(stream, length, block)
+
+    while True:
+        chunk = next(chunks, None)
+        if chunk is None:
+            fields = [pending]
+        else:
+            fields = (pending + chunk).split(b'&')
+            pending = fields.pop()
+
+        for field in fields:
+            if not field:
+                continue
+            name, sep, value = field.decode('utf-8', 'replace').partition('=')
+            yield FormField(decode(name), value=decode(value))
+
+        if chunk is None:
+            break
+
+
+def parse_multipart(stream, boundary, length, spool_size=SPOOL_SIZE,
+                    block=BLOCK_SIZE):
+    """Parse multipart/form-data request body.
+
+    The body is read in blocks and each part is written to its own spooled
+    file as the delimiter is searched for. Memory used is bounded by the
+    block size, the spool size and the size of part headers irrespective
+    of the size of the request.
+
+    Both CRLF and bare LF line breaks are accepted.
+
+    Args:
+        stream (file): Request body stream.
+        boundary (str): Boundary from Content-Type header.
+        length (int): Content-Length of body.
+
+    Keyword Args:
+        spool_size (int): Size in bytes after which parts are written to
+            temporary files.
+        block (int): Size of blocks read from stream.
+
+    Yields:
+        FormField: Form fields and files in order received.
+
+    Raises:
+        HTTPBadRequest: Malformed multipart body.
+        HTTPRequestHeaderFieldsTooLarge: Headers of part too large.
+    """
+    if not boundary:
+        raise HTTPBadRequest('Missing multipart boundary')
+
+    delimiter = b'\n--' + boundary.encode('latin-1')
+    # NOTE(cfrademan): Data preceding a delimiter may end with a CR of the
+    # line break belonging to the delimiter, which must not be written.
+    keep = len(delimiter) + 1
+    chunks = _read(stream, length, block)
+
+    # NOTE(cfrademan): Prepending a line break allows the first delimiter
+    # to be found when the body has no preamble.
+    buf = b'\n'
+    field = None
+
+    while True:
+        # Search for delimiter and write data preceding it to part.
+        pos = buf.find(delimiter)
+        while pos == -1:
+            if len(buf) > keep:
+                if field is not None:
+                    field.file.write(buf[:-keep])
+                buf = buf[-keep:]
+            chunk = next(chunks, None)
+            if chunk is None:
+                raise HTTPBadRequest('Incomplete multipart body')
+            buf += chunk
+            pos = buf.find(delimiter)
+
+        if field is not None:
+            data = buf[:pos]
+            if data.endswith(b'\r'):
+                data = data[:-1]
+            field.file.write(data)
+            field.file.seek(0)
+            yield field
+            field = None
+
+        buf = buf[pos + len(delimiter):]
+
+        # Remainder of delimiter line. Either closing or line break.
+        while len(buf) < 2 or (buf[:2] != b'--' and b'\n' not in buf):
+            if len(buf) > MAX_HEADER_SIZE:
+                raise HTTPBadRequest('Malformed multipart delimiter')
+            chunk = next(chunks, None)
+            if chunk is None:
+                raise HTTPBadRequest('Incomplete multipart body')
+            buf += chunk
+
+        if buf[:2] == b'--':
+            # NOTE(cfrademan): The epilogue is ignored and not read.
+            return
+
+        line, sep, buf = buf.partition(b'\n')
+        if line.strip(b' \t\r'):
+            raise HTTPBadRequest('Malformed multipart delimiter')
+
+        # Headers of part.
+        while True:
+            if buf[:1] == b'\n' or buf[:2] == b'\r\n':
+                headers, buf = b'', buf[buf.index(b'\n') + 1:]
+                break
+
+            end = buf.find(b'\n\n')
+            crlf_end = buf.find(b'\r\n\r\n')
+            if crlf_end != -1 and (end == -1 or crlf_end < end):
+                headers, buf = buf[:crlf_end], buf[crlf_end + 4:]
+                break
+            elif end != -1:
+                headers, buf = buf[:end], buf[end + 2:]
+                break
+
+            if len(buf) > MAX_HEADER_SIZE:
+                raise HTTPRequestHeaderFieldsTooLarge(
+                    'Multipart headers too large')
+            chunk = next(chunks, None)
+            if chunk is None:
+                raise HTTPBadRequest('Incomplete multipart body')
+            buf += chunk
+
+        field = _part(headers, spool_size)
+
+
+def _part(headers, spool_size):
+    parsed = {}
+    for line in headers.split(b'\n'):
+        name, sep, value = line.decode('utf-8', 'replace').partition(':')
+        if sep:
+            parsed[name.strip().lower()] = value.strip()
+
+    disposition, params = parse_header(parsed.get('content-disposition',
+                                                  ''))
+    content_type, type_params = parse_header(parsed.get('content-type',
+                                                        'text/plain'))
+
+    return FormField(params.get('name'),
+                     filename=params.get('filename'),
+                     type=content_type,
+                     charset=type_params.get('charset', 'utf-8'),
+                     headers=parsed,
+                     file=SpooledTemporaryFile(max_size=spool_size))
+
+
+class Form(object):
+    """Form submitted in request body.
+
+    Supports multipart/form-data and application/x-www-form-urlencoded
+    content. The body is only parsed when the form is first accessed.
+    Other content types result in an empty form.
+
+    Fields are accessed by name similar to cgi.FieldStorage. Indexing
+    returns a FormField or list of FormFields when the field was submitted
+    more than once.
+
+    Args:
+        stream (file): Request body stream.
+        content_type (str): Content-Type header of request.
+        length (int): Content-Length of request.
+
+    Keyword Args:
+        spool_size (int): Size in bytes after which uploads are written to
+            temporary files.
+    """
+    __slots__ = ('_stream', '_content_type', '_length', '_spool_size',
+                 '_fields',)
+
+    def __init__(self, stream, content_type, length, spool_size=SPOOL_SIZE):
+        self._stream = stream
+        self._content_type = content_type
+        self._length = length
+        self._spool_size = spool_size
+        self._fields = None
+
+    @property
+    def fields(self):
+        """Dict of field names with list of FormFields."""
+        if self._fields is None:
+            self._fields = fields = {}
+            for field in self._parse():
+                if field.name is not None:
+                    try:
+                        fields[field.name].append(field)
+                    except KeyError:
+                        fields[field.name] = [field]
+
+        return self._fields
+
+    def _parse(self):
+        if not self._content_type or self._stream is None:
+            return ()
+
+        content_type, params = parse_header(self._content_type)
+
+        if content_type == 'multipart/form-data':
+            return parse_multipart(self._stream, params.get('boundary'),
+                                   self._length, self._spool_size)
+        elif content_type == 'application/x-www-form-urlencoded':
+            return parse_urlencoded(self._stream, self._length)
+
+        return ()
+
+    def __contains__(self, name):
+        return name in self.fields
+
+    def __iter__(self):
+        return iter(self.fields)
+
+    def __len__(self):
+        return len(self.fields)
+
+    def __getitem__(self, name):
+        fields = self.fields[name]
+        if len(fields) == 1:
+            return fields[0]
+        return fields
+
+    def keys(self):
+        return self.fields.keys()
+
+    def getfields(self, name):
+        """Returns list of FormFields for name or empty list."""
+        return self.fields.get(name, [])
+
+    def getfirst(self, name, default=None):
+        """Returns value of first field for name or default."""
+        try:
+            return self.fields[name][0].value
+        except KeyError:
+            return default
+
+    def getlist(self, name):
+        """Returns list of values for name."""
+        return [field.value for field in self.getfields(name)]
+
+    def close(self):
+        """Close temporary files of uploads."""
+        if self._fields is not None:
+            for fields in self._fields.values():
+                for field in fields:
+                    field.close()
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2018 Christiaan Frans Rademan.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# * Neither the name of the copyright holders nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+import re
+from functools import lru_cache
+
+# Substrings of lowercase User-Agent identifying mobile devices.
+MOBILE = ('iphone',
+          'android',)
+
+# Substrings of lowercase User-Agent identifying bots.
+BOTS = ('google',
+        'bot',
+        'bingpreview',
+        'yandex',
+        'yahoo',
+        'slurp',
+        'baidu',)
+
+_MOBILE = frozenset(MOBILE)
+
+# NOTE(cfrademan): Single alternation, so the User-Agent is scanned once for
+# both mobile devices and bots. Matching lowercase text without groups is
+# considerably faster than re.IGNORECASE or named groups.
+_AGENT_RE = re.compile('|'.join(map(re.escape, MOBILE + BOTS)))
+
+
+@lru_cache(maxsize=1024)
+def classify(agent):
+    """Classify User-Agent.
+
+    Results are kept in a process wide LRU cache, since the number of
+    distinct User-Agents seen is small.
+
+    Args:
+        agent (str): User-Agent header value.
+
+    Returns:
+        tuple: (is_mobile, is_bot) booleans.
+    """
+    mobile = bot = False
+
+    for match in _AGENT_RE.finditer(agent.lower()):
+        if match.group() in _MOBILE:
+            mobile = True
+        else:
+            bot = True
+
+    return (mobile, bot,)
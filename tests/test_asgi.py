@@ -0,0 +1,126 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2018 Christiaan Frans Rademan.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# * Neither the name of the copyright holders nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+import os
+import asyncio
+
+import pytest
+
+from luxon import g
+from luxon import register
+
+
+@pytest.fixture(scope="module")
+def app():
+    from luxon.core.handlers.asgi import Asgi
+    app_root = os.path.abspath(os.path.dirname(__file__))
+    yield Asgi(__name__, app_root + '/wsgi')
+    del g.app
+
+
+@register.resource('GET', '/asgi/async/{key}')
+async def async_view(req, resp, key):
+    await asyncio.sleep(0.1)
+    assert g.current_request is req
+    return key
+
+
+@register.resource('POST', '/asgi/sync')
+def sync_view(req, resp):
+    assert g.current_request is req
+    return req.json
+
+
+def request(app, method, path, body=b'', chunks=1):
+    size = len(body) // chunks
+    messages = [{'type': 'http.request',
+                 'body': body[i * size:(i + 1) * size if i < chunks - 1
+                              else None],
+                 'more_body': i < chunks - 1}
+                for i in range(chunks)]
+    sent = []
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {'type': 'http',
+             'method': method,
+             'path': path,
+             'query_string': b'',
+             'headers': [(b'host', b'localhost'),
+                         (b'content-type', b'application/json')]}
+
+    async def call():
+        await app(scope, receive, send)
+        return (sent[0]['status'],
+                b''.join([message['body'] for message in sent[1:]]))
+
+    return call()
+
+
+def test_asgi_async(app):
+    async def requests():
+        return await asyncio.gather(*[
+            request(app, 'GET', '/asgi/async/%s' % i) for i in range(10)
+        ])
+
+    results = asyncio.run(requests())
+    for i, result in enumerate(results):
+        assert result == (200, str(i).encode())
+
+
+def test_asgi_sync(app):
+    status, body = asyncio.run(request(app, 'POST', '/asgi/sync',
+                                       b'{"key": "value"}'))
+    assert status == 200
+    assert b'"key": "value"' in body
+
+
+def test_asgi_not_found(app):
+    status, body = asyncio.run(request(app, 'GET', '/asgi/none'))
+    assert status == 404
+
+
+def test_asgi_max_body_size(app):
+    assert app._max_body_size == 10485760
+
+    # Body without Content-Length is only buffered up to the maximum.
+    g.app.config.set('request', 'max_body_size', '16')
+    app._max_body_size = 16
+    try:
+        status, body = asyncio.run(request(app, 'POST', '/asgi/sync',
+                                           b'[' + b'1, ' * 64 + b'1]',
+                                           chunks=8))
+        assert status == 413
+    finally:
+        g.app.config.set('request', 'max_body_size', '10485760')
+        app._max_body_size = 10485760
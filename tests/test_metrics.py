@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2018 Christiaan Frans Rademan.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# * Neither the name of the copyright holders nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+import os
+
+from luxon.core.metrics import Metrics
+
+
+def test_metrics(tmpdir):
+    metrics = Metrics(path=str(tmpdir))
+    metrics.clear()
+    labels = (('route', 'users/{id}'), ('status', 200),)
+
+    metrics.inc('luxon_requests_total', labels)
+    metrics.inc('luxon_requests_total', labels, amount=2)
+    metrics.observe('luxon_request_seconds', 0.002, labels)
+    metrics.observe('luxon_request_seconds', 20, labels)
+
+    # Values of other processes are aggregated.
+    pid = os.fork()
+    if pid == 0:
+        metrics.inc('luxon_requests_total', labels)
+        os._exit(0)
+    os.waitpid(pid, 0)
+
+    text = metrics.text()
+    assert '# TYPE luxon_requests_total counter' in text
+    assert ('luxon_requests_total{route="users/{id}",status="200"} 4'
+            in text)
+    assert ('luxon_request_seconds_bucket{route="users/{id}",status="200",'
+            'le="0.001"} 0' in text)
+    assert ('luxon_request_seconds_bucket{route="users/{id}",status="200",'
+            'le="0.0025"} 1' in text)
+    assert ('luxon_request_seconds_bucket{route="users/{id}",status="200",'
+            'le="+Inf"} 2' in text)
+    assert ('luxon_request_seconds_count{route="users/{id}",status="200"} 2'
+            in text)
+
+    metrics.clear()
+    assert 'luxon_requests_total{' not in metrics.text()
+
+
+def test_metrics_stale(tmpdir):
+    # NOTE(cfrademan): Metrics is a singleton, path of first instance used.
+    metrics = Metrics(path=str(tmpdir))
+    metrics.clear()
+
+    def worker():
+        pid = os.fork()
+        if pid == 0:
+            metrics.inc('luxon_requests_total')
+            os._exit(0)
+        os.waitpid(pid, 0)
+        return 'metrics_%s.db' % pid
+
+    first = worker()
+    assert first in os.listdir(metrics._path)
+
+    # Values of exited workers are merged by workers started later.
+    second = worker()
+    assert sorted(os.listdir(metrics._path)) == [second]
+    assert 'luxon_requests_total 2' in metrics.text()
+
+    metrics.clear()
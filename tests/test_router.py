@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2018 Christiaan Frans Rademan.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# * Neither the name of the copyright holders nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+from luxon.core.router import Router
+
+
+def view(name):
+    def resource(req, resp):
+        return name
+    resource.__name__ = name
+    return resource
+
+
+def test_regex_routes_order():
+    router = Router()
+    router.add('GET', 'regex:^/static/css/.*$', view('css'))
+    router.add('GET', 'regex:^/static/.*$', view('static'))
+    router.add('GET', 'regex:^/stat(?P<ic>ic)?/more$', view('named'))
+    router.add('GET', r'regex:^/(a+)/\1$', view('backref'))
+    router.add('GET', 'regex:^.*\\.php$', view('php'))
+
+    assert router.find('GET', '/static/css/app.css')[0].__name__ == 'css'
+    assert router.find('GET', '/static/js/app.js')[0].__name__ == 'static'
+    assert router.find('GET', '/stat/more')[0].__name__ == 'named'
+    assert router.find('GET', '/aa/aa')[0].__name__ == 'backref'
+    assert router.find('GET', '/aa/a')[0] is None
+    assert router.find('GET', '/wp/login.php')[0].__name__ == 'php'
+    assert router.find('GET', '/static/x.php')[0].__name__ == 'static'
+    assert router.find('GET', '/missing')[0] is None
+    assert router.find('POST', '/static/css/app.css')[0] is None
+
+
+def test_regex_routes_duplicate_groups():
+    router = Router()
+    router.add('GET', 'regex:^/a/(?P<id>[0-9]+)$', view('a'))
+    router.add('GET', 'regex:^/a/(?P<id>[a-z]+)$', view('b'))
+    router.add('GET', 'regex:^/a/.*$', view('c'))
+
+    assert router.find('GET', '/a/12')[0].__name__ == 'a'
+    assert router.find('GET', '/a/ab')[0].__name__ == 'b'
+    assert router.find('GET', '/a/-')[0].__name__ == 'c'
+
+    # Routes added after a find are still matched.
+    router.add('GET', 'regex:^/b$', view('d'))
+    assert router.find('GET', '/b')[0].__name__ == 'd'
+
+
+def test_regex_routes_conditional():
+    router = Router()
+    router.add('GET', 'regex:^/x/(a)?(?(1)b|c)$', view('conditional'))
+    router.add('GET', 'regex:^/x/(?P<y>y)?(?(y)z|c)$', view('named'))
+    router.add('GET', 'regex:^/x/.*$', view('other'))
+
+    assert router.find('GET', '/x/ab')[0].__name__ == 'conditional'
+    assert router.find('GET', '/x/c')[0].__name__ == 'conditional'
+    assert router.find('GET', '/x/yz')[0].__name__ == 'named'
+    assert router.find('GET', '/x/a')[0].__name__ == 'other'
+
+
+def test_compiled_routes_lazy(tmpdir):
+    router = Router()
+    router.cache_path = str(tmpdir)
+    router.add('GET', '/users/{id}', view('user'))
+    router.add('GET', '/users/{id}/groups/{group}', view('group'))
+
+    # Nothing compiled until first find or freeze.
+    assert len(tmpdir.listdir()) == 0
+
+    found = router.find('GET', '/users/1/groups/2')
+    assert found[0].__name__ == 'group'
+    assert found[2] == {'id': '1', 'group': '2'}
+    assert len(tmpdir.listdir()) == 1
+
+    # Same route table uses compiled finder from disk.
+    router = Router()
+    router.cache_path = str(tmpdir)
+    router.add('GET', '/users/{id}', view('user'))
+    router.add('GET', '/users/{id}/groups/{group}', view('group'))
+    router.freeze()
+    assert len(tmpdir.listdir()) == 1
+    found = router.find('GET', '/users/1')
+    assert found[0].__name__ == 'user'
+    assert found[2] == {'id': '1'}
+
+
+def test_compiled_routes_cache_version(tmpdir, monkeypatch):
+    import threading
+    from luxon.ext.falcon import compiled
+
+    def add_routes(router):
+        router.cache_path = str(tmpdir)
+        router.add('GET', '/users/{id}', view('user'))
+
+    router = Router()
+    add_routes(router)
+    router.freeze()
+    assert len(tmpdir.listdir()) == 1
+
+    # Finders cached by other versions of luxon are not used.
+    monkeypatch.setattr(compiled, '_SOURCE_HASH', b'other')
+    router = Router()
+    add_routes(router)
+
+    results = []
+    threads = [threading.Thread(
+        target=lambda: results.append(router.find('GET', '/users/1')[2]))
+        for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == [{'id': '1'}] * 8
+    assert len(tmpdir.listdir()) == 2
+
+
+def test_router_lru():
+    router = Router()
+    router.lru_size = 2
+    router.add(['GET', 'POST'], '/home', view('home'))
+    router.add('GET', '/users/{id}', view('user'))
+    router.add('GET', 'regex:^/static/.*$', view('static'))
+
+    assert router.find('get', '/home/')[0].__name__ == 'home'
+    assert router.find('GET', '/home')[0].__name__ == 'home'
+    assert router.find('POST', '/home')[0].__name__ == 'home'
+    assert router.find('GET', '/missing')[0] is None
+    assert router.find('GET', '/missing')[0] is None
+    assert router.find('GET', '/users/1')[2] == {'id': '1'}
+    assert router.find('GET', '/static/a.css')[0].__name__ == 'static'
+    assert router.find('PURGE', '/home')[0] is None
+
+    info = router.cache_info()
+    assert info['hits'] == 1
+    assert info['misses'] == 6
+    # GET and POST caches.
+    assert info['currsize'] == 3
+    assert info['maxsize'] == 4
+
+    # Routes found are copies.
+    router.find('GET', '/users/1')[2]['id'] = '2'
+    assert router.find('GET', '/users/1')[2] == {'id': '1'}
+    router.find('GET', '/home')[2]['id'] = '2'
+    assert router.find('GET', '/home')[2] == {}
+
+    # Adding routes clears cache.
+    router.add('GET', '/missing', view('missing'))
+    assert router.find('GET', '/missing')[0].__name__ == 'missing'
+    assert router.cache_info()['misses'] == 1
@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2018 Christiaan Frans Rademan.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# * Neither the name of the copyright holders nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+import os
+import gzip
+
+import pytest
+
+from luxon import g
+from luxon import register
+
+CSS = b'body { color: black; }\n' * 100
+DATA = bytes(range(256)) * 8
+
+
+@pytest.fixture(scope="module")
+def static(tmpdir_factory):
+    from luxon.testing.wsgi.client import Client
+    client = Client(__file__)
+
+    from luxon.core.servers.web.static import StaticFiles
+
+    root = tmpdir_factory.mktemp('static')
+    root.join('app.css').write_binary(CSS)
+    root.join('app.css.gz').write_binary(gzip.compress(CSS))
+    root.join('plain.css').write_binary(CSS)
+    root.join('data.bin').write_binary(DATA)
+    root.mkdir('sub').join('a.txt').write_binary(b'a')
+    tmpdir_factory.getbasetemp().join('secret.txt').write_binary(b'secret')
+    os.symlink(str(tmpdir_factory.getbasetemp().join('secret.txt')),
+               str(root.join('link.txt')))
+
+    files = StaticFiles(str(root), '/files', max_file_size=1024)
+    register.resource(['GET', 'HEAD'], 'regex:^/files.*$')(files)
+
+    yield client, files
+    del g.current_request
+    del g.app
+
+
+def test_static_file(static):
+    client, files = static
+    result = client.get(path='/files/plain.css')
+    assert result.status_code == 200
+    assert result.content == CSS
+    assert result.headers['Content-Type'].startswith('text/css')
+    assert result.headers['Cache-Control'] == 'max-age=604800'
+    assert 'Last-Modified' in result.headers
+
+    etag = result.headers['Etag']
+    result = client.get(path='/files/plain.css',
+                        headers={'If-None-Match': etag})
+    assert result.status_code == 304
+    assert result.content == b''
+
+    result = client.get(path='/files/plain.css',
+                        headers={'If-Modified-Since':
+                                 result.headers['Last-Modified']})
+    assert result.status_code == 304
+
+    result = client.get(path='/files/missing.css')
+    assert result.status_code == 404
+
+
+def test_static_sidecar(static):
+    client, files = static
+    result = client.get(path='/files/app.css',
+                        headers={'Accept-Encoding': 'gzip'})
+    assert result.status_code == 200
+    assert result.headers['Content-Encoding'] == 'gzip'
+    assert result.headers['Vary'] == 'Accept-Encoding'
+    assert result.headers['Etag'].endswith('-gzip"')
+    assert gzip.decompress(result.content) == CSS
+
+    result = client.get(path='/files/app.css')
+    assert 'Content-Encoding' not in result.headers
+    assert result.content == CSS
+
+
+def test_static_compressed(static, monkeypatch):
+    client, files = static
+    monkeypatch.setattr(client.app, '_compression', True)
+
+    # Files without sidecar compressed have their own etag.
+    identity = client.get(path='/files/plain.css').headers['Etag']
+    result = client.get(path='/files/plain.css',
+                        headers={'Accept-Encoding': 'gzip'})
+    assert result.headers['Content-Encoding'] == 'gzip'
+    assert result.headers['Etag'] == identity[:-1] + '-gzip"'
+
+    result = client.get(path='/files/plain.css',
+                        headers={'Accept-Encoding': 'gzip',
+                                 'If-None-Match': result.headers['Etag']})
+    assert result.status_code == 304
+
+    result = client.get(path='/files/plain.css',
+                        headers={'If-None-Match': identity[:-1] + '-gzip"'})
+    assert result.status_code == 200
+    assert result.content == CSS
+
+
+def test_static_range(static):
+    client, files = static
+    # Larger than 'max_file_size' and returned as file object.
+    result = client.get(path='/files/data.bin',
+                        headers={'Range': 'bytes=1000-1009'})
+    assert result.status_code == 206
+    assert result.headers['Content-Range'] == 'bytes 1000-1009/2048'
+    assert result.content == DATA[1000:1010]
+
+
+def test_static_listing(static):
+    client, files = static
+    result = client.get(path='/files/sub')
+    assert result.status_code == 200
+    assert result.headers['Cache-Control'] == 'no-cache'
+    assert 'href="/files/sub/a.txt"' in result.text
+
+
+def test_static_traversal(static):
+    client, files = static
+    assert client.get(path='/files/../secret.txt').status_code == 404
+    assert client.get(path='/files/sub/../../secret.txt').status_code == 404
+    assert client.get(path='/files/link.txt').status_code == 404
+
+
+def test_static_memory(tmpdir):
+    from luxon.core.servers.web.static import StaticFiles, StaticFile
+
+    files = StaticFiles(str(tmpdir), '/files', max_bytes=250)
+    for name in ('a', 'b', 'c', 'd',):
+        tmpdir.join(name).write_binary(name.encode() * 100)
+    tmpdir.join('e').write_binary(b'e' * 300)
+
+    def read(name):
+        path = str(tmpdir.join(name))
+        return files._read(StaticFile(path, os.stat(path), None,
+                                      'text/plain', False))
+
+    for name in ('a', 'b', 'c', 'd', 'e',):
+        assert read(name) == tmpdir.join(name).read_binary()
+
+    # Least recently used files removed once exceeding 'max_bytes'.
+    assert [os.path.basename(key) for key in files._files] == ['c', 'd']
+    assert files._bytes == 200
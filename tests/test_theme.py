@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2018 Christiaan Frans Rademan.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# * Neither the name of the copyright holders nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+import os
+import configparser
+
+import pytest
+
+from luxon import g
+from luxon.structs.container import Container
+from luxon.core.utils.theme import Theme
+
+
+class App(object):
+    def __init__(self, path, **kwargs):
+        self.path = path
+        self.config = configparser.ConfigParser()
+        self.config['application'] = kwargs
+
+
+@pytest.fixture(autouse=True)
+def request_context():
+    yield
+    del g.current_request
+
+
+def write(path, content):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as theme_file:
+        theme_file.write(content)
+
+
+def test_theme(tmpdir):
+    root = str(tmpdir)
+    write(root + '/static/themes/default/css/app.css', 'default')
+    write(root + '/static/themes/blue/img/logo.png', 'blue')
+    write(root + '/static/themes/example.com/css/app.css', 'example')
+
+    theme = Theme(App(root, default_theme='blue'))
+
+    g.current_request = Container(host='localhost')
+    assert theme('css/app.css') == '/static/themes/default/css/app.css'
+    assert theme('/img/logo.png') == '/static/themes/blue/img/logo.png'
+    with pytest.raises(FileNotFoundError):
+        theme('missing.css')
+
+    g.current_request = Container(host='example.com')
+    assert theme('css/app.css') == '/static/themes/example.com/css/app.css'
+
+    # Index is only refreshed on reload.
+    write(root + '/static/themes/blue/css/app.css', 'blue')
+    assert theme('css/app.css') == '/static/themes/example.com/css/app.css'
+    g.current_request = Container(host='localhost')
+    assert theme('css/app.css') == '/static/themes/default/css/app.css'
+    theme.reload()
+    assert theme('css/app.css') == '/static/themes/blue/css/app.css'
+
+
+def test_theme_hosts(tmpdir):
+    root = str(tmpdir)
+    write(root + '/static/themes/default/css/app.css', 'default')
+    write(root + '/static/themes/example.com/css/app.css', 'example')
+
+    theme = Theme(App(root))
+
+    # Hosts without theme share resolved URLs.
+    for i in range(100):
+        g.current_request = Container(host='%s.example.org' % i)
+        assert theme('css/app.css') == '/static/themes/default/css/app.css'
+    assert len(theme._resolved) == 1
+
+    g.current_request = Container(host='example.com')
+    assert theme('css/app.css') == '/static/themes/example.com/css/app.css'
+    assert len(theme._resolved) == 2
+
+
+def test_theme_hash(tmpdir):
+    root = str(tmpdir)
+    write(root + '/static/themes/default/css/app.css', 'default')
+
+    theme = Theme(App(root, theme_hash='True'))
+
+    g.current_request = Container(host='localhost')
+    url = theme('css/app.css')
+    assert url.startswith('/static/themes/default/css/app.css?v=')
+
+    write(root + '/static/themes/default/css/app.css', 'modified')
+    theme.reload()
+    assert theme('css/app.css') != url
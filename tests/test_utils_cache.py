@@ -28,6 +28,9 @@
 # ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
 # THE POSSIBILITY OF SUCH DAMAGE.
 
+import time
+import threading
+
 import pytest
 from luxon import g
 #from luxon.utils.cache import *
@@ -36,3 +39,561 @@ from luxon import g
 
 def test_Cache():
     pass
+
+
+def test_memory_modes():
+    from luxon.core.cache.memory import Memory
+
+    value = {'users': [{'id': 1}]}
+
+    cache = Memory(mode='pickle')
+    cache.store('key', value, 60)
+    assert cache.load('key') == value
+    assert cache.load('key') is not value
+
+    cache = Memory(mode='reference')
+    cache.store('key', value, 60)
+    assert cache.load('key') is value
+
+    cache = Memory(mode='freeze')
+    cache.store('key', value, 60)
+    frozen = cache.load('key')
+    assert frozen == {'users': ({'id': 1},)}
+    with pytest.raises(TypeError):
+        frozen['users'] = None
+
+    # References need not be serializable.
+    lock = threading.Lock()
+    cache = Memory(mode='reference')
+    cache.store('lock', lock, 60)
+    assert cache.load('lock') is lock
+    assert cache.stats()['bytes'] > 0
+
+    cache = Memory(mode='pickle')
+    cache.store('lock', lock, 60)
+    assert cache.load('lock') is None
+
+    with pytest.raises(ValueError):
+        Memory(mode='invalid')
+
+
+def test_memory_stats():
+    import time
+    from luxon.core.cache.memory import Memory
+
+    cache = Memory(max_objs=2, mode='reference')
+    cache.store('a', 1, 60)
+    cache.store('b', 2, 60)
+    cache.store('c', 3, 60)
+    cache.store('d', 4, 0.01)
+    time.sleep(0.02)
+
+    assert cache.load('a') is None
+    assert cache.load('c') == 3
+    assert cache.load('d') is None
+    assert cache.stats() == {'hits': 1, 'misses': 2, 'evictions': 2,
+                             'expirations': 1, 'objects': 1, 'bytes': 5}
+
+
+def test_memory_max_bytes():
+    from luxon.core.cache.memory import Memory
+
+    cache = Memory(max_objs=100, max_obj_size=64, max_bytes=32768)
+
+    # Size of nested values is accounted for.
+    cache.store('nested', {'a': [b'x' * 70000]}, 60)
+    assert cache.load('nested') is None
+
+    cache.store('small', b'x' * 1000, 60)
+    for i in range(10):
+        cache.load('small')
+
+    for i in range(10):
+        cache.store('large%s' % i, b'x' * 10000, 60)
+        assert cache.stats()['bytes'] <= 32768
+
+    # Small and frequently used entry is kept.
+    assert cache.load('small') == b'x' * 1000
+
+
+def test_shared_memory(tmpdir):
+    import os
+    import time
+    from luxon.core.cache.shared import SharedMemory
+
+    path = str(tmpdir.join('cache.db'))
+    cache = SharedMemory(max_objs=16, max_obj_size=1, path=path)
+
+    cache.store('key', {'a': [1, 2]}, 60)
+    assert cache.load('key') == {'a': [1, 2]}
+    assert cache.load('missing') is None
+
+    cache.store('expire', 1, 0.01)
+    time.sleep(0.02)
+    assert cache.load('expire') is None
+
+    # Larger than max_obj_size.
+    cache.store('large', b'x' * 2048, 60)
+    assert cache.load('large') is None
+
+    pid = os.fork()
+    if pid == 0:
+        cache.store('child', 'worker', 60)
+        os._exit(0)
+    os.waitpid(pid, 0)
+    assert cache.load('child') == 'worker'
+
+    # Entries persist for processes opening the file later.
+    assert SharedMemory(max_objs=16, max_obj_size=1,
+                        path=path).load('key') == {'a': [1, 2]}
+
+    for i in range(100):
+        cache.store('key%s' % i, i, 60)
+    assert sum(1 for i in range(100) if cache.load('key%s' % i) == i) == 16
+
+
+class RedisStandIn(object):
+    """In-process stand-in for redis.StrictRedis with pub/sub."""
+    def __init__(self):
+        self.data = {}
+        self.subscribers = []
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def mget(self, keys):
+        return [self.data.get(key) for key in keys]
+
+    def set(self, key, value, ex=None, nx=False):
+        if nx and key in self.data:
+            return None
+        self.data[key] = value
+        return True
+
+    def incrby(self, key, amount):
+        self.data[key] = int(self.data.get(key, 0)) + amount
+        return self.data[key]
+
+    def pipeline(self, transaction=True):
+        return PipelineStandIn(self)
+
+    def delete(self, key):
+        self.data.pop(key, None)
+
+    def publish(self, channel, message):
+        for subscriber in self.subscribers:
+            subscriber.put(message)
+
+    def pubsub(self, **kwargs):
+        return PubSubStandIn(self)
+
+
+class PipelineStandIn(object):
+    """Commands are executed immediately, results returned by execute."""
+    def __init__(self, redis):
+        self.redis = redis
+        self.results = []
+
+    def __getattr__(self, name):
+        def command(*args, **kwargs):
+            self.results.append(getattr(self.redis, name)(*args, **kwargs))
+            return self
+        return command
+
+    def execute(self):
+        return self.results
+
+
+class PubSubStandIn(object):
+    def __init__(self, redis):
+        import queue
+
+        self.redis = redis
+        self.queue = queue.Queue()
+
+    def subscribe(self, channel):
+        self.redis.subscribers.append(self.queue)
+
+    def listen(self):
+        while True:
+            yield {'type': 'message', 'data': self.queue.get()}
+
+
+def test_tiered():
+    import time
+    from luxon.core.cache.tiered import Tiered
+
+    redis = RedisStandIn()
+    worker1 = Tiered(client=redis)
+    worker2 = Tiered(client=redis)
+    # Subscribe to invalidations.
+    worker1.load('key')
+    worker2.load('key')
+    time.sleep(0.05)
+
+    worker1.store('key', 1, 60)
+    assert worker2.load('key') == 1
+    # Served from L1.
+    redis.data.clear()
+    assert worker2.load('key') == 1
+
+    worker1.store('key', 2, 60)
+    time.sleep(0.05)
+    assert worker2.load('key') == 2
+
+    worker1.delete('key')
+    time.sleep(0.05)
+    assert worker2.load('key') is None
+    assert worker1.load('key') is None
+
+
+def test_redis_many_compressed():
+    import pickle
+    from luxon.core.cache.rd import Redis
+
+    redis = RedisStandIn()
+    cache = Redis(client=redis, compress_threshold=1024)
+
+    cache.store_many({'small': 1, 'large': 'x' * 4096}, 60)
+    assert redis.data['cache:small'][:1] == b'\x00'
+    assert redis.data['cache:large'][:1] == b'\x01'
+    assert len(redis.data['cache:large']) < 1024
+
+    assert cache.load_many(['small', 'large', 'missing']) == {
+        'small': 1, 'large': 'x' * 4096}
+
+    # Stored without header.
+    redis.data['cache:old'] = pickle.dumps([1, 2])
+    assert cache.load('old') == [1, 2]
+
+
+def test_tiered_many():
+    import time
+    from luxon.core.cache.tiered import Tiered
+
+    redis = RedisStandIn()
+    worker1 = Tiered(client=redis)
+    worker2 = Tiered(client=redis)
+    worker1.load('key')
+    worker2.load('key')
+    time.sleep(0.05)
+
+    worker1.store_many({'a': 1, 'b': 2}, 60)
+    assert worker2.load_many(['a', 'b', 'c']) == {'a': 1, 'b': 2}
+
+    worker1.store_many({'a': 3, 'b': 4}, 60)
+    time.sleep(0.05)
+    # Both invalidated in L1 of other worker.
+    assert worker2.load_many(['a', 'b']) == {'a': 3, 'b': 4}
+
+
+def test_cache_single_flight(monkeypatch):
+    import time
+    import threading
+    from luxon.core.cache.memory import Memory
+    from luxon.helpers import cache as helper
+
+    engine = Memory(mode='reference')
+    monkeypatch.setattr(helper, 'Cache', lambda: engine)
+
+    calls = []
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.1)
+        return len(calls)
+
+    results = []
+
+    def load():
+        results.append(helper._load('key', 60, compute, stale=0,
+                                    lock='thread'))
+
+    threads = [threading.Thread(target=load) for i in range(10)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert calls == [1]
+    assert results == [1] * 10
+
+
+def test_cache_stale_while_revalidate(monkeypatch):
+    import time
+    from luxon.core.cache.memory import Memory
+    from luxon.helpers import cache as helper
+
+    engine = Memory(mode='reference')
+    monkeypatch.setattr(helper, 'Cache', lambda: engine)
+
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return len(calls)
+
+    assert helper._load('key', 0, compute, stale=60, lock='thread') == 1
+    # Expired, stale result returned while refreshed in background.
+    assert helper._load('key', 60, compute, stale=60,
+                        lock='thread') == 1
+    for i in range(100):
+        if engine.load('key')[0] == 2:
+            break
+        time.sleep(0.01)
+    assert helper._load('key', 60, compute, stale=60,
+                        lock='thread') == 2
+
+
+def cache_for(backend):
+    """Returns Cache for backend, bypassing the singleton."""
+    from luxon.core.cache import Cache
+
+    cache = object.__new__(Cache)
+    cache._cached_backend = backend
+    return cache
+
+
+def test_cache_namespace():
+    from luxon.core.cache.memory import Memory
+
+    cache = cache_for(Memory())
+    cache.store('list', [1, 2], 60, namespace='users')
+    cache.store_many({'a': 1, 'b': 2}, 60, namespace='users')
+    cache.store('list', [3], 60, namespace='roles')
+    assert cache.load('list', namespace='users') == [1, 2]
+    assert cache.load_many(['a', 'b', 'c'],
+                           namespace='users') == {'a': 1, 'b': 2}
+
+    generation = cache.generation('users')
+    cache.invalidate('users')
+    assert cache.generation('users') == generation + 1
+    assert cache.load('list', namespace='users') is None
+    assert cache.load_many(['a', 'b'], namespace='users') == {}
+    assert cache.load('list', namespace='roles') == [3]
+
+    cache.delete('list', namespace='roles')
+    assert cache.load('list', namespace='roles') is None
+
+
+def test_cache_invalidate_atomic(tmpdir):
+    from luxon.core.cache.memory import Memory
+    from luxon.core.cache.shared import SharedMemory
+    from luxon.core.cache.rd import Redis
+    from luxon.core.cache.tiered import Tiered
+
+    class SlowMemory(Memory):
+        def load(self, key):
+            value = super().load(key)
+            # Widens the window between load and store.
+            time.sleep(0.01)
+            return value
+
+    backends = (SlowMemory(),
+                SharedMemory(path=str(tmpdir.join('cache.db'))),
+                Redis(client=RedisStandIn()), Tiered(client=RedisStandIn()),
+                LegacyBackend(),)
+    for backend in backends:
+        cache = cache_for(backend)
+        generation = cache.generation('users')
+        assert cache.generation('users') == generation
+
+        threads = [threading.Thread(target=cache.invalidate,
+                                    args=('users',))
+                   for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        if not isinstance(backend, LegacyBackend):
+            # No invalidations lost.
+            assert cache.generation('users') == generation + 8
+        else:
+            assert cache.generation('users') > generation
+
+
+class LegacyBackend(object):
+    """Backend with the original signature and without delete."""
+    def __init__(self, max_objs=5000, max_obj_size=50, mode='pickle'):
+        self.mode = mode
+        self.objs = {}
+
+    def load(self, key):
+        return self.objs.get(key)
+
+    def store(self, key, value, expire):
+        self.objs[key] = value
+
+
+def test_cache_backend_options(app):
+    from luxon.core.cache import Cache
+
+    g.app.config.set('cache', 'backend',
+                     'tests.test_utils_cache:LegacyBackend')
+    g.app.config.set('cache', 'mode', 'reference')
+    cache = object.__new__(Cache)
+    cache.__init__()
+    assert isinstance(cache._cached_backend, LegacyBackend)
+    assert cache._cached_backend.mode == 'reference'
+
+    cache.store('key', 'value', 60)
+    assert cache.load('key') == 'value'
+    cache.delete('key')
+    assert cache.load('key') is None
+
+
+@pytest.fixture
+def app(tmpdir):
+    from luxon.core.app import App
+    yield App('test', path=str(tmpdir), ini=False)
+    del g.app
+
+
+def test_file_lock(app):
+    import os
+    from luxon.helpers.cache import _KeyLock
+
+    path = os.path.join(g.app.path, 'tmp', 'locks')
+    pipe_r, pipe_w = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        lock = _KeyLock('key', 'file')
+        lock.acquire()
+        os.write(pipe_w, b'1')
+        time.sleep(0.2)
+        lock.release()
+        os._exit(0)
+
+    # Waits for the child, which removes the file it locked.
+    os.read(pipe_r, 1)
+    assert _KeyLock('key', 'file').acquire(blocking=False) is False
+    lock = _KeyLock('key', 'file')
+    assert lock.acquire() is True
+    assert len(os.listdir(path)) == 1
+    os.waitpid(pid, 0)
+    lock.release()
+
+    # Lock files are removed once released.
+    assert os.listdir(path) == []
+
+
+def test_memoize(app, monkeypatch):
+    from luxon.core.cache.memory import Memory
+    from luxon.helpers import cache as helper
+    from luxon.helpers import memoize as helper_memoize
+
+    engine = Memory(mode='reference')
+    cache = cache_for(engine)
+    monkeypatch.setattr(helper, 'Cache', lambda: cache)
+    monkeypatch.setattr(helper_memoize, 'Cache', lambda: cache)
+
+    calls = []
+
+    def define():
+        @helper_memoize.memoize(expire=60, maxsize=2)
+        def add(a, b=0):
+            calls.append((a, b,))
+            return a + b
+        return add
+
+    add = define()
+    assert add(1, b=2) == 3
+    assert add(1, b=2) == 3
+    assert add(2, b=2) == 4
+    assert add('a', b='b') == 'ab'
+    assert calls == [(1, 2,), (2, 2,), ('a', 'b',)]
+    assert add.cache_info() == (1, 3, 2, 2)
+
+    # Least recently used deleted from backend.
+    assert add(1, b=2) == 3
+    assert len(calls) == 4
+
+    add.cache_clear()
+    assert add.cache_info() == (0, 0, 2, 0)
+    # Only generation of namespace remains.
+    assert engine.stats()['objects'] == 1
+
+    # Cleared for other processes sharing the backend.
+    other = define()
+    assert other(5) == 5
+    assert add(5) == 5
+    assert len(calls) == 5
+    add.cache_clear()
+    assert other(5) == 5
+    assert len(calls) == 6
+
+    with pytest.raises(ValueError):
+        add(lambda: None)
+
+
+def test_memoize_request():
+    from luxon.structs.container import Container
+    from luxon.helpers.memoize import memoize
+
+    calls = []
+
+    @memoize(scope='request')
+    def double(a):
+        calls.append(a)
+        return a * 2
+
+    # Outside of request not memoized.
+    assert double(1) == 2
+    assert double(1) == 2
+    assert calls == [1, 1]
+
+    g.current_request = Container(memo={})
+    try:
+        assert double(1) == 2
+        assert double(1) == 2
+        assert calls == [1, 1, 1]
+        assert double.cache_info().currsize == 1
+
+        g.current_request = Container(memo={})
+        assert double(1) == 2
+        assert calls == [1, 1, 1, 1]
+    finally:
+        del g.current_request
+
+
+def test_serializers():
+    import pickle
+    from luxon.core.cache.serializers import serializer
+    from luxon.core.cache.memory import Memory
+    from luxon.core.cache.rd import Redis
+
+    value = {'id': 1, 'roles': ['Member'], 'enabled': True, 'name': None}
+    for name in ('pickle', 'marshal', 'json',):
+        assert serializer(name).loads(serializer(name).dumps(value)) == value
+        cache = Memory(serializer=name)
+        cache.store('key', value, 60)
+        assert cache.load('key') == value
+        cache = Redis(client=RedisStandIn(), serializer=name)
+        cache.store('key', value, 60)
+        assert cache.load('key') == value
+
+    # Out-of-band buffers.
+    data = serializer('pickle').dumps([pickle.PickleBuffer(b'buffer')])
+    assert bytes(serializer('pickle').loads(data)[0]) == b'buffer'
+
+    # Not supported by marshal, not cached.
+    cache = Memory(serializer='marshal')
+    cache.store('key', object(), 60)
+    assert cache.load('key') is None
+
+    # Plain JSON in Redis, readable by other languages.
+    redis = RedisStandIn()
+    cache = Redis(client=redis, serializer='json', compress_threshold=16)
+    cache.store('key', value, 60)
+    assert redis.data['cache:key'] == serializer('json').dumps(value)
+    assert cache.load('key') == value
+
+    # Bytes are not supported by json, not cached.
+    cache.store('bytes', b'\x1f\x8b', 60)
+    cache.store_many({'bytes': b'\x1f\x8b', 'other': 1}, 60)
+    assert cache.load('bytes') is None
+    assert cache.load('other') == 1
+
+    with pytest.raises(ValueError):
+        serializer('yaml')
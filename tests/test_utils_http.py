@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2018 Christiaan Frans Rademan.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# * Neither the name of the copyright holders nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+from luxon.utils.http import parse_header, parse_cookie_header
+
+
+def test_parse_header():
+    assert parse_header('Multipart/Form-Data; boundary=---abc') == (
+        'multipart/form-data', {'boundary': '---abc'})
+    assert parse_header('form-data; name="a;b"; filename="x.txt"') == (
+        'form-data', {'name': 'a;b', 'filename': 'x.txt'})
+
+
+def test_parse_cookie_header():
+    cookies = parse_cookie_header('a=1; b="x\\"y\\073z"; HttpOnly; c = 3')
+    assert dict(cookies) == {'a': '1', 'b': 'x"y;z', 'c': '3'}
+    assert 'HttpOnly' not in cookies
+    assert cookies.get('missing') is None
+    assert len(parse_cookie_header(None)) == 0
+
+    # Values are only unquoted once.
+    cookies = parse_cookie_header('a="\\"x\\""')
+    assert cookies['a'] == '"x"'
+    assert cookies['a'] == '"x"'
+    assert dict(cookies) == {'a': '"x"'}
+
+
+def test_request_cookies():
+    from luxon.core.handlers.wsgi.request import Request
+
+    req = Request({'REQUEST_METHOD': 'GET',
+                   'PATH_INFO': '/',
+                   'HTTP_COOKIE': 'a="\\"x\\""; b=1'}, None)
+
+    # Copies are returned, changes do not affect the request.
+    cookies = req.cookies
+    assert cookies == {'a': '"x"', 'b': '1'}
+    cookies['c'] = '2'
+    assert req.cookies == {'a': '"x"', 'b': '1'}
@@ -66,3 +66,17 @@ x = json.dumps(data)
 assert type(x) == str
 
 
+def test_loads_iter():
+    import io
+
+    stream = io.BytesIO(pls.encode('utf-8'))
+    names = [fren['name'] for fren in json.loads_iter(stream, 'frens.item',
+                                                      block=8)]
+    assert names == ["Ryan", "Sean", "Luke"]
+
+    stream = io.BytesIO(b'[1, 2.5e3, "x", null, {"a": [true]}]')
+    assert list(json.loads_iter(stream, block=3)) == [1, 2500.0, "x", None,
+                                                      {"a": [True]}]
+
+    with pytest.raises(json.JSONDecodeError):
+        list(json.loads_iter(io.BytesIO(b'[1, 2'), block=3))
@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2018 Christiaan Frans Rademan.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# * Neither the name of the copyright holders nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+import io
+
+import pytest
+
+from luxon.utils.multipart import (Form, parse_multipart,
+                                   parse_urlencoded)
+from luxon.exceptions import HTTPBadRequest
+
+BOUNDARY = '---------------------------88571074919314010861842727997'
+
+
+class Trickle(io.BytesIO):
+    """Stream returning small reads like a socket."""
+    def read(self, size=-1):
+        return super().read(min(size, 7))
+
+
+def body(*parts, newline=b'\r\n'):
+    data = b''
+    for headers, content in parts:
+        data += b'--' + BOUNDARY.encode() + newline
+        for header in headers:
+            data += header.encode() + newline
+        data += newline + content + newline
+    return data + b'--' + BOUNDARY.encode() + b'--' + newline
+
+
+PARTS = ((['Content-Disposition: form-data; name="text"'], b'test'),
+         (['Content-Disposition: form-data; name="empty"'], b''),
+         (['Content-Disposition: form-data; name="file"; filename="a.bin"',
+           'Content-Type: application/octet-stream'],
+          b'line\r\n--' + BOUNDARY[:-1].encode() + b'\r\n' * 3),)
+
+
+@pytest.mark.parametrize('newline', [b'\r\n', b'\n'])
+def test_parse_multipart(newline):
+    data = body(*PARTS, newline=newline)
+    for stream in (io.BytesIO(data), Trickle(data)):
+        fields = list(parse_multipart(stream, BOUNDARY, len(data)))
+        assert [field.name for field in fields] == ['text', 'empty', 'file']
+        assert fields[0].value == 'test'
+        assert fields[0].filename is None
+        assert fields[1].value == ''
+        assert fields[2].filename == 'a.bin'
+        assert fields[2].type == 'application/octet-stream'
+        assert fields[2].value == PARTS[2][1]
+
+
+def test_parse_multipart_spool():
+    content = b'x' * 300000
+    data = body((['Content-Disposition: form-data; name="f"; filename="f"'],
+                 content),)
+    field = next(parse_multipart(io.BytesIO(data), BOUNDARY, len(data),
+                                 spool_size=1024))
+    assert field.file._rolled
+    assert field.file.read() == content
+
+
+def test_parse_multipart_incomplete():
+    data = body(*PARTS)[:-60]
+    with pytest.raises(HTTPBadRequest):
+        list(parse_multipart(io.BytesIO(data), BOUNDARY, len(data)))
+
+
+def test_parse_urlencoded():
+    data = b'a=1&b=hello+world&a=%C3%A9&empty=&'
+    fields = list(parse_urlencoded(Trickle(data), len(data)))
+    assert [(f.name, f.value) for f in fields] == [('a', '1'),
+                                                   ('b', 'hello world'),
+                                                   ('a', '\xe9'),
+                                                   ('empty', '')]
+
+
+def test_form():
+    data = body(*PARTS)
+    stream = io.BytesIO(data)
+    form = Form(stream, 'multipart/form-data; boundary="%s"' % BOUNDARY,
+                len(data))
+    # Parsed lazily.
+    assert stream.tell() == 0
+    assert 'text' in form
+    assert form.getfirst('text') == 'test'
+    assert form.getfirst('missing', 'default') == 'default'
+    assert form.getlist('empty') == ['']
+    assert form['file'].filename == 'a.bin'
+
+    form = Form(io.BytesIO(b'{}'), 'application/json', 2)
+    assert 'text' not in form
+    assert len(form) == 0
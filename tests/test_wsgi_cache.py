@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2018 Christiaan Frans Rademan.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# * Neither the name of the copyright holders nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+import time
+
+import pytest
+
+from luxon import g
+from luxon import register
+
+calls = []
+
+
+@pytest.fixture(scope="module")
+def client():
+    from luxon.testing.wsgi.client import Client
+    yield Client(__file__)
+    del g.current_request
+    del g.app
+
+
+@register.resource('GET', '/cache/auth', cache=60)
+def cache_auth(req, resp):
+    calls.append(req.get_header('Authorization'))
+    return req.get_header('Authorization') or 'anonymous'
+
+
+@register.resource('GET', '/cache/language', cache=60)
+def cache_language(req, resp):
+    resp.set_header('Vary', 'Accept-Language')
+    calls.append(req.get_header('Accept-Language'))
+    return req.get_header('Accept-Language')
+
+
+@register.resource('GET', '/cache/expire', cache=1)
+def cache_expire(req, resp):
+    calls.append('expire')
+    return 'expire'
+
+
+def test_wsgi_response_cache(client):
+    del calls[:]
+    result = client.get(path='/cache/auth')
+    assert result.text == 'anonymous'
+    assert client.get(path='/cache/auth').text == 'anonymous'
+    assert calls == [None]
+
+    # Different query string misses.
+    assert client.get(path='/cache/auth',
+                      query_string='page=2').text == 'anonymous'
+    assert calls == [None, None]
+
+
+def test_wsgi_response_cache_user(client):
+    del calls[:]
+    alice = {'Authorization': 'Bearer alice'}
+    bob = {'Authorization': 'Bearer bob'}
+
+    result = client.get(path='/cache/auth', headers=alice)
+    assert result.text == 'Bearer alice'
+    assert 'private' in result.headers['Cache-Control']
+    assert client.get(path='/cache/auth', headers=bob).text == 'Bearer bob'
+    assert client.get(path='/cache/auth',
+                      headers=alice).text == 'Bearer alice'
+    assert calls == ['Bearer alice', 'Bearer bob']
+
+
+def test_wsgi_response_cache_vary(client):
+    del calls[:]
+    english = {'Accept-Language': 'en'}
+    afrikaans = {'Accept-Language': 'af'}
+
+    result = client.get(path='/cache/language', headers=english)
+    assert 'Accept-Language' in result.headers['Vary']
+    assert 'Cookie' in result.headers['Vary']
+    assert client.get(path='/cache/language', headers=afrikaans).text == 'af'
+    assert client.get(path='/cache/language', headers=english).text == 'en'
+    assert client.get(path='/cache/language', headers=afrikaans).text == 'af'
+    assert calls == ['en', 'af']
+
+
+def test_wsgi_response_cache_expire(client):
+    del calls[:]
+    assert client.get(path='/cache/expire').text == 'expire'
+    assert client.get(path='/cache/expire').text == 'expire'
+    assert calls == ['expire']
+    time.sleep(1.1)
+    assert client.get(path='/cache/expire').text == 'expire'
+    assert calls == ['expire', 'expire']
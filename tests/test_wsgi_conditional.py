@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2018 Christiaan Frans Rademan.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# * Neither the name of the copyright holders nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+import datetime
+
+import pytest
+
+from luxon import g
+from luxon import register
+from luxon.core import register as registry
+from luxon.utils.timezone import TimezoneGMT
+
+MODIFIED = datetime.datetime(2018, 5, 10, 10, 0, 0, tzinfo=TimezoneGMT())
+
+calls = []
+
+
+@pytest.fixture(scope="module")
+def client():
+    from luxon.testing.wsgi.client import Client
+    yield Client(__file__)
+    del g.current_request
+    del g.app
+
+
+@pytest.fixture
+def middleware(monkeypatch):
+    monkeypatch.setattr(registry, '_middleware_resource',
+                        [lambda req, resp: calls.append('resource')])
+    monkeypatch.setattr(registry, '_middleware_post',
+                        [lambda req, resp: calls.append('post')])
+    del calls[:]
+
+
+@register.resource('GET', '/conditional/etag',
+                   etag=lambda req, resp: 'v1')
+def conditional_etag(req, resp):
+    calls.append('view')
+    return 'etag'
+
+
+@register.resource('GET', '/conditional/modified',
+                   last_modified=lambda req, resp: MODIFIED)
+def conditional_modified(req, resp):
+    calls.append('view')
+    return 'modified'
+
+
+@register.resource('GET', '/conditional/compressed',
+                   etag=lambda req, resp: 'v2')
+def conditional_compressed(req, resp):
+    calls.append('view')
+    resp.content_type = 'text/plain'
+    return 'compressed' * 200
+
+
+def test_wsgi_if_none_match(client, middleware):
+    result = client.get(path='/conditional/etag')
+    assert result.status_code == 200
+    assert result.headers['Etag'] == '"v1"'
+    assert calls == ['resource', 'view', 'post']
+
+    del calls[:]
+    result = client.get(path='/conditional/etag',
+                        headers={'If-None-Match': '"v1"'})
+    assert result.status_code == 304
+    assert result.content == b''
+    # Middleware still runs, such as authentication and logging.
+    assert calls == ['resource', 'post']
+
+    del calls[:]
+    result = client.get(path='/conditional/etag',
+                        headers={'If-None-Match': '"v0"'})
+    assert result.status_code == 200
+    assert calls == ['resource', 'view', 'post']
+
+
+def test_wsgi_if_modified_since(client, middleware):
+    result = client.get(path='/conditional/modified',
+                        headers={'If-Modified-Since':
+                                 'Thu, 10 May 2018 10:00:00 GMT'})
+    assert result.status_code == 304
+    assert calls == ['resource', 'post']
+
+    del calls[:]
+    result = client.get(path='/conditional/modified',
+                        headers={'If-Modified-Since':
+                                 'Wed, 09 May 2018 10:00:00 GMT'})
+    assert result.status_code == 200
+    assert result.text == 'modified'
+    assert calls == ['resource', 'view', 'post']
+
+
+def test_wsgi_if_none_match_compressed(client, middleware, monkeypatch):
+    monkeypatch.setattr(client.app, '_compression', True)
+    monkeypatch.setattr(client.app, '_compression_min_size', 1024)
+
+    # Compressed representation has its own etag.
+    result = client.get(path='/conditional/compressed',
+                        headers={'Accept-Encoding': 'gzip'})
+    assert result.status_code == 200
+    assert result.headers['Content-Encoding'] == 'gzip'
+    assert result.headers['Etag'] == '"v2-gzip"'
+
+    result = client.get(path='/conditional/compressed')
+    assert result.status_code == 200
+    assert 'Content-Encoding' not in result.headers
+    assert result.headers['Etag'] == '"v2"'
+
+    del calls[:]
+    result = client.get(path='/conditional/compressed',
+                        headers={'Accept-Encoding': 'gzip',
+                                 'If-None-Match': '"v2-gzip"'})
+    assert result.status_code == 304
+    assert result.headers['Etag'] == '"v2-gzip"'
+    assert 'Accept-Encoding' in result.headers['Vary']
+    assert calls == ['resource', 'post']
+
+    # Compressed etag does not validate the identity representation.
+    del calls[:]
+    result = client.get(path='/conditional/compressed',
+                        headers={'If-None-Match': '"v2-gzip"'})
+    assert result.status_code == 200
+    assert result.headers['Etag'] == '"v2"'
+    assert calls == ['resource', 'view', 'post']
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2018 Christiaan Frans Rademan.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# * Neither the name of the copyright holders nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+from wsgiref.util import FileWrapper
+
+import pytest
+
+from luxon import g
+from luxon import register
+
+wrapped = []
+
+
+class RecordingFileWrapper(FileWrapper):
+    def __init__(self, filelike, blksize=8192):
+        wrapped.append(filelike)
+        super().__init__(filelike, blksize)
+
+
+@pytest.fixture(scope="module")
+def client():
+    from luxon.testing.wsgi.client import Client
+    yield Client(__file__)
+    del g.current_request
+    del g.app
+
+
+@register.resource('GET', '/file_wrapper/file')
+def file_body(req, resp):
+    resp.content_type = 'text/plain'
+    return open(__file__, 'rb')
+
+
+@register.resource('GET', '/file_wrapper/bytes')
+def bytes_body(req, resp):
+    resp.content_type = 'text/plain'
+    return b'bytes'
+
+
+def test_wsgi_file_wrapper(client):
+    with open(__file__, 'rb') as source:
+        data = source.read()
+
+    del wrapped[:]
+    result = client.get(path='/file_wrapper/file',
+                        file_wrapper=RecordingFileWrapper)
+    assert result.status_code == 200
+    assert result.content == data
+    assert len(wrapped) == 1
+    assert wrapped[0].name == __file__
+
+    # Only file bodies are passed to the server.
+    del wrapped[:]
+    result = client.get(path='/file_wrapper/bytes',
+                        file_wrapper=RecordingFileWrapper)
+    assert result.content == b'bytes'
+    assert wrapped == []
+
+    # Without wsgi.file_wrapper files are read by the application.
+    result = client.get(path='/file_wrapper/file')
+    assert result.content == data
+    assert wrapped == []
@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2018 Christiaan Frans Rademan.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# * Neither the name of the copyright holders nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+import pytest
+
+from luxon import g
+from luxon import register
+
+calls = []
+
+
+@pytest.fixture(scope="module")
+def client():
+    from luxon.testing.wsgi.client import Client
+    yield Client(__file__)
+    del g.current_request
+    del g.app
+
+
+@register.resource('POST', '/json/iter')
+def json_iter(req, resp):
+    return [item['id'] for item in req.json_iter()]
+
+
+@register.resource('POST', '/json/length')
+def json_length(req, resp):
+    calls.append(1)
+    return str(len(req.stream.read()))
+
+
+def test_wsgi_json_iter(client):
+    result = client.post(path='/json/iter',
+                         headers={'Content-Type': 'application/json'},
+                         body='[{"id": 1}, {"id": 2}, {"id": 3}]')
+    assert result.status_code == 200
+    assert result.json == [1, 2, 3]
+
+
+def test_wsgi_max_body_size(client):
+    max_body_size = g.app.config.get('request', 'max_body_size')
+    g.app.config.set('request', 'max_body_size', '16')
+    try:
+        result = client.post(path='/json/iter',
+                             headers={'Content-Type': 'application/json'},
+                             body='[{"id": 1}, {"id": 2}, {"id": 3}]')
+        assert result.status_code == 413
+    finally:
+        g.app.config.set('request', 'max_body_size', max_body_size)
+
+
+def test_wsgi_max_body_size_length(client):
+    max_body_size = g.app.config.get('request', 'max_body_size')
+    g.app.config.set('request', 'max_body_size', '16')
+    try:
+        # Rejected according to Content-Length before the view is run.
+        del calls[:]
+        result = client.post(path='/json/length',
+                             headers={'Content-Length': '17'},
+                             body='x' * 17)
+        assert result.status_code == 413
+        assert calls == []
+
+        # Content-Length of zero is not an unknown length.
+        result = client.post(path='/json/length',
+                             headers={'Content-Length': '0'},
+                             body='x' * 8)
+        assert result.status_code == 200
+        assert result.text == '0'
+        assert calls == [1]
+
+        result = client.post(path='/json/length', body='x' * 8)
+        assert result.text == '8'
+    finally:
+        g.app.config.set('request', 'max_body_size', max_body_size)
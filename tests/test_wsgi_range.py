@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+# Copyright (c) 2018 Christiaan Frans Rademan.
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#
+# * Redistributions of source code must retain the above copyright notice, this
+#   list of conditions and the following disclaimer.
+#
+# * Redistributions in binary form must reproduce the above copyright notice,
+#   this list of conditions and the following disclaimer in the documentation
+#   and/or other materials provided with the distribution.
+#
+# * Neither the name of the copyright holders nor the names of its
+#   contributors may be used to endorse or promote products derived from
+#   this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY THE COPYRIGHT HOLDERS AND CONTRIBUTORS "AS IS"
+# AND ANY EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE
+# IMPLIED WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE
+# ARE DISCLAIMED. IN NO EVENT SHALL THE COPYRIGHT HOLDER OR CONTRIBUTORS BE
+# LIABLE FOR ANY DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR
+# CONSEQUENTIAL DAMAGES (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF
+# SUBSTITUTE GOODS OR SERVICES; LOSS OF USE, DATA, OR PROFITS; OR BUSINESS
+# INTERRUPTION) HOWEVER CAUSED AND ON ANY THEORY OF LIABILITY, WHETHER IN
+# CONTRACT, STRICT LIABILITY, OR TORT (INCLUDING NEGLIGENCE OR OTHERWISE)
+# ARISING IN ANY WAY OUT OF THE USE OF THIS SOFTWARE, EVEN IF ADVISED OF
+# THE POSSIBILITY OF SUCH DAMAGE.
+import pytest
+
+from luxon import g
+from luxon import register
+
+DATA = bytes(range(256)) * 4
+
+
+@pytest.fixture(scope="module")
+def client():
+    from luxon.testing.wsgi.client import Client
+    yield Client(__file__)
+    del g.current_request
+    del g.app
+
+
+@register.resource('GET', '/range/bytes')
+def range_bytes(req, resp):
+    resp.content_type = 'application/octet-stream'
+    resp.etag = 'range'
+    return DATA
+
+
+def test_wsgi_range(client):
+    result = client.get(path='/range/bytes',
+                        headers={'Range': 'bytes=10-19'})
+    assert result.status_code == 206
+    assert result.headers['Content-Range'] == 'bytes 10-19/1024'
+    assert result.content == DATA[10:20]
+
+    result = client.get(path='/range/bytes',
+                        headers={'Range': 'bytes=-10'})
+    assert result.status_code == 206
+    assert result.content == DATA[-10:]
+
+    result = client.get(path='/range/bytes',
+                        headers={'Range': 'bytes=2000-'})
+    assert result.status_code == 416
+    assert result.headers['Content-Range'] == 'bytes */1024'
+
+    result = client.get(path='/range/bytes')
+    assert result.status_code == 200
+    assert result.headers['Accept-Ranges'] == 'bytes'
+    assert result.content == DATA
+
+
+def test_wsgi_range_multiple(client):
+    result = client.get(path='/range/bytes',
+                        headers={'Range': 'bytes=0-1,10-11'})
+    assert result.status_code == 206
+    content_type = result.headers['Content-Type']
+    assert content_type.startswith('multipart/byteranges; boundary=')
+    boundary = content_type.split('=')[1].encode()
+    assert result.content.count(b'--' + boundary) == 3
+    assert b'Content-Range: bytes 10-11/1024\r\n\r\n\x0a\x0b' in result.content
+    assert int(result.headers['Content-Length']) == len(result.content)
+
+
+def test_wsgi_if_range(client):
+    result = client.get(path='/range/bytes',
+                        headers={'Range': 'bytes=0-1',
+                                 'If-Range': '"range"'})
+    assert result.status_code == 206
+
+    result = client.get(path='/range/bytes',
+                        headers={'Range': 'bytes=0-1',
+                                 'If-Range': '"modified"'})
+    assert result.status_code == 200
+    assert result.content == DATA